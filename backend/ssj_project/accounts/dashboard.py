@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Exists, FilteredRelation, OuterRef, Q
+from django.utils import timezone
+from .models import Employee, LeaveRequest
+from .serializers import EmployeeSerializer, LeaveRequestSerializer
+
+DASHBOARD_SUMMARY_CACHE_KEY = 'accounts:dashboard-summary'
+
+# Attendance statuses that count as at work
+CHECKED_IN_STATUSES = ('present', 'late', 'half_day')
+
+
+def build_dashboard_summary(today=None):
+    """
+    Compute the admin dashboard counters for `today` with aggregate queries:
+    one for headcount, today's attendance and approved leave per department,
+    one for pending leave, and two small ones for the recent employees and
+    pending leave lists. Employees on approved leave who haven't checked in
+    count as on leave, not absent.
+    """
+    today = today or timezone.localdate()
+    on_leave = Exists(LeaveRequest.objects.on_leave(today, today).filter(employee=OuterRef('pk')))
+
+    # Join only today's attendance row per employee (served by the
+    # (employee_id, date) unique index) and count with COUNT ... FILTER
+    departments = list(
+        Employee.objects.filter(user__is_active=True)
+        .annotate(today=FilteredRelation('attendances', condition=Q(attendances__date=today)))
+        .values('department')
+        .annotate(
+            headcount=Count('id'),
+            present=Count('today__id', filter=Q(today__status='present')),
+            late=Count('today__id', filter=Q(today__status='late')),
+            half_day=Count('today__id', filter=Q(today__status='half_day')),
+            on_leave=Count('id', filter=on_leave),
+            on_leave_checked_in=Count('id', filter=on_leave & Q(today__status__in=CHECKED_IN_STATUSES)),
+        )
+        .order_by('department')
+    )
+    for department in departments:
+        checked_in = sum(department[status] for status in CHECKED_IN_STATUSES)
+        away = department['on_leave'] - department.pop('on_leave_checked_in')
+        department['absent'] = department['headcount'] - checked_in - away
+
+    leave = LeaveRequest.objects.aggregate(pending=Count('id', filter=Q(status='pending')))
+
+    recent_employees = EmployeeSerializer.setup_eager_loading(Employee.objects.order_by('-id'))[:5]
+    pending_leave = LeaveRequestSerializer.setup_eager_loading(
+        LeaveRequest.objects.filter(status='pending').order_by('-created_at', '-id')
+    )[:5]
+
+    totals = {
+        key: sum(department[key] for department in departments)
+        for key in ('headcount', 'present', 'late', 'half_day', 'on_leave', 'absent')
+    }
+    return {
+        'date': today.isoformat(),
+        **totals,
+        'pending_leave_requests': leave['pending'],
+        'departments': departments,
+        'recent_employees': EmployeeSerializer(recent_employees, many=True).data,
+        'pending_leave': LeaveRequestSerializer(pending_leave, many=True).data,
+    }
+
+
+def get_dashboard_summary():
+    """Return the dashboard summary, cached for DASHBOARD_SUMMARY_TTL seconds."""
+    today = timezone.localdate()
+    summary = cache.get(DASHBOARD_SUMMARY_CACHE_KEY)
+    if summary is None or summary['date'] != today.isoformat():
+        summary = build_dashboard_summary(today)
+        cache.set(DASHBOARD_SUMMARY_CACHE_KEY, summary, getattr(settings, 'DASHBOARD_SUMMARY_TTL', 30))
+    return summary
+
+
+def invalidate_dashboard_summary():
+    """
+    Drop the cached summary. With a per-process cache backend this only
+    reaches the current process; other processes refresh when the TTL ends.
+    """
+    cache.delete(DASHBOARD_SUMMARY_CACHE_KEY)
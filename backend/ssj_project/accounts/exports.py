@@ -0,0 +1,183 @@
+import csv
+import json
+import zlib
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from .filters import AttendanceFilter, LeaveRequestFilter
+from .models import Attendance, LeaveRequest
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_CHUNK_SIZE = 2000
+# Bytes buffered before a chunk is handed to the response
+EXPORT_FLUSH_SIZE = 64 * 1024
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+
+
+def _hours(time_in, time_out):
+    if time_in and time_out:
+        return round((time_out - time_in).total_seconds() / 3600, 2)
+    return None
+
+
+def _days(start_date, end_date):
+    return (end_date - start_date).days + 1
+
+
+# kind -> model, filter set, ordering, (column, queryset field) pairs and
+# computed columns built from the fetched values
+EXPORTS = {
+    'attendance': {
+        'model': Attendance,
+        'filterset': AttendanceFilter,
+        'ordering': ('date', 'id'),
+        'fields': (
+            ('employee_id', 'employee__user__employee_id'),
+            ('first_name', 'employee__first_name'),
+            ('last_name', 'employee__last_name'),
+            ('department', 'employee__department'),
+            ('date', 'date'),
+            ('status', 'status'),
+            ('time_in', 'time_in'),
+            ('time_out', 'time_out'),
+        ),
+        'computed': (
+            ('hours', lambda row: _hours(row['time_in'], row['time_out'])),
+        ),
+    },
+    'leave-requests': {
+        'model': LeaveRequest,
+        'filterset': LeaveRequestFilter,
+        'ordering': ('created_at', 'id'),
+        'fields': (
+            ('employee_id', 'employee__user__employee_id'),
+            ('first_name', 'employee__first_name'),
+            ('last_name', 'employee__last_name'),
+            ('department', 'employee__department'),
+            ('start_date', 'start_date'),
+            ('end_date', 'end_date'),
+            ('status', 'status'),
+            ('reason', 'reason'),
+            ('created_at', 'created_at'),
+        ),
+        'computed': (
+            ('days', lambda row: _days(row['start_date'], row['end_date'])),
+        ),
+    },
+}
+
+
+def export_columns(kind):
+    export = EXPORTS[kind]
+    return [name for name, _ in export['fields']] + [name for name, _ in export['computed']]
+
+
+def export_queryset(kind, params=None):
+    """
+    Build the filtered, ordered values queryset for an export. `params` are
+    the kind's filter query params plus an optional `month` (YYYY-MM) that
+    sets the date range. Raises ValueError for invalid filters.
+    """
+    export = EXPORTS[kind]
+    params = params.copy() if params is not None else {}
+    month = params.get('month')
+    if month:
+        del params['month']
+        try:
+            start = datetime.strptime(month, '%Y-%m').date()
+        except ValueError:
+            raise ValueError({'month': ['Enter a month as YYYY-MM.']})
+        params['date_from'] = start.isoformat()
+        end = (start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+        params['date_to'] = end.isoformat()
+    filterset = export['filterset'](params, queryset=export['model'].objects.all())
+    if not filterset.is_valid():
+        raise ValueError({field: list(errors) for field, errors in filterset.errors.items()})
+    return filterset.qs.order_by(*export['ordering']).values_list(
+        *[field for _, field in export['fields']]
+    )
+
+
+def iter_export_rows(kind, queryset):
+    """
+    Yield export rows as dicts. The queryset is read through a server-side
+    cursor EXPORT_CHUNK_SIZE rows at a time, so memory stays flat however
+    many rows match and the first rows arrive before the scan finishes.
+    """
+    export = EXPORTS[kind]
+    names = [name for name, _ in export['fields']]
+    for values in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        row = dict(zip(names, values))
+        for name, compute in export['computed']:
+            row[name] = compute(row)
+        yield row
+
+
+class _LineBuffer:
+    """File-like sink for csv.writer that hands back what was written."""
+
+    def write(self, value):
+        return value
+
+
+def render_csv(columns, rows):
+    writer = csv.writer(_LineBuffer())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in (row[column] for column in columns)
+        ])
+
+
+def render_ndjson(columns, rows):
+    for row in rows:
+        yield json.dumps(
+            {column: row[column] for column in columns},
+            default=lambda value: value.isoformat(),
+        ) + '\n'
+
+
+def buffered(lines, flush_size=EXPORT_FLUSH_SIZE):
+    """Join small text pieces into byte chunks of roughly `flush_size`."""
+    buffer = []
+    size = 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= flush_size:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_export(kind, output='csv', gzip=False, params=None):
+    """
+    Return an iterator of byte chunks for an export. Filters are validated
+    here; the query itself starts when the iterator is first advanced.
+    """
+    if output not in EXPORT_FORMATS:
+        raise ValueError({'output': [f"Choose one of: {', '.join(EXPORT_FORMATS)}."]})
+    columns = export_columns(kind)
+    rows = iter_export_rows(kind, export_queryset(kind, params))
+    lines = render_csv(columns, rows) if output == 'csv' else render_ndjson(columns, rows)
+    chunks = buffered(lines)
+    return gzipped(chunks) if gzip else chunks
+
+
+def export_filename(kind, output, gzip=False, params=None):
+    label = (params or {}).get('month') or timezone.localdate().isoformat()
+    return f"{kind}-{label}.{output}" + ('.gz' if gzip else '')
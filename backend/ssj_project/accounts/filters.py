@@ -0,0 +1,74 @@
+import django_filters
+from .models import Attendance, DailyTimesheet, LeaveBalance, LeaveLedgerEntry, LeaveRequest, MonthlyTimesheet
+
+
+class AttendanceFilter(django_filters.FilterSet):
+    """
+    Query params for attendance lists. Each one is served by an index:
+    (date, status), the (employee, date) unique index, and
+    Employee.department.
+    """
+    # Filter on the column directly; a ModelChoiceFilter would look the employee up first
+    employee = django_filters.NumberFilter(field_name='employee_id')
+    date = django_filters.DateFilter(field_name='date')
+    date_from = django_filters.DateFilter(field_name='date', lookup_expr='gte')
+    date_to = django_filters.DateFilter(field_name='date', lookup_expr='lte')
+    department = django_filters.CharFilter(field_name='employee__department')
+    status = django_filters.MultipleChoiceFilter(choices=Attendance.STATUS_CHOICES, distinct=False)
+
+    class Meta:
+        model = Attendance
+        fields = ['employee', 'date', 'date_from', 'date_to', 'department', 'status']
+
+
+class LeaveRequestFilter(django_filters.FilterSet):
+    """`date_from`/`date_to` match leave that overlaps the range."""
+    employee = django_filters.NumberFilter(field_name='employee_id')
+    date_from = django_filters.DateFilter(field_name='end_date', lookup_expr='gte')
+    date_to = django_filters.DateFilter(field_name='start_date', lookup_expr='lte')
+    department = django_filters.CharFilter(field_name='employee__department')
+    status = django_filters.MultipleChoiceFilter(choices=LeaveRequest.STATUS_CHOICES, distinct=False)
+
+    class Meta:
+        model = LeaveRequest
+        fields = ['employee', 'date_from', 'date_to', 'department', 'status']
+
+
+class MonthlyTimesheetFilter(django_filters.FilterSet):
+    """`month` is YYYY-MM; served by the (month, id) and (employee, month) indexes."""
+    employee = django_filters.NumberFilter(field_name='employee_id')
+    month = django_filters.DateFilter(field_name='month', input_formats=['%Y-%m'])
+    department = django_filters.CharFilter(field_name='employee__department')
+
+    class Meta:
+        model = MonthlyTimesheet
+        fields = ['employee', 'month', 'department']
+
+
+class DailyTimesheetFilter(django_filters.FilterSet):
+    employee = django_filters.NumberFilter(field_name='employee_id')
+    date_from = django_filters.DateFilter(field_name='date', lookup_expr='gte')
+    date_to = django_filters.DateFilter(field_name='date', lookup_expr='lte')
+
+    class Meta:
+        model = DailyTimesheet
+        fields = ['employee', 'date_from', 'date_to']
+
+
+class LeaveBalanceFilter(django_filters.FilterSet):
+    employee = django_filters.NumberFilter(field_name='employee_id')
+    department = django_filters.CharFilter(field_name='employee__department')
+
+    class Meta:
+        model = LeaveBalance
+        fields = ['employee', 'department']
+
+
+class LeaveLedgerFilter(django_filters.FilterSet):
+    """`employee` is served by the (employee, id) index."""
+    employee = django_filters.NumberFilter(field_name='employee_id')
+    kind = django_filters.MultipleChoiceFilter(choices=LeaveLedgerEntry.KIND_CHOICES, distinct=False)
+
+    class Meta:
+        model = LeaveLedgerEntry
+        fields = ['employee', 'kind']
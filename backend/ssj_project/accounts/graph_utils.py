@@ -1,10 +1,213 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
 from django.conf import settings
+from django.core.cache import cache
+
+GRAPH_TOKEN_CACHE_KEY = 'ms_graph_access_token'
+GRAPH_TOKEN_LOCK_KEY = 'ms_graph_access_token_lock'
+# Refresh this many seconds before the token actually expires
+GRAPH_TOKEN_EXPIRY_MARGIN = 300
+# How long another worker may hold the refresh lock before we fetch anyway
+GRAPH_TOKEN_LOCK_TIMEOUT = 30
+
+# Status codes Graph uses for throttling and transient failures
+GRAPH_RETRY_STATUSES = (429, 503, 504)
+# Retried for non-idempotent requests too: a throttled request was not processed,
+# while a 503/504 may have been (e.g. a sendMail that went out anyway)
+GRAPH_THROTTLE_STATUSES = (429,)
+# Methods safe to resend after a transient server error
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+# Maximum number of requests Graph accepts in one $batch call
+GRAPH_BATCH_SIZE = 20
 
+_token_lock = threading.Lock()
+_client_lock = threading.Lock()
+_client = None
+_tenant_semaphores = {}
 
-def get_graph_access_token():
+
+class GraphClient:
     """
-    Get Microsoft Graph API access token using client credentials flow
+    Shared HTTP client for Microsoft Graph.
+
+    Keeps a pooled keep-alive session, applies connect/read timeouts,
+    retries throttled and (for idempotent requests) transient failures with
+    exponential backoff, honouring Graph's Retry-After header, and caps the
+    number of requests in flight per tenant.
+    """
+
+    def __init__(self, base_url=None, tenant_id=None, connect_timeout=None, read_timeout=None,
+                 max_retries=None, backoff_factor=None, max_backoff=None, max_concurrency=None,
+                 token_getter=None):
+        self.base_url = (base_url or getattr(settings, 'MS_GRAPH_BASE_URL', 'https://graph.microsoft.com')).rstrip('/')
+        self.tenant_id = tenant_id if tenant_id is not None else settings.MS_GRAPH_TENANT_ID
+        self.timeout = (
+            connect_timeout if connect_timeout is not None else getattr(settings, 'MS_GRAPH_CONNECT_TIMEOUT', 5),
+            read_timeout if read_timeout is not None else getattr(settings, 'MS_GRAPH_READ_TIMEOUT', 30),
+        )
+        self.max_retries = max_retries if max_retries is not None else getattr(settings, 'MS_GRAPH_MAX_RETRIES', 5)
+        self.backoff_factor = backoff_factor if backoff_factor is not None else getattr(settings, 'MS_GRAPH_BACKOFF_FACTOR', 0.5)
+        self.max_backoff = max_backoff if max_backoff is not None else getattr(settings, 'MS_GRAPH_MAX_BACKOFF', 60)
+        self.max_concurrency = max_concurrency or getattr(settings, 'MS_GRAPH_MAX_CONCURRENCY', 4)
+        self.token_getter = token_getter or get_graph_access_token
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        with _client_lock:
+            if self.tenant_id not in _tenant_semaphores:
+                _tenant_semaphores[self.tenant_id] = threading.BoundedSemaphore(self.max_concurrency)
+            self._semaphore = _tenant_semaphores[self.tenant_id]
+
+    def _url(self, path):
+        if path.startswith('http://') or path.startswith('https://'):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def _backoff(self, attempt, response=None):
+        """Seconds to wait before the next attempt."""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.max_backoff)
+                except ValueError:
+                    pass
+        delay = self.backoff_factor * (2 ** attempt)
+        return min(delay + random.uniform(0, delay / 2), self.max_backoff)
+
+    def request(self, method, path, authenticate=True, idempotent=None, **kwargs):
+        """
+        Send a request, retrying throttled or failed attempts.
+
+        Non-idempotent requests (POST by default; pass `idempotent` to
+        override) are only retried when throttled. Raises requests.HTTPError
+        if the final response is an error.
+        """
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        retry_statuses = GRAPH_RETRY_STATUSES if idempotent else GRAPH_THROTTLE_STATUSES
+        url = self._url(path)
+        kwargs.setdefault('timeout', self.timeout)
+        headers = dict(kwargs.pop('headers', None) or {})
+        refreshed_token = False
+        force_refresh = False
+
+        attempt = 0
+        while True:
+            if authenticate:
+                access_token = self.token_getter(force_refresh=force_refresh)
+                force_refresh = False
+                if not access_token:
+                    raise requests.HTTPError("Failed to acquire token")
+                headers['Authorization'] = f'Bearer {access_token}'
+
+            try:
+                with self._semaphore:
+                    response = self.session.request(method, url, headers=headers, **kwargs)
+            except requests.ConnectionError as e:
+                # Includes connect timeouts; read timeouts are not retried since
+                # the request may already have been processed. Neither is a
+                # dropped connection on a non-idempotent request, unless it
+                # failed before anything was sent
+                if attempt >= self.max_retries or not (idempotent or _failed_before_sending(e)):
+                    raise
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+
+            if response.status_code == 401 and authenticate and not refreshed_token:
+                # The cached token may have been revoked; try once with a new one
+                refreshed_token = True
+                force_refresh = True
+                continue
+
+            if response.status_code in retry_statuses and attempt < self.max_retries:
+                time.sleep(self._backoff(attempt, response))
+                attempt += 1
+                continue
+
+            response.raise_for_status()
+            return response
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def batch(self, batch_requests):
+        """
+        Send up to GRAPH_BATCH_SIZE requests in one /$batch call.
+
+        Sub-requests that come back throttled are resent, after the longest
+        Retry-After they carried, until they succeed or retries run out;
+        idempotent ones are resent after a 503/504 too. Returns a dict of
+        sub-request id to its response entry.
+        """
+        pending = {request['id']: request for request in batch_requests}
+        idempotent = {
+            request['id']: request.get('method', 'GET').upper() in IDEMPOTENT_METHODS
+            for request in batch_requests
+        }
+        results = {}
+        attempt = 0
+        while pending:
+            response = self.post(
+                '/v1.0/$batch', json={'requests': list(pending.values())},
+                idempotent=all(idempotent[request_id] for request_id in pending),
+            )
+            retry_after = 0
+            for entry in response.json().get('responses', []):
+                retry_statuses = GRAPH_RETRY_STATUSES if idempotent.get(entry['id']) else GRAPH_THROTTLE_STATUSES
+                if entry['status'] in retry_statuses and attempt < self.max_retries:
+                    headers = {k.lower(): v for k, v in (entry.get('headers') or {}).items()}
+                    try:
+                        retry_after = max(retry_after, float(headers.get('retry-after', 0)))
+                    except ValueError:
+                        pass
+                    continue
+                results[entry['id']] = entry
+                pending.pop(entry['id'], None)
+            if pending:
+                if attempt >= self.max_retries:
+                    break
+                time.sleep(min(retry_after, self.max_backoff) if retry_after else self._backoff(attempt))
+                attempt += 1
+        return results
+
+
+def _failed_before_sending(error):
+    """Whether a ConnectionError happened before the request went out (timeout or refusal while connecting)."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = error.args[0] if error.args else None
+    # urllib3 wraps the cause in MaxRetryError
+    return isinstance(getattr(reason, 'reason', reason), NewConnectionError)
+
+
+def get_graph_client():
+    """Return the process-wide Graph client."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = GraphClient()
+    return _client
+
+
+def _request_graph_access_token():
+    """
+    Request a new token from the Microsoft identity platform.
+    Returns (access_token, expires_in) or (None, 0) on failure.
     """
     try:
         token_url = f"https://login.microsoftonline.com/{settings.MS_GRAPH_TENANT_ID}/oauth2/v2.0/token"
@@ -15,79 +218,200 @@ def get_graph_access_token():
             'scope': 'https://graph.microsoft.com/.default'
         }
 
-        response = requests.post(token_url, data=token_data)
-        response.raise_for_status()
-        return response.json().get('access_token')
+        # Asking for another token is harmless, so transient failures are retried
+        response = get_graph_client().post(token_url, data=token_data, authenticate=False, idempotent=True)
+        payload = response.json()
+        return payload.get('access_token'), int(payload.get('expires_in', 3599))
     except Exception as e:
         print(f"Error acquiring token: {e}")
-        return None
+        return None, 0
+
+
+def _cached_graph_access_token():
+    """Return the cached token if it is not about to expire."""
+    cached = cache.get(GRAPH_TOKEN_CACHE_KEY)
+    if cached and cached['expires_at'] - GRAPH_TOKEN_EXPIRY_MARGIN > time.time():
+        return cached['access_token']
+    return None
+
+
+def get_graph_access_token(force_refresh=False):
+    """
+    Get Microsoft Graph API access token using client credentials flow.
+
+    Tokens are shared through Django's cache and refreshed shortly before
+    they expire. Only one thread per process, and one process per cache,
+    requests a new token at a time; the others wait for it to appear.
+    """
+    if not force_refresh:
+        access_token = _cached_graph_access_token()
+        if access_token:
+            return access_token
+
+    with _token_lock:
+        if not force_refresh:
+            access_token = _cached_graph_access_token()
+            if access_token:
+                return access_token
+
+        have_lock = cache.add(GRAPH_TOKEN_LOCK_KEY, True, GRAPH_TOKEN_LOCK_TIMEOUT)
+        if not have_lock:
+            # Another worker is refreshing; wait for its token
+            deadline = time.monotonic() + GRAPH_TOKEN_LOCK_TIMEOUT
+            while time.monotonic() < deadline and cache.get(GRAPH_TOKEN_LOCK_KEY):
+                time.sleep(0.1)
+                access_token = _cached_graph_access_token()
+                if access_token:
+                    return access_token
+
+        try:
+            access_token, expires_in = _request_graph_access_token()
+            if access_token:
+                cache.set(
+                    GRAPH_TOKEN_CACHE_KEY,
+                    {'access_token': access_token, 'expires_at': time.time() + expires_in},
+                    max(expires_in - GRAPH_TOKEN_EXPIRY_MARGIN, 1),
+                )
+            return access_token
+        finally:
+            if have_lock:
+                cache.delete(GRAPH_TOKEN_LOCK_KEY)
+
+
+def _graph_message(to_email, subject, body):
+    return {
+        'message': {
+            'subject': subject,
+            'body': {
+                'contentType': 'HTML',
+                'content': body
+            },
+            'toRecipients': [
+                {
+                    'emailAddress': {
+                        'address': to_email
+                    }
+                }
+            ]
+        },
+        'saveToSentItems': 'true'
+    }
 
 
 def send_email_with_graph(to_email, subject, body):
     """
     Send email using Microsoft Graph API from a shared mailbox
     """
-    access_token = get_graph_access_token()
-    if not access_token:
-        print("Failed to acquire token")
-        return False
-
     try:
-        graph_endpoint = f"https://graph.microsoft.com/v1.0/users/{settings.SHARED_MAILBOX_ADDRESS}/sendMail"
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-            'Content-Type': 'application/json'
-        }
+        graph_endpoint = f"/v1.0/users/{settings.SHARED_MAILBOX_ADDRESS}/sendMail"
 
-        email_data = {
-            'message': {
-                'subject': subject,
-                'body': {
-                    'contentType': 'HTML',
-                    'content': body
-                },
-                'toRecipients': [
-                    {
-                        'emailAddress': {
-                            'address': to_email
-                        }
-                    }
-                ]
-            },
-            'saveToSentItems': 'true'
-        }
+        email_data = _graph_message(to_email, subject, body)
 
-        response = requests.post(graph_endpoint, headers=headers, json=email_data)
-        response.raise_for_status()
+        get_graph_client().post(graph_endpoint, json=email_data)
         return True
     except Exception as e:
         print(f"Error sending email via Graph API: {e}")
         return False
 
 
-def get_microsoft_users():
+def send_emails_with_graph(messages):
     """
-    Get all enabled users from Microsoft Graph API
+    Send many emails through Graph $batch calls, GRAPH_BATCH_SIZE per call.
+
+    `messages` maps a caller-chosen key to a dict with `to_email`, `subject`
+    and `body`. Batches are sent concurrently within the client's
+    concurrency cap. Returns a dict of the same keys to True/False.
     """
-    access_token = get_graph_access_token()
-    if not access_token:
-        print("Failed to acquire token")
-        return None
+    client = get_graph_client()
+    keys = list(messages)
+    results = {key: False for key in keys}
+    sendmail_url = f"/users/{settings.SHARED_MAILBOX_ADDRESS}/sendMail"
 
-    try:
-        graph_endpoint = 'https://graph.microsoft.com/v1.0/users'
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-            'Content-Type': 'application/json'
-        }
-        params = {
-            '$select': 'id,displayName,givenName,surname,mail,userPrincipalName,jobTitle,department,mobilePhone,officeLocation',
-            '$filter': 'accountEnabled eq true'
-        }
+    def send_batch(batch_keys):
+        batch_requests = [
+            {
+                'id': str(index),
+                'method': 'POST',
+                'url': sendmail_url,
+                'headers': {'Content-Type': 'application/json'},
+                'body': _graph_message(**messages[key]),
+            }
+            for index, key in enumerate(batch_keys)
+        ]
+        try:
+            responses = client.batch(batch_requests)
+        except Exception as e:
+            print(f"Error sending email batch via Graph API: {e}")
+            return
+        for index, key in enumerate(batch_keys):
+            entry = responses.get(str(index))
+            if entry and 200 <= entry['status'] < 300:
+                results[key] = True
+            else:
+                print(f"Error sending email via Graph API to {messages[key]['to_email']}: {entry}")
 
-        response = requests.get(graph_endpoint, headers=headers, params=params)
-        response.raise_for_status()
-        return response.json().get('value', [])
-    except Exception as e:
-        print(f"Error getting users: {e}")
-        return None
+    batches = [keys[i:i + GRAPH_BATCH_SIZE] for i in range(0, len(keys), GRAPH_BATCH_SIZE)]
+    with ThreadPoolExecutor(max_workers=client.max_concurrency) as pool:
+        list(pool.map(send_batch, batches))
+    return results
+
+
+GRAPH_USER_FIELDS = 'id,displayName,givenName,surname,mail,userPrincipalName,jobTitle,department,mobilePhone,officeLocation'
+# Largest page size /users accepts
+GRAPH_USERS_PAGE_SIZE = 999
+
+
+def iter_microsoft_user_pages(page_size=GRAPH_USERS_PAGE_SIZE):
+    """
+    Yield enabled users from Microsoft Graph API one page at a time,
+    following @odata.nextLink until the last page. Raises on failure.
+    """
+    client = get_graph_client()
+    response = client.get('/v1.0/users', params={
+        '$select': GRAPH_USER_FIELDS,
+        '$filter': 'accountEnabled eq true',
+        '$top': page_size,
+    })
+    while True:
+        payload = response.json()
+        yield payload.get('value', [])
+        next_link = payload.get('@odata.nextLink')
+        if not next_link:
+            return
+        # nextLink already carries the query parameters
+        response = client.get(next_link)
+
+
+class GraphDeltaExpired(Exception):
+    """The stored delta link is no longer valid and a full resync is needed."""
+
+
+def iter_microsoft_user_delta_pages(delta_link=None, page_size=GRAPH_USERS_PAGE_SIZE):
+    """
+    Yield (users, delta_link) pages from the Graph /users/delta query.
+
+    Starts from `delta_link` when given, otherwise enumerates every user.
+    `delta_link` is None on every page but the last, which carries the link
+    to resume from next time. Removed users carry an `@removed` key.
+    Raises GraphDeltaExpired if Graph no longer accepts `delta_link`.
+    """
+    client = get_graph_client()
+    try:
+        if delta_link:
+            response = client.get(delta_link)
+        else:
+            response = client.get('/v1.0/users/delta', params={
+                '$select': f'{GRAPH_USER_FIELDS},accountEnabled',
+                '$top': page_size,
+            })
+        while True:
+            payload = response.json()
+            next_link = payload.get('@odata.nextLink')
+            yield payload.get('value', []), payload.get('@odata.deltaLink')
+            if not next_link:
+                return
+            response = client.get(next_link)
+    except requests.HTTPError as e:
+        if e.response is not None and e.response.status_code == 410:
+            raise GraphDeltaExpired(str(e)) from e
+        raise
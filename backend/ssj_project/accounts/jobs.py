@@ -0,0 +1,36 @@
+from django.core.management import call_command
+
+SYNC_MICROSOFT_USERS = 'sync_microsoft_users'
+MATERIALIZE_ABSENCES = 'materialize_absences'
+
+
+def run_sync_microsoft_users(job):
+    """Run the Microsoft 365 sync, reporting progress to the job."""
+    from .management.commands.sync_microsoft_users import Command
+
+    command = Command()
+    call_command(
+        command,
+        send_credentials=job.params.get('send_credentials', False),
+        delta=job.params.get('delta', False),
+        job_id=job.pk,
+    )
+    if command.fetch_error:
+        raise RuntimeError(f"Failed to get users from Microsoft 365: {command.fetch_error}")
+
+
+def run_materialize_absences(job):
+    """Record absences for `date_from`..`date_to` (default: yesterday), reporting the count."""
+    from .management.commands.materialize_absences import Command
+
+    command = Command()
+    options = {key: job.params[key] for key in ('date_from', 'date_to') if job.params.get(key)}
+    call_command(command, **options)
+    job.report_progress(absences=command.total)
+
+
+# Job kind -> callable taking the claimed Job
+JOB_HANDLERS = {
+    SYNC_MICROSOFT_USERS: run_sync_microsoft_users,
+    MATERIALIZE_ABSENCES: run_materialize_absences,
+}
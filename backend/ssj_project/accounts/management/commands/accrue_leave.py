@@ -0,0 +1,31 @@
+from decimal import Decimal, InvalidOperation
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import Employee, LeaveBalance
+
+
+class Command(BaseCommand):
+    help = 'Credit leave days to active employees through the leave ledger (e.g. monthly from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('days', help='Days to credit to each employee, e.g. 1.5')
+        parser.add_argument('--department', help='Only credit this department')
+        parser.add_argument('--employee', type=int, action='append', help='Only credit this employee (Employee id)')
+        parser.add_argument('--note', default='', help='Note stored on each ledger entry, e.g. "2024-03 accrual"')
+
+    def handle(self, *args, **options):
+        try:
+            days = Decimal(options['days'])
+        except InvalidOperation:
+            raise CommandError(f"Invalid number of days: {options['days']}")
+        if not days.is_finite() or days <= 0:
+            raise CommandError("days must be a positive number")
+
+        employees = Employee.objects.filter(user__is_active=True)
+        if options['department']:
+            employees = employees.filter(department=options['department'])
+        if options['employee']:
+            employees = employees.filter(pk__in=options['employee'])
+        employee_ids = list(employees.values_list('pk', flat=True))
+
+        balances = LeaveBalance.objects.credit(employee_ids, days, note=options['note'])
+        self.stdout.write(self.style.SUCCESS(f"Credited {days} days to {len(balances)} employees"))
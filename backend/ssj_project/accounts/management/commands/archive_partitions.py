@@ -0,0 +1,32 @@
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from accounts.partitioning import PARTITIONED_TABLES, PartitionError, archivable_partitions, archive_partition
+
+
+class Command(BaseCommand):
+    help = 'Detach attendance partitions older than N months and dump them to gzipped CSV files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, required=True, help='Archive months more than this many months before the current one')
+        parser.add_argument('--table', choices=sorted(PARTITIONED_TABLES), action='append', help='Table to archive (default: all)')
+        parser.add_argument('--dir', default=settings.ATTENDANCE_ARCHIVE_DIR, help='Directory for the dumps')
+        parser.add_argument('--dry-run', action='store_true', help='List the partitions without archiving them')
+
+    def handle(self, *args, **options):
+        if options['older_than'] < 1:
+            raise CommandError("--older-than must be at least 1")
+        os.makedirs(options['dir'], exist_ok=True)
+
+        for table in options['table'] or sorted(PARTITIONED_TABLES):
+            for name, start, _ in archivable_partitions(table, options['older_than']):
+                if options['dry_run']:
+                    self.stdout.write(f"Would archive {name}")
+                    continue
+                try:
+                    path, rows = archive_partition(table, name, start, options['dir'])
+                except PartitionError as e:
+                    raise CommandError(str(e))
+                self.stdout.write(f"Archived {name}: {rows} rows to {path}")
+
+        self.stdout.write(self.style.SUCCESS("Archive complete"))
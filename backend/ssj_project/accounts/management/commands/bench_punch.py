@@ -0,0 +1,107 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import connection, IntegrityError
+from django.utils import timezone
+from accounts.models import Employee, Attendance
+
+User = get_user_model()
+
+BENCH_DOMAIN = 'bench.punch.invalid'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent clock-in punches (single-statement upsert vs. get_or_create)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--punches', type=int, default=1000, help='Number of employees punching in')
+        parser.add_argument('--concurrency', type=int, default=50, help='Number of worker threads')
+        parser.add_argument('--retries', type=int, default=1, help='Extra duplicate punches per employee (double taps)')
+
+    def handle(self, *args, **options):
+        punches = options['punches']
+        concurrency = options['concurrency']
+        retries = options['retries']
+
+        self._cleanup()
+        try:
+            user_ids = self._create_employees(punches)
+            jobs = [user_id for user_id in user_ids for _ in range(retries + 1)]
+
+            for name, punch in (('legacy get_or_create', self._legacy_punch), ('upsert', self._upsert_punch)):
+                Attendance.objects.filter(employee__user__email__endswith=BENCH_DOMAIN).delete()
+                latencies, errors = self._run(punch, jobs, concurrency)
+                rows = Attendance.objects.filter(employee__user__email__endswith=BENCH_DOMAIN).count()
+                self._report(name, latencies, errors, rows, punches)
+        finally:
+            self._cleanup()
+
+    def _create_employees(self, count):
+        users = User.objects.bulk_create([
+            User(
+                email=f'bench{i}@{BENCH_DOMAIN}',
+                user_type='employee',
+                employee_id=f'B{i:07d}',
+                password='!',
+            )
+            for i in range(count)
+        ])
+        Employee.objects.bulk_create([
+            Employee(user=user, first_name='Bench', last_name=str(i), position='Bench', department='IT')
+            for i, user in enumerate(users)
+        ])
+        return [user.id for user in users]
+
+    def _cleanup(self):
+        User.objects.filter(email__endswith=BENCH_DOMAIN).delete()
+
+    def _legacy_punch(self, user_id):
+        employee = Employee.objects.get(user_id=user_id)
+        attendance, created = Attendance.objects.get_or_create(
+            employee=employee,
+            date=date.today(),
+            defaults={'status': 'present', 'time_in': timezone.now()},
+        )
+        if not created and not attendance.time_in:
+            attendance.time_in = timezone.now()
+            attendance.status = 'present'
+            attendance.save()
+
+    def _upsert_punch(self, user_id):
+        Attendance.objects.clock_in(user_id, date.today(), timezone.now())
+
+    def _run(self, punch, jobs, concurrency):
+        def timed(user_id):
+            start = time.perf_counter()
+            try:
+                punch(user_id)
+                error = None
+            except IntegrityError as e:
+                error = e
+            return time.perf_counter() - start, error
+
+        def worker(chunk):
+            try:
+                return [timed(user_id) for user_id in chunk]
+            finally:
+                connection.close()
+
+        chunks = [jobs[i::concurrency] for i in range(concurrency)]
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = [r for chunk_results in pool.map(worker, chunks) for r in chunk_results]
+
+        latencies = sorted(latency for latency, _ in results)
+        errors = sum(1 for _, error in results if error is not None)
+        return latencies, errors
+
+    def _report(self, name, latencies, errors, rows, expected_rows):
+        p50 = statistics.median(latencies) * 1000
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+        self.stdout.write(
+            f"{name}: {len(latencies)} punches, p50={p50:.2f}ms p99={p99:.2f}ms, "
+            f"{errors} IntegrityErrors, {rows}/{expected_rows} rows"
+        )
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from accounts.partitioning import PARTITION_MONTHS_AHEAD, PARTITIONED_TABLES, PartitionError, ensure_partitions
+
+
+class Command(BaseCommand):
+    help = 'Create monthly attendance partitions ahead of time (run daily or monthly from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--table', choices=sorted(PARTITIONED_TABLES), action='append', help='Table to maintain (default: all)')
+        parser.add_argument('--months-ahead', type=int, default=PARTITION_MONTHS_AHEAD, help='Months after the current one to create')
+
+    def handle(self, *args, **options):
+        for table in options['table'] or sorted(PARTITIONED_TABLES):
+            try:
+                created = ensure_partitions(table, months_ahead=options['months_ahead'])
+            except PartitionError as e:
+                raise CommandError(str(e))
+            for name in created:
+                self.stdout.write(f"Created {name}")
+            self.stdout.write(self.style.SUCCESS(f"{table}: {len(created)} partitions created"))
@@ -0,0 +1,46 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from accounts.exports import EXPORT_FORMATS, EXPORTS, stream_export
+
+
+class Command(BaseCommand):
+    help = 'Stream attendance or leave rows as CSV or NDJSON for payroll'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS), help='What to export')
+        parser.add_argument('--output', choices=EXPORT_FORMATS, default='csv', help='Output format')
+        parser.add_argument('--gzip', action='store_true', help='Gzip the output')
+        parser.add_argument('--file', help='Write to this path instead of stdout')
+        parser.add_argument('--month', help='Month to export (YYYY-MM)')
+        parser.add_argument('--from', dest='date_from', help='First day (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', help='Last day (YYYY-MM-DD)')
+        parser.add_argument('--employee', type=int, help='Only this employee (Employee id)')
+        parser.add_argument('--department', help='Only this department')
+        parser.add_argument('--status', action='append', help='Only this status (repeatable)')
+
+    def handle(self, *args, **options):
+        params = {
+            name: options[name]
+            for name in ('month', 'date_from', 'date_to', 'employee', 'department', 'status')
+            if options[name]
+        }
+        try:
+            chunks = stream_export(options['kind'], output=options['output'], gzip=options['gzip'], params=params)
+        except ValueError as e:
+            errors = '; '.join(f"{field}: {' '.join(map(str, messages))}" for field, messages in e.args[0].items())
+            raise CommandError(f"Invalid export options: {errors}")
+
+        written = 0
+        out = open(options['file'], 'wb') if options['file'] else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+                written += len(chunk)
+        finally:
+            if options['file']:
+                out.close()
+            else:
+                out.flush()
+
+        if options['file']:
+            self.stdout.write(self.style.SUCCESS(f"Wrote {written} bytes to {options['file']}"))
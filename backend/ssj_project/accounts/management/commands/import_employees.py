@@ -0,0 +1,69 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+from accounts.onboarding import EmployeeImportError, import_employees, parse_employee_rows
+from accounts.utils import password_hashing_pool
+
+
+class Command(BaseCommand):
+    help = 'Bulk-create employees from a CSV file or JSON array'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSON file to import')
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'json'],
+            help='File format (default: from the file extension or content)',
+        )
+        parser.add_argument(
+            '--no-credentials',
+            action='store_true',
+            help='Do not queue credentials emails for the new employees',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the file without creating anything',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format']
+        if format is None:
+            extension = os.path.splitext(path)[1].lower().lstrip('.')
+            format = extension if extension in ('csv', 'json') else None
+
+        try:
+            with open(path, encoding='utf-8-sig') as f:
+                rows = parse_employee_rows(f.read(), format)
+        except (OSError, EmployeeImportError) as e:
+            raise CommandError(str(e))
+
+        pool = password_hashing_pool() if (os.cpu_count() or 1) > 1 and not options['dry_run'] else None
+        try:
+            report = import_employees(
+                rows,
+                send_credentials=not options['no_credentials'],
+                dry_run=options['dry_run'],
+                hashing_pool=pool,
+            )
+        except IntegrityError as e:
+            raise CommandError(f"Import conflicted with concurrent changes, nothing was created: {e}")
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        counts = {}
+        for entry in report:
+            counts[entry['status']] = counts.get(entry['status'], 0) + 1
+            if entry['status'] == 'error':
+                errors = '; '.join(
+                    f"{field}: {' '.join(str(message) for message in messages)}"
+                    for field, messages in entry['errors'].items()
+                )
+                self.stdout.write(self.style.ERROR(f"Row {entry['row']} ({entry['email']}): {errors}"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Import completed: {counts.get('created', 0)} created, {counts.get('valid', 0)} valid, "
+            f"{counts.get('error', 0)} errors"
+        ))
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from accounts.dashboard import invalidate_dashboard_summary
+from accounts.models import Attendance, DailyTimesheet
+
+
+class Command(BaseCommand):
+    help = 'Record absences for employees with no attendance and no approved leave (run nightly from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Day to materialize (YYYY-MM-DD, default: yesterday)')
+        parser.add_argument('--from', dest='date_from', help='First day of a backfill (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', help='Last day of a backfill (YYYY-MM-DD, default: yesterday)')
+        parser.add_argument('--chunk-days', type=int, default=31, help='Days materialized per transaction')
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        if options['date'] and (options['date_from'] or options['date_to']):
+            raise CommandError("Use either --date or --from/--to")
+        if options['date']:
+            date_from = date_to = self.parse_date(options['date'])
+        else:
+            date_to = self.parse_date(options['date_to']) or today - timedelta(days=1)
+            date_from = self.parse_date(options['date_from']) or date_to
+        if date_from > date_to:
+            raise CommandError("--from must not be after --to")
+        # Employees can still clock in today
+        if date_to >= today:
+            raise CommandError("Only past days can be materialized")
+
+        # Each chunk is one INSERT ... SELECT plus a rollup rebuild, in one transaction
+        workdays = settings.ATTENDANCE_WORKDAYS
+        self.total = 0
+        start = date_from
+        while start <= date_to:
+            end = min(start + timedelta(days=options['chunk_days'] - 1), date_to)
+            with transaction.atomic():
+                inserted = Attendance.objects.materialize_absences(start, end, workdays=workdays)
+                if inserted:
+                    DailyTimesheet.objects.rebuild(start, end)
+            self.total += inserted
+            self.stdout.write(f"{start} to {end}: {inserted} absences")
+            start = end + timedelta(days=1)
+
+        if self.total:
+            invalidate_dashboard_summary()
+        self.stdout.write(self.style.SUCCESS(f"Recorded {self.total} absences from {date_from} to {date_to}"))
+
+    def parse_date(self, value):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f"Invalid date: {value}")
@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from accounts.models import Attendance, DailyTimesheet
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily and monthly timesheet rollups from attendance'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='First day to rebuild (YYYY-MM-DD, default: earliest attendance)')
+        parser.add_argument('--to', dest='date_to', help='Last day to rebuild (YYYY-MM-DD, default: latest attendance)')
+        parser.add_argument('--employee', type=int, help='Only rebuild this employee (Employee id)')
+        parser.add_argument('--chunk-days', type=int, default=31, help='Days rebuilt per transaction')
+
+    def handle(self, *args, **options):
+        bounds = Attendance.objects.aggregate(first=Min('date'), last=Max('date'))
+        date_from = self.parse_date(options['date_from']) or bounds['first']
+        date_to = self.parse_date(options['date_to']) or bounds['last']
+        if date_from is None or date_to is None:
+            self.stdout.write("No attendance to roll up")
+            return
+        if date_from > date_to:
+            raise CommandError("--from must not be after --to")
+
+        # Chunk so each transaction stays short on large backfills
+        start = date_from
+        while start <= date_to:
+            end = min(start + timedelta(days=options['chunk_days'] - 1), date_to)
+            DailyTimesheet.objects.rebuild(start, end, employee_id=options['employee'])
+            self.stdout.write(f"Rebuilt {start} to {end}")
+            start = end + timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(f"Timesheets rebuilt from {date_from} to {date_to}"))
+
+    def parse_date(self, value):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f"Invalid date: {value}")
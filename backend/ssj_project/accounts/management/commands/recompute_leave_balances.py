@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import LeaveBalance
+
+
+class Command(BaseCommand):
+    help = 'Check every leave balance against the sum of its ledger entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Reset mismatched balances to their ledger totals')
+
+    def handle(self, *args, **options):
+        mismatches = LeaveBalance.objects.mismatches()
+        for employee_id, balance, total in mismatches:
+            self.stdout.write(f"Employee {employee_id}: balance {balance}, ledger {total}")
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("All leave balances match the ledger"))
+        elif options['fix']:
+            changed = LeaveBalance.objects.recompute()
+            self.stdout.write(self.style.SUCCESS(f"Recomputed {changed} leave balances"))
+        else:
+            raise CommandError(f"{len(mismatches)} leave balances disagree with the ledger; rerun with --fix")
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+from accounts.partitioning import PartitionError, restore_partition
+
+
+class Command(BaseCommand):
+    help = 'Load attendance partitions dumped by archive_partitions and attach them again'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Archive files (<table>_pYYYY_MM.csv.gz)')
+
+    def handle(self, *args, **options):
+        for path in options['paths']:
+            try:
+                table, rows = restore_partition(path)
+            except (PartitionError, OSError) as e:
+                raise CommandError(str(e))
+            self.stdout.write(f"Restored {rows} rows into {table} from {path}")
+
+        self.stdout.write(self.style.SUCCESS("Restore complete"))
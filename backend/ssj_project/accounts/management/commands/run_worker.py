@@ -0,0 +1,91 @@
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from accounts.jobs import JOB_HANDLERS
+from accounts.models import Job
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once the queue is empty instead of polling',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between polls when the queue is empty',
+        )
+        parser.add_argument(
+            '--stale-after',
+            type=int,
+            default=600,
+            help='Reclaim running jobs with no heartbeat for this many seconds',
+        )
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=Job.MAX_ATTEMPTS,
+            help='Fail a stale job instead of reclaiming it once it has been claimed this many times',
+        )
+
+    def handle(self, *args, **options):
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        stale_after = timedelta(seconds=options['stale_after'])
+        # Beat well inside the stale window so a slow step never looks dead
+        self.heartbeat_interval = max(1.0, options['stale_after'] / 3)
+        self.stdout.write(f"Worker {worker} started")
+
+        while True:
+            close_old_connections()
+            job = Job.objects.claim(worker, stale_after, options['max_attempts'])
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+            self.run_job(job)
+
+    def run_job(self, job):
+        self.stdout.write(f"Running {job}")
+        handler = JOB_HANDLERS.get(job.kind)
+        if handler is None:
+            job.finish(error=f"Unknown job kind: {job.kind}")
+            self.stdout.write(self.style.ERROR(f"Unknown job kind: {job.kind}"))
+            return
+
+        stop = threading.Event()
+        beat = threading.Thread(target=self.send_heartbeats, args=(job, stop), daemon=True)
+        beat.start()
+        try:
+            handler(job)
+        except Exception as e:
+            job.finish(error=f"{e}\n{traceback.format_exc()}")
+            self.stdout.write(self.style.ERROR(f"Job {job.pk} failed: {e}"))
+        else:
+            job.finish()
+            self.stdout.write(self.style.SUCCESS(f"Job {job.pk} succeeded"))
+        finally:
+            stop.set()
+            beat.join()
+
+    def send_heartbeats(self, job, stop):
+        """
+        Keep the job's heartbeat fresh while the handler runs. The thread has
+        its own connection, so beats commit even while the handler is inside a
+        long transaction (e.g. hashing passwords and bulk writing a sync chunk).
+        """
+        try:
+            while not stop.wait(self.heartbeat_interval):
+                job.heartbeat()
+        finally:
+            connection.close()
@@ -0,0 +1,87 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+from accounts.models import OutboxEmail
+from accounts.graph_utils import send_emails_with_graph
+
+
+class Command(BaseCommand):
+    help = 'Send queued outbox emails through Microsoft Graph'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once no emails are due instead of polling',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of emails claimed and sent per round',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between polls when no emails are due',
+        )
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=8,
+            help='Move an email to the dead letter state after this many failed sends',
+        )
+        parser.add_argument(
+            '--lease',
+            type=int,
+            default=300,
+            help='Seconds before a claimed but unfinished email can be claimed again',
+        )
+
+    def handle(self, *args, **options):
+        self.max_attempts = options['max_attempts']
+        lease = timedelta(seconds=options['lease'])
+
+        while True:
+            close_old_connections()
+            emails = OutboxEmail.objects.claim(options['batch_size'], lease)
+            if not emails:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+            self.send(emails)
+
+    def send(self, emails):
+        results = send_emails_with_graph({
+            email.pk: {'to_email': email.to_email, 'subject': email.subject, 'body': email.body}
+            for email in emails
+        })
+
+        now = timezone.now()
+        sent = [email.pk for email in emails if results.get(email.pk)]
+        failed = [email for email in emails if not results.get(email.pk)]
+
+        # Drop the body once delivered; credentials emails carry a password
+        OutboxEmail.objects.filter(pk__in=sent).update(status='sent', sent_at=now, body='', last_error=None)
+
+        dead = 0
+        for email in failed:
+            email.last_error = 'Graph API send failed'
+            if email.attempts >= self.max_attempts:
+                email.status = 'dead'
+                dead += 1
+            else:
+                email.next_attempt_at = now + self.retry_delay(email.attempts)
+        OutboxEmail.objects.bulk_update(failed, ['status', 'last_error', 'next_attempt_at'])
+
+        self.stdout.write(
+            f"Sent {len(sent)} emails, {len(failed) - dead} to retry, {dead} dead-lettered"
+        )
+
+    def retry_delay(self, attempts):
+        # 30s, 1m, 2m, 4m ... capped at one hour
+        return timedelta(seconds=min(30 * 2 ** (attempts - 1), 3600))
@@ -1,12 +1,37 @@
 import os
+from collections import defaultdict
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
-from accounts.models import Employee
-from accounts.utils import generate_random_password, send_employee_credentials
-from accounts.graph_utils import get_microsoft_users
+from django.db import transaction
+from django.db.models import Q
+from accounts.authentication import invalidate_cached_users
+from accounts.dashboard import invalidate_dashboard_summary
+from accounts.models import Employee, Job, MicrosoftSyncState, employee_id_prefix, reserve_employee_ids
+from accounts.utils import (
+    generate_random_password, hash_passwords, password_hashing_pool, queue_employee_credentials_bulk,
+)
+from accounts.graph_utils import iter_microsoft_user_pages, iter_microsoft_user_delta_pages, GraphDeltaExpired
 
 User = get_user_model()
 
+DELTA_STATE_NAME = 'users'
+
+# Graph user property -> Employee field
+EMPLOYEE_FIELD_MAP = {
+    'givenName': 'first_name',
+    'surname': 'last_name',
+    'jobTitle': 'position',
+    'department': 'department',
+    'mobilePhone': 'phone',
+    'officeLocation': 'address',
+}
+
+# Graph user property -> User field
+USER_FIELD_MAP = {
+    'givenName': 'first_name',
+    'surname': 'last_name',
+}
+
 class Command(BaseCommand):
     help = 'Sync users from Microsoft 365 to the application'
 
@@ -16,100 +41,302 @@ class Command(BaseCommand):
             action='store_true',
             help='Send credentials to new users',
         )
+        parser.add_argument(
+            '--delta',
+            action='store_true',
+            help='Only apply changes since the last delta sync (full resync on the first run)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of users written per transaction',
+        )
+        parser.add_argument(
+            '--job-id',
+            type=int,
+            help='Background job to report progress to',
+        )
 
     def handle(self, *args, **options):
         send_credentials = options['send_credentials']
-        
-        # Get users from Microsoft Graph API
-        ms_users = get_microsoft_users()
-        
-        if not ms_users:
-            self.stdout.write(self.style.ERROR('Failed to get users from Microsoft 365'))
-            return
-        
-        self.stdout.write(f"Found {len(ms_users)} users in Microsoft 365")
-        
+        self.batch_size = options['batch_size']
+        self.hashing_pool = None
+        self.job = Job.objects.get(pk=options['job_id']) if options.get('job_id') else None
+        self.fetch_error = None
+        self.page_count = 0
+
         # Track statistics
-        created_count = 0
-        updated_count = 0
-        error_count = 0
-        
-        for ms_user in ms_users:
+        self.created_count = 0
+        self.updated_count = 0
+        self.deactivated_count = 0
+        self.error_count = 0
+
+        try:
+            if options['delta']:
+                self.handle_delta(send_credentials)
+            else:
+                self.handle_full(send_credentials)
+        finally:
+            if self.hashing_pool is not None:
+                self.hashing_pool.shutdown()
+            self.report_progress()
+
+        # Print summary
+        self.stdout.write(self.style.SUCCESS(
+            f"Sync completed: {self.created_count} created, {self.updated_count} updated, "
+            f"{self.deactivated_count} deactivated, {self.error_count} errors"
+        ))
+
+    def handle_full(self, send_credentials):
+        # Process users from Microsoft Graph API page by page as they arrive
+        user_count = 0
+        try:
+            for ms_users in iter_microsoft_user_pages():
+                self.page_count += 1
+                user_count += len(ms_users)
+                self.stdout.write(f"Fetched page {self.page_count} with {len(ms_users)} users from Microsoft 365")
+                self.sync_page(ms_users, send_credentials)
+                self.report_progress()
+        except Exception as e:
+            self.fetch_error = str(e)
+            self.stdout.write(self.style.ERROR(f'Failed to get users from Microsoft 365: {e}'))
+            return
+
+        self.stdout.write(f"Found {user_count} users in Microsoft 365")
+
+    def handle_delta(self, send_credentials):
+        state, _ = MicrosoftSyncState.objects.get_or_create(name=DELTA_STATE_NAME)
+        if not state.delta_link:
+            self.stdout.write("No delta link stored, running a full resync")
+
+        try:
+            delta_link = self.sync_delta(state.delta_link, send_credentials)
+        except GraphDeltaExpired:
+            self.stdout.write(self.style.WARNING("Delta link expired, running a full resync"))
+            try:
+                delta_link = self.sync_delta(None, send_credentials)
+            except Exception as e:
+                self.fetch_error = str(e)
+                self.stdout.write(self.style.ERROR(f'Failed to get users from Microsoft 365: {e}'))
+                return
+        except Exception as e:
+            self.fetch_error = str(e)
+            self.stdout.write(self.style.ERROR(f'Failed to get users from Microsoft 365: {e}'))
+            return
+
+        # Only advance once every page has been applied, so a failed run
+        # is simply replayed from the previous link next time
+        if self.error_count:
+            self.stdout.write(self.style.WARNING("Some users failed to sync, keeping the previous delta link"))
+        elif delta_link:
+            state.delta_link = delta_link
+            state.save(update_fields=['delta_link', 'updated_at'])
+
+    def sync_delta(self, delta_link, send_credentials):
+        new_delta_link = None
+        for ms_users, page_delta_link in iter_microsoft_user_delta_pages(delta_link):
+            self.page_count += 1
+            self.stdout.write(f"Fetched delta page {self.page_count} with {len(ms_users)} changes from Microsoft 365")
+            self.sync_page(ms_users, send_credentials)
+            self.report_progress()
+            new_delta_link = page_delta_link or new_delta_link
+        return new_delta_link
+
+    def report_progress(self):
+        if self.job is not None:
+            self.job.report_progress(
+                pages_fetched=self.page_count,
+                created=self.created_count,
+                updated=self.updated_count,
+                deactivated=self.deactivated_count,
+                errors=self.error_count,
+            )
+
+    def sync_page(self, ms_users, send_credentials):
+        for start in range(0, len(ms_users), self.batch_size):
+            chunk = ms_users[start:start + self.batch_size]
             try:
-                email = ms_user.get('mail') or ms_user.get('userPrincipalName')
+                with transaction.atomic():
+                    created, updated, deactivated, new_credentials = self.sync_chunk(chunk, send_credentials)
+            except Exception as e:
+                self.error_count += len(chunk)
+                self.stdout.write(self.style.ERROR(f"Error processing {len(chunk)} users: {str(e)}"))
+                continue
+
+            for user in created:
+                self.stdout.write(self.style.SUCCESS(f"Created user: {user.email}"))
+            for user in updated:
+                self.stdout.write(self.style.SUCCESS(f"Updated user: {user.email}"))
+            for email in deactivated:
+                self.stdout.write(self.style.WARNING(f"Deactivated user: {email}"))
+            self.created_count += len(created)
+            self.updated_count += len(updated)
+            self.deactivated_count += len(deactivated)
+
+            if send_credentials:
+                for employee, _ in new_credentials:
+                    self.stdout.write(self.style.SUCCESS(f"Queued credentials for {employee.user.email}"))
+
+    def sync_chunk(self, ms_users, send_credentials=False):
+        """
+        Apply a chunk of Graph users with a handful of set-based queries:
+        one prefetch, bulk inserts for new rows and bulk updates for rows
+        whose fields actually changed. With `send_credentials`, the new
+        users' credentials emails are queued in the outbox in the same
+        transaction, for `send_outbox_emails` to deliver and retry.
+        """
+        removed = []
+        records = {}
+        for ms_user in ms_users:
+            if '@removed' in ms_user or ms_user.get('accountEnabled') is False:
+                removed.append(ms_user)
+                continue
+            email = ms_user.get('mail') or ms_user.get('userPrincipalName')
+            key = ms_user.get('id') or email
+            if not key:
+                self.stdout.write(self.style.WARNING(f"Skipping user without email: {ms_user.get('displayName')}"))
+                continue
+            records[key] = ms_user
+
+        # Prefetch every existing user in the chunk in one query
+        ms_ids = [r['id'] for r in records.values() if r.get('id')]
+        emails = [r.get('mail') or r.get('userPrincipalName') for r in records.values()]
+        emails = [email for email in emails if email]
+        by_ms_id, by_email = {}, {}
+        if records:
+            existing = User.objects.filter(
+                Q(microsoft_id__in=ms_ids) | Q(email__in=emails)
+            ).select_related('employee_profile')
+            for user in existing:
+                if user.microsoft_id:
+                    by_ms_id[user.microsoft_id] = user
+                by_email[user.email] = user
+
+        new_users = []
+        new_employees = []
+        new_credentials = []
+        # Users whose User row changes vs. users reported as updated at all;
+        # profile-only changes must not rewrite the User row
+        changed_users = {}
+        updated = {}
+        user_update_fields = set()
+        changed_employees = {}
+        employee_update_fields = set()
+        needs_employee_id = []
+
+        for ms_user in records.values():
+            email = ms_user.get('mail') or ms_user.get('userPrincipalName')
+            user = by_ms_id.get(ms_user.get('id')) or by_email.get(email)
+
+            if user is None:
                 if not email:
                     self.stdout.write(self.style.WARNING(f"Skipping user without email: {ms_user.get('displayName')}"))
                     continue
-                
-                # Check if user already exists
-                user, created = User.objects.get_or_create(
+                user = User(
                     email=email,
-                    defaults={
-                        'first_name': ms_user.get('givenName', ''),
-                        'last_name': ms_user.get('surname', ''),
-                        'user_type': 'employee',
-                    }
+                    user_type='employee',
+                    microsoft_id=ms_user.get('id'),
+                    **{field: ms_user.get(key) or '' for key, field in USER_FIELD_MAP.items()}
                 )
-                
-                if created:
-                    # Generate a random password for new users
-                    password = generate_random_password()
-                    user.set_password(password)
-                    user.save()
-                    
-                    # Create or update employee profile
-                    employee, emp_created = Employee.objects.get_or_create(
-                        user=user,
-                        defaults={
-                            'first_name': ms_user.get('givenName', ''),
-                            'last_name': ms_user.get('surname', ''),
-                            'position': ms_user.get('jobTitle', ''),
-                            'department': ms_user.get('department', ''),
-                            'phone': ms_user.get('mobilePhone', ''),
-                            'address': ms_user.get('officeLocation', ''),
-                        }
-                    )
-                    
-                    # Send credentials if requested
-                    if send_credentials:
-                        success = send_employee_credentials(employee, password)
-                        if success:
-                            self.stdout.write(self.style.SUCCESS(f"Sent credentials to {email}"))
-                        else:
-                            self.stdout.write(self.style.WARNING(f"Failed to send credentials to {email}"))
-                    
-                    created_count += 1
-                    self.stdout.write(self.style.SUCCESS(f"Created user: {email}"))
-                else:
-                    # Update existing user
-                    user.first_name = ms_user.get('givenName', user.first_name)
-                    user.last_name = ms_user.get('surname', user.last_name)
-                    user.save()
-                    
-                    # Update employee profile
-                    employee, emp_created = Employee.objects.get_or_create(
-                        user=user,
-                        defaults={
-                            'first_name': ms_user.get('givenName', ''),
-                            'last_name': ms_user.get('surname', ''),
-                        }
-                    )
-                    
-                    if not emp_created:
-                        employee.first_name = ms_user.get('givenName', employee.first_name)
-                        employee.last_name = ms_user.get('surname', employee.last_name)
-                        employee.position = ms_user.get('jobTitle', employee.position)
-                        employee.department = ms_user.get('department', employee.department)
-                        employee.phone = ms_user.get('mobilePhone', employee.phone)
-                        employee.address = ms_user.get('officeLocation', employee.address)
-                        employee.save()
-                    
-                    updated_count += 1
-                    self.stdout.write(self.style.SUCCESS(f"Updated user: {email}"))
-            
-            except Exception as e:
-                error_count += 1
-                self.stdout.write(self.style.ERROR(f"Error processing user {ms_user.get('userPrincipalName')}: {str(e)}"))
-        
-        # Print summary
-        self.stdout.write(self.style.SUCCESS(f"Sync completed: {created_count} created, {updated_count} updated, {error_count} errors"))
+                employee = Employee(
+                    user=user,
+                    **{field: ms_user.get(key) or '' for key, field in EMPLOYEE_FIELD_MAP.items()}
+                )
+                new_users.append(user)
+                new_employees.append(employee)
+                needs_employee_id.append(employee)
+                new_credentials.append((employee, generate_random_password()))
+                # Guard against the same address appearing twice in a chunk
+                by_email[email] = user
+                continue
+
+            if user.pk is None:
+                # Duplicate of a user created earlier in this chunk
+                continue
+
+            # Diff the existing user in memory
+            changes = set()
+            if ms_user.get('id') and user.microsoft_id != ms_user['id']:
+                user.microsoft_id = ms_user['id']
+                changes.add('microsoft_id')
+            for key, field in USER_FIELD_MAP.items():
+                if key in ms_user and getattr(user, field) != (ms_user[key] or ''):
+                    setattr(user, field, ms_user[key] or '')
+                    changes.add(field)
+            if ms_user.get('accountEnabled') is True and not user.is_active:
+                user.is_active = True
+                changes.add('is_active')
+
+            try:
+                employee = user.employee_profile
+            except Employee.DoesNotExist:
+                employee = Employee(
+                    user=user,
+                    **{field: ms_user.get(key) or '' for key, field in EMPLOYEE_FIELD_MAP.items()}
+                )
+                new_employees.append(employee)
+                if not user.employee_id:
+                    needs_employee_id.append(employee)
+                    changes.add('employee_id')
+                updated[user.pk] = user
+            else:
+                employee_changes = set()
+                for key, field in EMPLOYEE_FIELD_MAP.items():
+                    if key in ms_user and (getattr(employee, field) or '') != (ms_user[key] or ''):
+                        setattr(employee, field, ms_user[key] or '')
+                        employee_changes.add(field)
+                if employee_changes:
+                    changed_employees[employee.pk] = employee
+                    employee_update_fields |= employee_changes
+                    updated[user.pk] = user
+
+            if changes:
+                changed_users[user.pk] = user
+                updated[user.pk] = user
+                user_update_fields |= changes
+
+        # Allocate employee IDs per year/department prefix in one go
+        by_prefix = defaultdict(list)
+        for employee in needs_employee_id:
+            by_prefix[employee_id_prefix(employee.department)].append(employee)
+        for prefix, employees in by_prefix.items():
+            employee_ids = reserve_employee_ids(employees[0].department, len(employees))
+            for employee, employee_id in zip(employees, employee_ids):
+                employee.user.employee_id = employee_id
+
+        # Hash the new accounts' passwords in parallel
+        if new_users:
+            if len(new_users) > 1 and self.hashing_pool is None and (os.cpu_count() or 1) > 1:
+                self.hashing_pool = password_hashing_pool()
+            hashed = hash_passwords([password for _, password in new_credentials], pool=self.hashing_pool)
+            for user, password in zip(new_users, hashed):
+                user.password = password
+            User.objects.bulk_create(new_users)
+        if new_employees:
+            Employee.objects.bulk_create(new_employees)
+        if send_credentials and new_credentials:
+            queue_employee_credentials_bulk(new_credentials)
+
+        if changed_users:
+            User.objects.bulk_update(list(changed_users.values()), sorted(user_update_fields))
+        if changed_employees:
+            Employee.objects.bulk_update(list(changed_employees.values()), sorted(employee_update_fields))
+
+        # Deactivate removed and disabled accounts in one statement
+        deactivated = []
+        removed_ids = [r['id'] for r in removed if r.get('id')]
+        removed_emails = [r.get('mail') or r.get('userPrincipalName') for r in removed if not r.get('id')]
+        removed_emails = [email for email in removed_emails if email]
+        if removed_ids or removed_emails:
+            deactivated = list(User.objects.filter(is_active=True).filter(
+                Q(microsoft_id__in=removed_ids) | Q(email__in=removed_emails)
+            ).values_list('pk', 'email'))
+            User.objects.filter(pk__in=[pk for pk, _ in deactivated]).update(is_active=False)
+
+        # Bulk writes skip the save signals, so drop cached auth users here
+        invalidate_cached_users([pk for pk, _ in deactivated] + list(changed_users))
+        if new_employees or deactivated:
+            transaction.on_commit(invalidate_dashboard_summary)
+
+        return new_users, list(updated.values()), [email for _, email in deactivated], new_credentials
@@ -0,0 +1,127 @@
+"""
+Managers shared by apps that keep their own copies of a model, e.g. the
+accounts and attendance apps' Attendance tables. Nothing here imports an
+app's models, so any app can use them without pulling in another's.
+"""
+from django.db import connections, models
+
+
+class AttendanceManager(models.Manager):
+    """
+    Punch path for clock-in/clock-out.
+
+    Each punch is a single statement that resolves the employee from the
+    user id, writes the attendance row and returns it, so concurrent
+    retries of the same punch never race on the (employee, date) key.
+    Works for any attendance model with `employee`, `date`, `status`,
+    `time_in` and `time_out` fields.
+    """
+
+    def _punch_sql(self):
+        employee_model = self.model._meta.get_field('employee').related_model
+        fields = self.model._meta.concrete_fields
+        employee_fields = [
+            f for f in employee_model._meta.concrete_fields
+            if f.attname in ('id', 'first_name', 'last_name')
+        ]
+        returning = ', '.join(f'a.{f.column}' for f in fields)
+        employee_columns = ', '.join(f'e.{f.column}' for f in employee_fields)
+        return {
+            'attendance_table': self.model._meta.db_table,
+            'employee_table': employee_model._meta.db_table,
+            'returning': returning,
+            'employee_columns': employee_columns,
+        }, employee_model, employee_fields
+
+    def _from_row(self, row, employee_model, employee_fields):
+        db = self.db
+        field_count = len(self.model._meta.concrete_fields)
+        attendance = self.model.from_db(
+            db, [f.attname for f in self.model._meta.concrete_fields], row[:field_count]
+        )
+        attendance.employee = employee_model.from_db(
+            db, [f.attname for f in employee_fields], row[field_count:]
+        )
+        return attendance
+
+    def clock_in(self, user_id, day, when):
+        """
+        Insert today's row, or fill in `time_in` on an existing row that has
+        none. Returns the attendance, or None if the user has no employee
+        profile.
+        """
+        parts, employee_model, employee_fields = self._punch_sql()
+        sql = """
+            WITH e AS (
+                SELECT {employee_columns} FROM {employee_table} e WHERE e.user_id = %s
+            ), a AS (
+                INSERT INTO {attendance_table} AS a (employee_id, date, status, time_in)
+                SELECT e.id, %s, 'present', %s FROM e
+                ON CONFLICT (employee_id, date) DO UPDATE SET
+                    time_in = COALESCE(a.time_in, EXCLUDED.time_in),
+                    status = CASE WHEN a.time_in IS NULL THEN EXCLUDED.status ELSE a.status END
+                RETURNING *
+            )
+            SELECT {returning}, {employee_columns} FROM a JOIN e ON e.id = a.employee_id
+        """.format(**parts)
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, [user_id, day, when])
+            row = cursor.fetchone()
+        return self._from_row(row, employee_model, employee_fields) if row else None
+
+    def clock_out(self, user_id, day, when):
+        """
+        Set `time_out` on today's row if it has been clocked in. Returns the
+        attendance, or None if there was nothing to clock out of.
+        """
+        parts, employee_model, employee_fields = self._punch_sql()
+        sql = """
+            UPDATE {attendance_table} AS a SET time_out = %s
+            FROM {employee_table} e
+            WHERE a.employee_id = e.id AND e.user_id = %s AND a.date = %s
+                AND a.time_in IS NOT NULL
+            RETURNING {returning}, {employee_columns}
+        """.format(**parts)
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, [when, user_id, day])
+            row = cursor.fetchone()
+        return self._from_row(row, employee_model, employee_fields) if row else None
+
+    def materialize_absences(self, date_from, date_to, workdays=(1, 2, 3, 4, 5)):
+        """
+        Insert an 'absent' row for every workday from `date_from` to
+        `date_to` on which an active employee who had joined has no
+        attendance and no approved leave. `workdays` are ISO weekdays
+        (Monday is 1). One INSERT ... SELECT covers the whole range, and
+        ON CONFLICT DO NOTHING makes reruns and races with clock-in
+        harmless. Returns the number of rows inserted.
+        """
+        employee_model = self.model._meta.get_field('employee').related_model
+        user_model = employee_model._meta.get_field('user').related_model
+        leave_model = employee_model._meta.get_field('leave_requests').related_model
+        sql = """
+            INSERT INTO {attendance_table} (employee_id, date, status)
+            SELECT e.id, g.day::date, 'absent'
+            FROM generate_series(%s::date, %s::date, INTERVAL '1 day') AS g(day)
+            JOIN {employee_table} e ON e.date_joined <= g.day::date
+            JOIN {user_table} u ON u.id = e.user_id AND u.is_active
+            WHERE EXTRACT(ISODOW FROM g.day)::integer = ANY(%s)
+                AND NOT EXISTS (
+                    SELECT 1 FROM {attendance_table} a
+                    WHERE a.employee_id = e.id AND a.date = g.day::date
+                )
+                AND NOT EXISTS (
+                    SELECT 1 FROM {leave_table} l
+                    WHERE l.employee_id = e.id AND l.status = 'approved'
+                        AND l.start_date <= g.day::date AND l.end_date >= g.day::date
+                )
+            ON CONFLICT (employee_id, date) DO NOTHING
+        """.format(
+            attendance_table=self.model._meta.db_table,
+            employee_table=employee_model._meta.db_table,
+            user_table=user_model._meta.db_table,
+            leave_table=leave_model._meta.db_table,
+        )
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, [date_from, date_to, list(workdays)])
+            return cursor.rowcount
@@ -0,0 +1,66 @@
+from django.utils.functional import SimpleLazyObject
+from .models import Employee
+
+EMPLOYEE_PK_CLAIM = 'employee_pk'
+
+
+def get_employee_pk(request):
+    """
+    Return the current user's Employee primary key, or None.
+
+    Read from the JWT claim when the request was authenticated with a token
+    that carries one, otherwise looked up once and cached on the request.
+    A null claim (no profile at login) is looked up too, since the profile
+    may have been created since.
+    """
+    request = getattr(request, '_request', request)
+    if not hasattr(request, '_cached_employee_pk'):
+        token = getattr(request, 'auth', None)
+        user = getattr(request, 'user', None)
+        if token is not None and token.get(EMPLOYEE_PK_CLAIM) is not None:
+            employee_pk = token[EMPLOYEE_PK_CLAIM]
+        elif user is not None and user.is_authenticated:
+            employee_pk = Employee.objects.filter(user_id=user.pk).values_list('pk', flat=True).first()
+        else:
+            employee_pk = None
+        request._cached_employee_pk = employee_pk
+    return request._cached_employee_pk
+
+
+def get_employee(request):
+    """
+    Return the current user's Employee, loading it at most once per request.
+
+    Raises Employee.DoesNotExist if the user has no employee profile.
+    """
+    request = getattr(request, '_request', request)
+    if not hasattr(request, '_cached_employee'):
+        employee_pk = get_employee_pk(request)
+        if employee_pk is None:
+            raise Employee.DoesNotExist("Employee matching query does not exist.")
+        request._cached_employee = Employee.objects.select_related('user').get(pk=employee_pk)
+    return request._cached_employee
+
+
+def forget_employee(request):
+    """Drop the employee cached on the request, e.g. after creating the profile."""
+    request = getattr(request, '_request', request)
+    for attr in ('_cached_employee_pk', '_cached_employee'):
+        if hasattr(request, attr):
+            delattr(request, attr)
+
+
+class EmployeeMiddleware:
+    """
+    Expose the current user's Employee as `request.employee`.
+
+    The value is resolved lazily, on first access inside the view, so it
+    sees the user and token set by DRF authentication.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.employee = SimpleLazyObject(lambda: get_employee(request))
+        return self.get_response(request)
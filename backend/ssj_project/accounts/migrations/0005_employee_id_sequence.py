@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-16 20:59
+
+from django.db import migrations, models
+
+
+def seed_sequences(apps, schema_editor):
+    """Start each counter after the highest employee ID already issued."""
+    User = apps.get_model('accounts', 'User')
+    EmployeeIdSequence = apps.get_model('accounts', 'EmployeeIdSequence')
+    last_values = {}
+    for employee_id in User.objects.filter(employee_id__regex=r'^[0-9]{7,}$').values_list('employee_id', flat=True):
+        key = (int(employee_id[:2]), employee_id[2])
+        last_values[key] = max(last_values.get(key, 0), int(employee_id[3:]))
+    EmployeeIdSequence.objects.bulk_create([
+        EmployeeIdSequence(year=year, department_code=department_code, last_value=last_value)
+        for (year, department_code), last_value in last_values.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_outbox_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeIdSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('department_code', models.CharField(max_length=5)),
+                ('last_value', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='employeeidsequence',
+            constraint=models.UniqueConstraint(fields=('year', 'department_code'), name='unique_employee_id_sequence'),
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-16 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_attendance_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['date', 'id'], name='accounts_at_date_264a30_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['created_at', 'id'], name='accounts_le_created_7a0cb6_idx'),
+        ),
+    ]
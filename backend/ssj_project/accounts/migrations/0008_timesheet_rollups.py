@@ -0,0 +1,57 @@
+# Generated by Django 4.2.30 on 2026-10-16 21:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyTimesheet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('worked_seconds', models.PositiveIntegerField(default=0)),
+                ('is_present', models.BooleanField(default=False)),
+                ('is_late', models.BooleanField(default=False)),
+                ('is_half_day', models.BooleanField(default=False)),
+                ('is_absent', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_timesheets', to='accounts.employee')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MonthlyTimesheet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('worked_seconds', models.PositiveIntegerField(default=0)),
+                ('days_present', models.PositiveSmallIntegerField(default=0)),
+                ('late_count', models.PositiveSmallIntegerField(default=0)),
+                ('half_day_count', models.PositiveSmallIntegerField(default=0)),
+                ('absent_count', models.PositiveSmallIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_timesheets', to='accounts.employee')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['month', 'id'], name='accounts_mo_month_9cc76c_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='monthlytimesheet',
+            constraint=models.UniqueConstraint(fields=('employee', 'month'), name='unique_monthly_timesheet'),
+        ),
+        migrations.AddIndex(
+            model_name='dailytimesheet',
+            index=models.Index(fields=['date', 'id'], name='accounts_da_date_57fd29_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailytimesheet',
+            constraint=models.UniqueConstraint(fields=('employee', 'date'), name='unique_daily_timesheet'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from accounts.migrations._partitioning import partition_table, unpartition_table
+
+
+def partition_attendance(apps, schema_editor):
+    partition_table(schema_editor, 'accounts_attendance', 'date')
+
+
+def unpartition_attendance(apps, schema_editor):
+    unpartition_table(schema_editor, 'accounts_attendance', 'date')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_timesheet_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_attendance, unpartition_attendance),
+    ]
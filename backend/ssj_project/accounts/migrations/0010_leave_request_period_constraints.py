@@ -0,0 +1,52 @@
+import accounts.models
+import django.contrib.postgres.constraints
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models
+
+
+def clean_leave_periods(apps, schema_editor):
+    """
+    Fix rows the new constraints would reject: swap inverted date ranges, and
+    send approved leave that overlaps an earlier approved request back to
+    pending so an admin can decide it again.
+    """
+    LeaveRequest = apps.get_model('accounts', 'LeaveRequest')
+    table = schema_editor.quote_name(LeaveRequest._meta.db_table)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"""
+            UPDATE {table} SET start_date = end_date, end_date = start_date
+            WHERE end_date < start_date
+        """)
+        swapped = cursor.rowcount
+        cursor.execute(f"""
+            UPDATE {table} r SET status = 'pending'
+            WHERE r.status = 'approved' AND EXISTS (
+                SELECT 1 FROM {table} o
+                WHERE o.employee_id = r.employee_id AND o.status = 'approved' AND o.id < r.id
+                  AND daterange(o.start_date, o.end_date, '[]') && daterange(r.start_date, r.end_date, '[]')
+            )
+        """)
+        reopened = cursor.rowcount
+    if swapped or reopened:
+        print(f"\n  Swapped {swapped} inverted leave request(s); reopened {reopened} overlapping approval(s).")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_partition_attendance'),
+    ]
+
+    operations = [
+        migrations.RunPython(clean_leave_periods, migrations.RunPython.noop),
+        # The exclusion constraint's GiST index needs btree_gist for employee_id =
+        BtreeGistExtension(),
+        migrations.AddConstraint(
+            model_name='leaverequest',
+            constraint=models.CheckConstraint(check=models.Q(end_date__gte=models.F('start_date')), name='leave_request_end_date_after_start_date'),
+        ),
+        migrations.AddConstraint(
+            model_name='leaverequest',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(status='approved'), expressions=[(accounts.models.DateRange('start_date', 'end_date'), '&&'), ('employee', '=')], name='exclude_overlapping_approved_leave'),
+        ),
+    ]
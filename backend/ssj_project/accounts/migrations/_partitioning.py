@@ -0,0 +1,144 @@
+"""
+Table conversion used by accounts 0009 and attendance 0002 to range
+partition the attendance tables by month. It is frozen with those
+migrations and imports neither accounts.partitioning nor settings, so
+later changes there can't alter what the migrations do. The leading
+underscore keeps the migration loader from treating it as a migration.
+"""
+from datetime import date
+
+from django.utils import timezone
+
+# ATTENDANCE_PARTITION_MONTHS_AHEAD's default when these migrations were written
+MONTHS_AHEAD = 3
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y_%m}"
+
+
+def is_partitioned(cursor, table):
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [table])
+    row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+def _table_definition(cursor, table):
+    """
+    Capture the constraints and indexes of `table` so they can be replayed,
+    under the same names, on the table that replaces it.
+    """
+    cursor.execute(
+        """
+        SELECT conname, contype, pg_get_constraintdef(oid)
+        FROM pg_constraint WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'f')
+        """,
+        [table],
+    )
+    constraints = cursor.fetchall()
+    cursor.execute(
+        """
+        SELECT indexdef FROM pg_indexes
+        WHERE tablename = %s AND indexname NOT IN (
+            SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass
+        )
+        """,
+        [table, table],
+    )
+    indexes = [row[0] for row in cursor.fetchall()]
+    return constraints, indexes
+
+
+def _replace_table(cursor, table, column, pk, partitioned):
+    """
+    Rebuild `table` as a partitioned (or plain) table with the same columns,
+    data, identity sequence, constraints and indexes. Indexes are built
+    after the copy, which is faster than maintaining them row by row.
+    """
+    constraints, indexes = _table_definition(cursor, table)
+    legacy = f"{table}_legacy"
+    qn = cursor.db.ops.quote_name
+    cursor.execute(f"ALTER TABLE {qn(table)} RENAME TO {qn(legacy)}")
+    cursor.execute("SELECT pg_get_serial_sequence(%s, %s)", [legacy, pk])
+    sequence = cursor.fetchone()[0]
+    suffix = f" PARTITION BY RANGE ({qn(column)})" if partitioned else ""
+    cursor.execute(
+        f"CREATE TABLE {qn(table)} (LIKE {qn(legacy)} INCLUDING DEFAULTS INCLUDING IDENTITY"
+        f" INCLUDING STORAGE INCLUDING COMMENTS){suffix}"
+    )
+
+    if partitioned:
+        # Monthly partitions over the existing data and the months ahead, with
+        # open-ended partitions at both edges so no insert lacks a partition.
+        # Plain range partitions at the edges (rather than a DEFAULT one) keep
+        # ordered partition scans, so `ORDER BY date DESC LIMIT n` stops in
+        # the newest month.
+        cursor.execute(f"SELECT min({qn(column)}) FROM {qn(legacy)}")
+        first = month_start(cursor.fetchone()[0] or timezone.localdate())
+        last = add_months(month_start(timezone.localdate()), MONTHS_AHEAD)
+        cursor.execute(
+            f"CREATE TABLE {qn(table + '_before')} PARTITION OF {qn(table)} FOR VALUES FROM (MINVALUE) TO (%s)",
+            [first],
+        )
+        month = first
+        while month <= last:
+            cursor.execute(
+                f"CREATE TABLE {qn(partition_name(table, month))} PARTITION OF {qn(table)}"
+                f" FOR VALUES FROM (%s) TO (%s)",
+                [month, add_months(month, 1)],
+            )
+            month = add_months(month, 1)
+        cursor.execute(
+            f"CREATE TABLE {qn(table + '_after')} PARTITION OF {qn(table)} FOR VALUES FROM (%s) TO (MAXVALUE)",
+            [month],
+        )
+
+    cursor.execute(f"INSERT INTO {qn(table)} SELECT * FROM {qn(legacy)}")
+    cursor.execute(f"SELECT coalesce(max({qn(pk)}), 0) + 1 FROM {qn(legacy)}")
+    next_id = cursor.fetchone()[0]
+    cursor.execute(f"ALTER TABLE {qn(table)} ALTER COLUMN {qn(pk)} RESTART WITH {int(next_id)}")
+    cursor.execute(f"DROP TABLE {qn(legacy)}")
+    if sequence:
+        cursor.execute("SELECT pg_get_serial_sequence(%s, %s)", [table, pk])
+        cursor.execute(f"ALTER SEQUENCE {cursor.fetchone()[0]} RENAME TO {qn(sequence.split('.')[-1])}")
+
+    # Partitioned tables need the partition column in every unique key
+    primary_key = f"PRIMARY KEY ({qn(pk)}, {qn(column)})" if partitioned else f"PRIMARY KEY ({qn(pk)})"
+    for name, kind, definition in constraints:
+        if kind == 'p':
+            definition = primary_key
+        cursor.execute(f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} {definition}")
+    for definition in indexes:
+        cursor.execute(definition)
+
+
+def partition_table(schema_editor, table, column='date', pk='id'):
+    """
+    Migration step converting `table` to monthly range partitions on
+    `column`. The copy runs in the migration's transaction and holds an
+    exclusive lock on the table, so run it in a maintenance window on
+    large tables.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        if not is_partitioned(cursor, table):
+            _replace_table(cursor, table, column, pk, partitioned=True)
+
+
+def unpartition_table(schema_editor, table, column='date', pk='id'):
+    """Reverse of partition_table. Archived (detached) months are not brought back."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        if is_partitioned(cursor, table):
+            _replace_table(cursor, table, column, pk, partitioned=False)
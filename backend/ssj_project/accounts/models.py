@@ -1,9 +1,18 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, connections, transaction, IntegrityError
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateRangeField, RangeOperators
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser, BaseUserManager, PermissionsMixin
 from django.utils.translation import gettext_lazy as _
 import random
 import string
 import datetime 
+from collections import defaultdict
+from decimal import Decimal
+
+from .managers import AttendanceManager
+from .partitioning import archived_ranges
 
 class CustomUserManager(BaseUserManager):
     """Define a model manager for User model with no username field."""
@@ -54,6 +63,7 @@ class User(AbstractUser):
     email = models.EmailField(_('email address'), unique=True)
     user_type = models.CharField(max_length=10, choices=USER_TYPE_CHOICES, default='guest')
     employee_id = models.CharField(max_length=10, unique=True, null=True, blank=True)
+    microsoft_id = models.CharField(max_length=64, unique=True, null=True, blank=True)
     
     USERNAME_FIELD = 'email'  # Use email as the username field for authentication
     REQUIRED_FIELDS = []  # Email is already required by default
@@ -68,13 +78,88 @@ class User(AbstractUser):
         return self.email
 
 
+# Map department names to the code used in employee IDs
+DEPARTMENT_CODES = {
+    'IT': '1',
+    'HR': '2',
+    'Finance': '3',
+    'Marketing': '4',
+    'Sales': '5',
+    'Operations': '6',
+    'Customer Support': '7'
+}
+
+
+def employee_id_key(department):
+    """Counter key for a department's employee IDs: (two-digit year, department code)."""
+    return datetime.datetime.now().year % 100, DEPARTMENT_CODES.get(department, '1')
+
+
+def employee_id_prefix(department):
+    """Employee ID prefix: current year's last two digits and the department code."""
+    year, department_code = employee_id_key(department)
+    return f"{year:02d}{department_code}"
+
+
+def reserve_employee_ids(department, count=1):
+    """
+    Reserve the next `count` employee IDs for `department`.
+
+    IDs come from the EmployeeIdSequence counter, so concurrent hires never
+    share an ID. The counter row stays locked until the caller's transaction
+    ends; IDs reserved by a rolled back transaction are handed out again.
+    """
+    year, department_code = employee_id_key(department)
+    last = EmployeeIdSequence.objects.reserve(year, department_code, count)
+    return [f"{year:02d}{department_code}{n:04d}" for n in range(last - count + 1, last + 1)]
+
+
+class EmployeeIdSequenceManager(models.Manager):
+
+    def reserve(self, year, department_code, count=1):
+        """
+        Atomically advance the (year, department_code) counter by `count`
+        and return its new value, creating the counter on first use.
+        """
+        table = self.model._meta.db_table
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (year, department_code, last_value)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (year, department_code)
+                DO UPDATE SET last_value = {table}.last_value + EXCLUDED.last_value
+                RETURNING last_value
+                """,
+                [year, department_code, count],
+            )
+            return cursor.fetchone()[0]
+
+
+class EmployeeIdSequence(models.Model):
+    """Last employee ID number handed out per year and department code."""
+    year = models.PositiveSmallIntegerField()
+    department_code = models.CharField(max_length=5)
+    last_value = models.PositiveIntegerField(default=0)
+    
+    objects = EmployeeIdSequenceManager()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['year', 'department_code'], name='unique_employee_id_sequence'),
+        ]
+    
+    def __str__(self):
+        return f"{self.year:02d}{self.department_code}: {self.last_value}"
+
+
 class Employee(models.Model):
     """Employee profile model."""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='employee_profile')
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
     position = models.CharField(max_length=100)
-    department = models.CharField(max_length=100)
+    department = models.CharField(max_length=100, db_index=True)
     phone = models.CharField(max_length=20, null=True, blank=True)
     address = models.TextField(null=True, blank=True)
     profile_picture = models.ImageField(upload_to='profile_pictures/', null=True, blank=True)
@@ -86,41 +171,8 @@ class Employee(models.Model):
     def save(self, *args, **kwargs):
         # Generate employee ID if not already set
         if not self.user.employee_id:
-        # Get current year's last two digits
-            current_year = str(datetime.datetime.now().year)[-2:]
-        
-        # Get department code (default to 1 if not available)
-            dept_code = '1'  # Default department code
-            if self.department:
-            # Map department names to codes
-                dept_mapping = {
-                'IT': '1',
-                'HR': '2',
-                'Finance': '3',
-                'Marketing': '4',
-                'Sales': '5',
-                'Operations': '6',
-                'Customer Support': '7'
-            }
-                dept_code = dept_mapping.get(self.department, '1')
-        
-        # Get the latest employee with the same year and department
-            latest_employee = Employee.objects.filter(user__employee_id__startswith=f"{current_year}{dept_code}"
-        ).order_by('-user__employee_id').first()
-        
-            if latest_employee and latest_employee.user.employee_id:
-            # Extract the numeric part and increment
-                try:
-                    emp_num = int(latest_employee.user.employee_id[3:])
-                    self.user.employee_id = f"{current_year}{dept_code}{(emp_num + 1):04d}"
-                except ValueError:
-                # Fallback if format is different
-                    self.user.employee_id = f"{current_year}{dept_code}0001"
-            else:
-            # First employee with this year and department
-               self.user.employee_id = f"{current_year}{dept_code}0001"
-        
-            self.user.save()
+            self.user.employee_id = reserve_employee_ids(self.department)[0]
+            self.user.save(update_fields=['employee_id'])
     
         super().save(*args, **kwargs)
 
@@ -140,13 +192,155 @@ class Attendance(models.Model):
     time_in = models.DateTimeField(null=True, blank=True)
     time_out = models.DateTimeField(null=True, blank=True)
     
+    objects = AttendanceManager()
+    
     class Meta:
         unique_together = ('employee', 'date')
+        indexes = [
+            models.Index(fields=['date', 'status']),
+            # Keyset pagination order ('-date', '-id')
+            models.Index(fields=['date', 'id']),
+        ]
     
     def __str__(self):
         return f"{self.employee} - {self.date} - {self.status}"
 
 
+class DateRange(models.Func):
+    """Inclusive daterange(start, end, '[]') over two date expressions."""
+    function = 'DATERANGE'
+    output_field = DateRangeField()
+    
+    def __init__(self, start, end, **extra):
+        super().__init__(start, end, models.Value('[]'), **extra)
+
+
+def leave_period():
+    """The days a leave request covers, as indexed by its exclusion constraint."""
+    return DateRange('start_date', 'end_date')
+
+
+class LeaveRequestManager(models.Manager):
+    """
+    Date window queries on leave. They compare `leave_period()` with the
+    && operator so Postgres can answer them from the GiST index behind the
+    approved-leave exclusion constraint.
+    """
+
+    def overlapping(self, date_from, date_to):
+        """Leave requests covering any day from `date_from` to `date_to` inclusive."""
+        return self.alias(period=leave_period()).filter(
+            period__overlap=(date_from, date_to + datetime.timedelta(days=1))
+        )
+
+    def on_leave(self, date_from, date_to):
+        """Approved leave covering any day from `date_from` to `date_to` inclusive."""
+        return self.overlapping(date_from, date_to).filter(status='approved')
+
+    def decide(self, leave_request, status):
+        """
+        Approve or reject `leave_request` and post the ledger entry for the
+        change: a debit of its days when it becomes approved, a reversal
+        when approved leave is rejected. The row is locked while deciding,
+        so a double click never posts twice.
+        
+        Raises InsufficientLeaveBalance, leaving nothing changed, when
+        settings.LEAVE_BALANCE_ENFORCED is on and the debit would take the
+        balance below zero.
+        """
+        with transaction.atomic(using=self.db):
+            previous = self.select_for_update().values_list('status', flat=True).get(pk=leave_request.pk)
+            leave_request.status = status
+            leave_request.save(update_fields=['status', 'updated_at'])
+            if status == 'approved' and previous != 'approved':
+                entry = LeaveLedgerEntry(kind='approval', days=-leave_request.days)
+            elif status != 'approved' and previous == 'approved':
+                # Reverse what the ledger holds for the request; leave approved
+                # before the ledger existed was never debited
+                debited = leave_request.debited_days()
+                if debited <= 0:
+                    return leave_request
+                entry = LeaveLedgerEntry(kind='reversal', days=debited)
+            else:
+                return leave_request
+            entry.employee_id = leave_request.employee_id
+            entry.leave_request = leave_request
+            balances = LeaveBalance.objects.db_manager(self.db).post([entry])
+            if entry.kind == 'approval' and getattr(settings, 'LEAVE_BALANCE_ENFORCED', False):
+                balance = balances[leave_request.employee_id]
+                if balance < 0:
+                    leave_request.status = previous
+                    raise InsufficientLeaveBalance(balance - entry.days, leave_request.days)
+        return leave_request
+
+    def decide_many(self, ids, status):
+        """
+        Approve or reject the pending requests among `ids` with one
+        UPDATE ... WHERE id = ANY(...) AND status = 'pending' RETURNING, and
+        post the debits for approvals as one ledger batch.
+        
+        Approvals overlapping the employee's approved leave, or an earlier
+        id in the same batch, are left pending, as are those the balance
+        can't cover when settings.LEAVE_BALANCE_ENFORCED is on. Returns
+        {id: outcome}, the outcome being the new status, 'overlap',
+        'insufficient_balance' or 'not_pending'.
+        """
+        ids = sorted(set(ids))
+        outcomes = {}
+        table = self.model._meta.db_table
+        enforced = getattr(settings, 'LEAVE_BALANCE_ENFORCED', False)
+        with transaction.atomic(using=self.db), connections[self.db].cursor() as cursor:
+            if status == 'approved':
+                cursor.execute(f"""
+                    SELECT r.id FROM {table} r
+                    WHERE r.id = ANY(%s) AND r.status = 'pending' AND EXISTS (
+                        SELECT 1 FROM {table} o
+                        WHERE o.employee_id = r.employee_id AND o.id <> r.id
+                            AND daterange(o.start_date, o.end_date, '[]') && daterange(r.start_date, r.end_date, '[]')
+                            AND (o.status = 'approved' OR (o.status = 'pending' AND o.id = ANY(%s) AND o.id < r.id))
+                    )
+                """, [ids, ids])
+                outcomes.update((pk, 'overlap') for (pk,) in cursor.fetchall())
+            
+            candidates = [pk for pk in ids if pk not in outcomes]
+            if status == 'approved' and enforced:
+                # Cover requests in id order from each employee's balance
+                cursor.execute(f"""
+                    SELECT r.id, r.employee_id, r.end_date - r.start_date + 1, COALESCE(b.balance, 0)
+                    FROM {table} r LEFT JOIN {LeaveBalance._meta.db_table} b ON b.employee_id = r.employee_id
+                    WHERE r.id = ANY(%s) AND r.status = 'pending'
+                    ORDER BY r.id
+                """, [candidates])
+                remaining = {}
+                for pk, employee_id, days, balance in cursor.fetchall():
+                    remaining.setdefault(employee_id, balance)
+                    if remaining[employee_id] < days:
+                        outcomes[pk] = 'insufficient_balance'
+                    else:
+                        remaining[employee_id] -= days
+                candidates = [pk for pk in candidates if pk not in outcomes]
+            
+            cursor.execute(f"""
+                UPDATE {table} SET status = %s, updated_at = %s
+                WHERE id = ANY(%s) AND status = 'pending'
+                RETURNING id, employee_id, end_date - start_date + 1
+            """, [status, timezone.now(), candidates])
+            rows = cursor.fetchall()
+            
+            if status == 'approved':
+                balances = LeaveBalance.objects.db_manager(self.db).post([
+                    LeaveLedgerEntry(employee_id=employee_id, leave_request_id=pk, kind='approval', days=-days)
+                    for pk, employee_id, days in rows
+                ])
+                # A concurrent approval spent the balance after the check above
+                overdrawn = [balance for balance in balances.values() if balance < 0]
+                if enforced and overdrawn:
+                    raise InsufficientLeaveBalance(min(overdrawn))
+            outcomes.update((pk, status) for pk, _, _ in rows)
+        
+        return {pk: outcomes.get(pk, 'not_pending') for pk in ids}
+
+
 class LeaveRequest(models.Model):
     """Employee leave request model."""
     STATUS_CHOICES = (
@@ -163,5 +357,509 @@ class LeaveRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = LeaveRequestManager()
+    
+    class Meta:
+        indexes = [
+            # Keyset pagination order ('-created_at', '-id')
+            models.Index(fields=['created_at', 'id']),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(end_date__gte=models.F('start_date')),
+                name='leave_request_end_date_after_start_date',
+            ),
+            # Backed by a GiST index on (period, employee_id) over approved
+            # rows; the period comes first so calendar queries use it too
+            ExclusionConstraint(
+                name='exclude_overlapping_approved_leave',
+                expressions=[
+                    (leave_period(), RangeOperators.OVERLAPS),
+                    ('employee', RangeOperators.EQUAL),
+                ],
+                condition=models.Q(status='approved'),
+            ),
+        ]
+    
     def __str__(self):
         return f"{self.employee} - {self.start_date} to {self.end_date} - {self.status}"
+    
+    @property
+    def days(self):
+        """Calendar days covered, counting both ends."""
+        return (self.end_date - self.start_date).days + 1
+    
+    def debited_days(self):
+        """Days the leave ledger currently holds against this request."""
+        total = self.ledger_entries.aggregate(total=models.Sum('days'))['total']
+        return -total if total else Decimal(0)
+
+
+class InsufficientLeaveBalance(Exception):
+    """Approving leave would take the employee's balance below zero."""
+
+    def __init__(self, balance, days=None):
+        if days is None:
+            super().__init__(f"Leave balance would drop to {balance} days")
+        else:
+            super().__init__(f"Leave balance is {balance} days; {days} requested")
+        self.balance = balance
+        self.days = days
+
+
+class LeaveBalanceManager(models.Manager):
+    """
+    Posts to the leave ledger and keeps LeaveBalance in step with it.
+
+    Every change goes through `post`, which appends the ledger entries and
+    adds their sum to each employee's balance row in one transaction, so
+    reading a balance is a single-row lookup.
+    """
+
+    def post(self, entries):
+        """
+        Save the unsaved LeaveLedgerEntry objects in `entries` and apply them
+        to the balances with one upsert. Returns {employee_id: new balance}.
+        """
+        if not entries:
+            return {}
+        totals = defaultdict(Decimal)
+        for entry in entries:
+            totals[entry.employee_id] += Decimal(str(entry.days))
+        # Lock balance rows in employee order so concurrent posts can't deadlock
+        employee_ids = sorted(totals)
+        table = self.model._meta.db_table
+        with transaction.atomic(using=self.db):
+            LeaveLedgerEntry.objects.using(self.db).bulk_create(entries)
+            with connections[self.db].cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    INSERT INTO {table} AS b (employee_id, balance, updated_at)
+                    SELECT employee_id, days, NOW()
+                    FROM unnest(%s::bigint[], %s::numeric[]) AS t(employee_id, days)
+                    ON CONFLICT (employee_id) DO UPDATE SET
+                        balance = b.balance + EXCLUDED.balance,
+                        updated_at = EXCLUDED.updated_at
+                    RETURNING employee_id, balance
+                    """,
+                    [employee_ids, [totals[employee_id] for employee_id in employee_ids]],
+                )
+                return dict(cursor.fetchall())
+
+    def credit(self, employee_ids, days, kind='accrual', note=''):
+        """Post the same `days` to each employee, e.g. a monthly accrual. Returns the new balances."""
+        return self.post([
+            LeaveLedgerEntry(employee_id=employee_id, kind=kind, days=days, note=note)
+            for employee_id in employee_ids
+        ])
+
+    def balance(self, employee_id):
+        """Current balance in days; zero for an employee with no ledger entries."""
+        balance = self.filter(employee_id=employee_id).values_list('balance', flat=True).first()
+        return balance if balance is not None else Decimal(0)
+
+    def can_take(self, employee_id, days):
+        return self.balance(employee_id) >= Decimal(days)
+
+    def mismatches(self):
+        """[(employee_id, balance, ledger total)] for every balance that disagrees with the ledger."""
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(self._ledger_totals_sql(
+                "SELECT COALESCE(l.employee_id, b.employee_id), COALESCE(b.balance, 0), COALESCE(l.total, 0)"
+                " FROM ledger l FULL OUTER JOIN {balance_table} b ON b.employee_id = l.employee_id"
+                " WHERE COALESCE(b.balance, 0) <> COALESCE(l.total, 0)"
+                " ORDER BY 1"
+            ))
+            return cursor.fetchall()
+
+    def recompute(self):
+        """Reset every balance to the sum of its ledger entries. Returns the rows changed."""
+        with transaction.atomic(using=self.db), connections[self.db].cursor() as cursor:
+            cursor.execute(self._ledger_totals_sql(
+                "INSERT INTO {balance_table} AS b (employee_id, balance, updated_at)"
+                " SELECT employee_id, total, NOW() FROM ledger"
+                " ON CONFLICT (employee_id) DO UPDATE SET"
+                " balance = EXCLUDED.balance, updated_at = EXCLUDED.updated_at"
+                " WHERE b.balance <> EXCLUDED.balance"
+            ))
+            changed = cursor.rowcount
+            cursor.execute(self._ledger_totals_sql(
+                "UPDATE {balance_table} b SET balance = 0, updated_at = NOW()"
+                " WHERE b.balance <> 0 AND NOT EXISTS (SELECT 1 FROM ledger l WHERE l.employee_id = b.employee_id)"
+            ))
+            return changed + cursor.rowcount
+
+    def _ledger_totals_sql(self, statement):
+        return (
+            "WITH ledger AS (SELECT employee_id, SUM(days) AS total FROM {ledger_table} GROUP BY employee_id) "
+            + statement
+        ).format(balance_table=self.model._meta.db_table, ledger_table=LeaveLedgerEntry._meta.db_table)
+
+
+class LeaveBalance(models.Model):
+    """An employee's leave balance in days: the running total of their ledger entries."""
+    employee = models.OneToOneField(Employee, on_delete=models.CASCADE, related_name='leave_balance')
+    balance = models.DecimalField(max_digits=7, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = LeaveBalanceManager()
+    
+    def __str__(self):
+        return f"{self.employee} - {self.balance} days"
+
+
+class LeaveLedgerEntry(models.Model):
+    """
+    Append-only record of a change to an employee's leave balance.
+    Credits are positive, debits negative.
+    """
+    KIND_CHOICES = (
+        ('accrual', 'Accrual'),
+        ('approval', 'Approval'),
+        ('reversal', 'Reversal'),
+        ('adjustment', 'Adjustment'),
+    )
+    
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='leave_ledger')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    days = models.DecimalField(max_digits=7, decimal_places=2)
+    leave_request = models.ForeignKey(
+        LeaveRequest, on_delete=models.SET_NULL, null=True, blank=True, related_name='ledger_entries'
+    )
+    note = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['employee', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.employee} - {self.kind} {self.days}"
+
+
+class TimesheetManager(models.Manager):
+    """
+    Maintains the DailyTimesheet and MonthlyTimesheet rollups from attendance.
+
+    Daily rows are upserted from the attendance rows in a date range, then
+    the monthly rows covering that range are re-summed from the daily rows,
+    so a refresh only touches one employee's day and month.
+    """
+
+    def refresh(self, employee_id, day):
+        """Bring one employee's rollups for `day` up to date."""
+        self.rebuild(day, day, employee_id=employee_id)
+
+    def rebuild(self, date_from, date_to, employee_id=None):
+        """
+        Recompute the rollups for every attendance day in the range. Days in
+        archived attendance partitions keep their rollups, since their
+        attendance rows are no longer there to rebuild from.
+        """
+        daily_table = DailyTimesheet._meta.db_table
+        monthly_table = MonthlyTimesheet._meta.db_table
+        attendance_table = Attendance._meta.db_table
+        month_from = date_from.replace(day=1)
+        month_to = (date_to.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+        employee_filter = 'AND employee_id = %s' if employee_id is not None else ''
+        employee_param = [employee_id] if employee_id is not None else []
+
+        with transaction.atomic(using=self.db), connections[self.db].cursor() as cursor:
+            archived = [
+                (lower, upper) for lower, upper in archived_ranges(cursor, attendance_table)
+                if lower <= date_to and upper > date_from
+            ] if connections[self.db].vendor == 'postgresql' else []
+            archived_filter = ''.join('AND NOT (d.date >= %s AND d.date < %s) ' for _ in archived)
+            archived_params = [day for gap in archived for day in gap]
+            cursor.execute(f"""
+                INSERT INTO {daily_table} AS d (
+                    employee_id, date, worked_seconds, is_present, is_late, is_half_day, is_absent, updated_at
+                )
+                SELECT employee_id, date,
+                    COALESCE(GREATEST(EXTRACT(EPOCH FROM time_out - time_in), 0), 0)::integer,
+                    status IN ('present', 'late', 'half_day'),
+                    status = 'late', status = 'half_day', status = 'absent', NOW()
+                FROM {attendance_table}
+                WHERE date BETWEEN %s AND %s {employee_filter}
+                ON CONFLICT (employee_id, date) DO UPDATE SET
+                    worked_seconds = EXCLUDED.worked_seconds,
+                    is_present = EXCLUDED.is_present,
+                    is_late = EXCLUDED.is_late,
+                    is_half_day = EXCLUDED.is_half_day,
+                    is_absent = EXCLUDED.is_absent,
+                    updated_at = EXCLUDED.updated_at
+            """, [date_from, date_to] + employee_param)
+            cursor.execute(f"""
+                DELETE FROM {daily_table} d
+                WHERE date BETWEEN %s AND %s {employee_filter}
+                    {archived_filter}AND NOT EXISTS (
+                        SELECT 1 FROM {attendance_table} a
+                        WHERE a.employee_id = d.employee_id AND a.date = d.date
+                    )
+            """, [date_from, date_to] + employee_param + archived_params)
+            cursor.execute(f"""
+                INSERT INTO {monthly_table} AS m (
+                    employee_id, month, worked_seconds, days_present, late_count,
+                    half_day_count, absent_count, updated_at
+                )
+                SELECT employee_id, date_trunc('month', date)::date,
+                    SUM(worked_seconds),
+                    COUNT(*) FILTER (WHERE is_present),
+                    COUNT(*) FILTER (WHERE is_late),
+                    COUNT(*) FILTER (WHERE is_half_day),
+                    COUNT(*) FILTER (WHERE is_absent),
+                    NOW()
+                FROM {daily_table}
+                WHERE date >= %s AND date < %s {employee_filter}
+                GROUP BY 1, 2
+                ON CONFLICT (employee_id, month) DO UPDATE SET
+                    worked_seconds = EXCLUDED.worked_seconds,
+                    days_present = EXCLUDED.days_present,
+                    late_count = EXCLUDED.late_count,
+                    half_day_count = EXCLUDED.half_day_count,
+                    absent_count = EXCLUDED.absent_count,
+                    updated_at = EXCLUDED.updated_at
+            """, [month_from, month_to] + employee_param)
+            cursor.execute(f"""
+                DELETE FROM {monthly_table} m
+                WHERE month >= %s AND month < %s {employee_filter}
+                    AND NOT EXISTS (
+                        SELECT 1 FROM {daily_table} d
+                        WHERE d.employee_id = m.employee_id
+                            AND d.date >= m.month AND d.date < m.month + INTERVAL '1 month'
+                    )
+            """, [month_from, month_to] + employee_param)
+
+
+class DailyTimesheet(models.Model):
+    """Hours and attendance flags per employee per day, rolled up from Attendance."""
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='daily_timesheets')
+    date = models.DateField()
+    worked_seconds = models.PositiveIntegerField(default=0)
+    is_present = models.BooleanField(default=False)
+    is_late = models.BooleanField(default=False)
+    is_half_day = models.BooleanField(default=False)
+    is_absent = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = TimesheetManager()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'date'], name='unique_daily_timesheet'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.employee} - {self.date}"
+
+
+class MonthlyTimesheet(models.Model):
+    """Per-employee monthly totals, re-summed from DailyTimesheet."""
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='monthly_timesheets')
+    month = models.DateField(help_text='First day of the month')
+    worked_seconds = models.PositiveIntegerField(default=0)
+    days_present = models.PositiveSmallIntegerField(default=0)
+    late_count = models.PositiveSmallIntegerField(default=0)
+    half_day_count = models.PositiveSmallIntegerField(default=0)
+    absent_count = models.PositiveSmallIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'month'], name='unique_monthly_timesheet'),
+        ]
+        indexes = [
+            models.Index(fields=['month', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.employee} - {self.month:%Y-%m}"
+
+
+class MicrosoftSyncState(models.Model):
+    """Persisted Graph delta link for incremental Microsoft 365 syncs."""
+    name = models.CharField(max_length=50, unique=True)
+    delta_link = models.TextField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return self.name
+
+
+class JobManager(models.Manager):
+    """Enqueue and claim background jobs run by the `run_worker` command."""
+
+    def enqueue(self, kind, params=None, dedupe_key=None):
+        """
+        Queue a job and return it. If `dedupe_key` is given and a job with
+        the same key is already queued or running, return that job instead.
+        """
+        if dedupe_key:
+            try:
+                with transaction.atomic():
+                    return self.create(kind=kind, params=params or {}, dedupe_key=dedupe_key)
+            except IntegrityError:
+                existing = self.filter(
+                    dedupe_key=dedupe_key, status__in=Job.ACTIVE_STATUSES
+                ).first()
+                if existing:
+                    return existing
+                # The active job finished in the meantime; queue a fresh one
+        return self.create(kind=kind, params=params or {}, dedupe_key=dedupe_key)
+
+    def claim(self, worker, stale_after, max_attempts=None):
+        """
+        Claim the oldest queued job, or a running job whose worker stopped
+        sending heartbeats, using SELECT ... FOR UPDATE SKIP LOCKED so
+        concurrent workers never pick the same job. Stale jobs that already
+        used `max_attempts` (default Job.MAX_ATTEMPTS) are failed instead.
+        """
+        max_attempts = max_attempts or Job.MAX_ATTEMPTS
+        now = timezone.now()
+        with transaction.atomic():
+            while True:
+                job = self.select_for_update(skip_locked=True).filter(
+                    models.Q(status='queued') |
+                    models.Q(status='running', heartbeat_at__lt=now - stale_after)
+                ).order_by('created_at').first()
+                if job is None:
+                    return None
+                if job.status == 'queued' or job.attempts < max_attempts:
+                    break
+                job.finish(error=f"Worker stopped responding; gave up after {job.attempts} attempts")
+            job.status = 'running'
+            job.worker = worker
+            job.attempts += 1
+            job.started_at = now
+            job.heartbeat_at = now
+            job.save(update_fields=['status', 'worker', 'attempts', 'started_at', 'heartbeat_at'])
+        return job
+
+
+class Job(models.Model):
+    """A unit of background work, e.g. a Microsoft 365 sync."""
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    )
+    ACTIVE_STATUSES = ('queued', 'running')
+    # Claims of a job whose worker died before it is marked failed
+    MAX_ATTEMPTS = 3
+    
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    dedupe_key = models.CharField(max_length=100, null=True, blank=True)
+    progress = models.JSONField(default=dict, blank=True)
+    error = models.TextField(null=True, blank=True)
+    worker = models.CharField(max_length=100, null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    objects = JobManager()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedupe_key'],
+                condition=models.Q(status__in=['queued', 'running']),
+                name='unique_active_job_dedupe_key',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} #{self.pk} - {self.status}"
+    
+    def report_progress(self, **progress):
+        """Merge `progress` into the job's progress and record a heartbeat."""
+        self.progress.update(progress)
+        self.heartbeat_at = timezone.now()
+        Job.objects.filter(pk=self.pk).update(progress=self.progress, heartbeat_at=self.heartbeat_at)
+    
+    def heartbeat(self):
+        """Record that the claiming worker is still alive, without touching progress."""
+        Job.objects.filter(pk=self.pk, worker=self.worker, status='running').update(heartbeat_at=timezone.now())
+    
+    def finish(self, error=None):
+        self.status = 'failed' if error else 'succeeded'
+        self.error = error
+        self.finished_at = timezone.now()
+        self.save(update_fields=['status', 'error', 'finished_at'])
+
+
+class OutboxEmailManager(models.Manager):
+    """Queue emails and claim them for the `send_outbox_emails` command."""
+
+    def enqueue(self, to_email, subject, body):
+        """
+        Queue an email. Call inside the transaction that creates the records
+        it describes, so the email is sent if and only if they are committed.
+        """
+        return self.create(to_email=to_email, subject=subject, body=body)
+
+    def claim(self, limit, lease):
+        """
+        Claim up to `limit` due emails with SELECT ... FOR UPDATE SKIP LOCKED.
+
+        Claimed rows are pushed `lease` into the future, so another worker
+        only picks them up again if this one dies before recording a result.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            emails = list(self.select_for_update(skip_locked=True).filter(
+                status='pending', next_attempt_at__lte=now
+            ).order_by('next_attempt_at')[:limit])
+            if emails:
+                self.filter(pk__in=[email.pk for email in emails]).update(
+                    attempts=models.F('attempts') + 1,
+                    next_attempt_at=now + lease,
+                )
+                for email in emails:
+                    email.attempts += 1
+        return emails
+
+
+class OutboxEmail(models.Model):
+    """An email waiting to be sent through Microsoft Graph."""
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('dead', 'Dead'),
+    )
+    
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    objects = OutboxEmailManager()
+    
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['next_attempt_at'],
+                condition=models.Q(status='pending'),
+                name='outbox_email_pending_idx',
+            ),
+            models.Index(fields=['status', 'sent_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.to_email} - {self.subject} ({self.status})"
@@ -0,0 +1,134 @@
+import csv
+import io
+import json
+from collections import defaultdict
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from .dashboard import invalidate_dashboard_summary
+from .models import Employee, employee_id_prefix, reserve_employee_ids
+from .serializers import EmployeeImportSerializer
+from .utils import generate_random_password, hash_passwords, queue_employee_credentials_bulk
+
+User = get_user_model()
+
+
+class EmployeeImportError(ValueError):
+    """The import file could not be parsed."""
+
+
+def parse_employee_rows(content, format=None):
+    """
+    Parse a bulk import file into a list of row dicts.
+
+    `content` is the file's text; `format` is 'csv' or 'json' and is guessed
+    from the content when omitted. JSON must be an array of objects.
+    """
+    if format is None:
+        format = 'json' if content.lstrip().startswith('[') else 'csv'
+    if format == 'json':
+        try:
+            rows = json.loads(content)
+        except ValueError as e:
+            raise EmployeeImportError(f"Invalid JSON: {e}")
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise EmployeeImportError("JSON imports must be an array of objects")
+        return rows
+    if format == 'csv':
+        reader = csv.DictReader(io.StringIO(content.lstrip('\ufeff')))
+        return [
+            {key.strip(): (value or '').strip() for key, value in row.items() if key}
+            for row in reader
+        ]
+    raise EmployeeImportError(f"Unsupported import format: {format}")
+
+
+def import_employees(rows, send_credentials=True, dry_run=False, hashing_pool=None):
+    """
+    Validate and create employees in bulk.
+
+    Every row is validated before anything is written. Valid rows are then
+    inserted together: passwords are hashed in parallel, IDs come from one
+    reserved block per department prefix, users and employees go in with
+    bulk_create, and credentials emails are queued in the outbox in the
+    same transaction. Returns a report entry per input row.
+    """
+    report = [{'row': index + 1, 'email': row.get('email')} for index, row in enumerate(rows)]
+
+    # Validate every row, including duplicates within the file and against the database
+    valid = []
+    seen = set()
+    for entry, row in zip(report, rows):
+        serializer = EmployeeImportSerializer(data=row)
+        if not serializer.is_valid():
+            entry.update(status='error', errors=serializer.errors)
+            continue
+        data = serializer.validated_data
+        email = User.objects.normalize_email(data['email'])
+        if email.lower() in seen:
+            entry.update(status='error', errors={'email': ['Duplicate email in import.']})
+            continue
+        seen.add(email.lower())
+        data['email'] = email
+        valid.append((entry, data))
+
+    existing = set(
+        email.lower() for email in User.objects.filter(
+            email__in=[data['email'] for _, data in valid]
+        ).values_list('email', flat=True)
+    ) if valid else set()
+    to_create = []
+    for entry, data in valid:
+        if data['email'].lower() in existing:
+            entry.update(status='error', errors={'email': ['A user with this email already exists.']})
+        else:
+            to_create.append((entry, data))
+
+    if dry_run or not to_create:
+        for entry, _ in to_create:
+            entry['status'] = 'valid'
+        return report
+
+    # Hash outside the transaction so the ID counters aren't locked meanwhile
+    passwords = [generate_random_password() for _ in to_create]
+    hashed = hash_passwords(passwords, pool=hashing_pool)
+
+    users = []
+    employees = []
+    for (entry, data), password in zip(to_create, hashed):
+        user = User(
+            email=data['email'],
+            first_name=data['first_name'],
+            last_name=data['last_name'],
+            user_type='employee',
+            password=password,
+        )
+        users.append(user)
+        employees.append(Employee(
+            user=user,
+            first_name=data['first_name'],
+            last_name=data['last_name'],
+            position=data['position'],
+            department=data['department'],
+            phone=data.get('phone') or None,
+            address=data.get('address') or None,
+        ))
+
+    by_prefix = defaultdict(list)
+    for employee in employees:
+        by_prefix[employee_id_prefix(employee.department)].append(employee)
+
+    with transaction.atomic():
+        for prefix, prefix_employees in by_prefix.items():
+            employee_ids = reserve_employee_ids(prefix_employees[0].department, len(prefix_employees))
+            for employee, employee_id in zip(prefix_employees, employee_ids):
+                employee.user.employee_id = employee_id
+        User.objects.bulk_create(users, batch_size=1000)
+        Employee.objects.bulk_create(employees, batch_size=1000)
+        if send_credentials:
+            queue_employee_credentials_bulk(zip(employees, passwords))
+        # bulk_create skips the save signals
+        transaction.on_commit(invalidate_dashboard_summary)
+
+    for (entry, _), employee in zip(to_create, employees):
+        entry.update(status='created', employee_id=employee.user.employee_id, id=employee.pk)
+    return report
@@ -0,0 +1,138 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a composite key such as ('-date', '-id').
+
+    The cursor holds the key of the last row on the page and the next page
+    is read with `WHERE (date, id) < (...) ORDER BY date DESC, id DESC
+    LIMIT n`, so every page costs the same: no COUNT(*) and no OFFSET.
+    The view sets `ordering`; the last field must be unique.
+
+    Clients that still expect a plain list can pass `?paginate=false`
+    during the transition.
+    """
+    page_size = getattr(settings, 'API_PAGE_SIZE', 100)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 1000)
+    cursor_query_param = 'cursor'
+    opt_out_query_param = 'paginate'
+    ordering = ('-id',)
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(self.opt_out_query_param, '').lower() in ('false', '0', 'no'):
+            return None
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = tuple(getattr(view, 'ordering', None) or self.ordering)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        model_fields = [queryset.model._meta.get_field(field) for field in self.fields]
+
+        values, reverse = self.decode_cursor(request, model_fields)
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(self._flip(field) for field in ordering)
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._after(ordering, values))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.page = rows
+        self.next_key = self._key(rows[-1]) if rows and (has_more or reverse) else None
+        self.previous_key = self._key(rows[0]) if rows and (values is not None and (not reverse or has_more)) else None
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.encode_cursor(self.next_key, reverse=False)),
+            ('previous', self.encode_cursor(self.previous_key, reverse=True)),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def encode_cursor(self, key, reverse):
+        if key is None:
+            return None
+        payload = json.dumps({'k': key, 'r': reverse}, separators=(',', ':'))
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, model_fields):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            key = payload['k']
+            if len(key) != len(model_fields):
+                raise ValueError
+            values = [field.to_python(value) for field, value in zip(model_fields, key)]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+        return values, bool(payload.get('r'))
+
+    def _key(self, row):
+        key = []
+        for field in self.fields:
+            value = getattr(row, field)
+            key.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return key
+
+    def _flip(self, field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    def _after(self, ordering, values):
+        """
+        Rows strictly after `values` in `ordering`, written so Postgres can
+        range-scan an index on the leading column.
+        """
+        condition = Q()
+        for index in reversed(range(len(ordering))):
+            field = ordering[index].lstrip('-')
+            lookup = 'lt' if ordering[index].startswith('-') else 'gt'
+            step = Q(**{f'{field}__{lookup}': values[index]})
+            if index < len(ordering) - 1:
+                step |= Q(**{field: values[index]}) & condition
+            condition = step
+        first = ordering[0].lstrip('-')
+        bound = Q(**{f"{first}__{'lte' if ordering[0].startswith('-') else 'gte'}": values[0]})
+        return bound & condition
+
+    def to_html(self):
+        return ''
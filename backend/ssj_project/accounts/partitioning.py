@@ -0,0 +1,226 @@
+import csv
+import gzip
+import os
+import re
+from datetime import date, datetime
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+# Attendance tables range-partitioned by month: table -> partition column
+PARTITIONED_TABLES = {
+    'accounts_attendance': 'date',
+    'attendance_attendance': 'date',
+}
+
+# Months created ahead of the current one so new rows land in monthly partitions,
+# not in the open-ended `_after` partition that later has to be split
+PARTITION_MONTHS_AHEAD = getattr(settings, 'ATTENDANCE_PARTITION_MONTHS_AHEAD', 3)
+
+_BOUND_RE = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+_ARCHIVE_RE = re.compile(r'^(?P<table>\w+)_p(?P<year>\d{4})_(?P<month>\d{2})\.csv\.gz$')
+
+
+class PartitionError(Exception):
+    pass
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y_%m}"
+
+
+def archive_filename(table, month):
+    return f"{partition_name(table, month)}.csv.gz"
+
+
+def parse_archive_filename(path):
+    """Return (table, month) for an archive written by archive_partition."""
+    match = _ARCHIVE_RE.match(os.path.basename(path))
+    if not match or match['table'] not in PARTITIONED_TABLES:
+        raise PartitionError(f"Not an attendance archive: {path}")
+    return match['table'], date(int(match['year']), int(match['month']), 1)
+
+
+def is_partitioned(cursor, table):
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [table])
+    row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+def _bound(value):
+    return None if value in ('MINVALUE', 'MAXVALUE') else datetime.strptime(value.strip("'"), '%Y-%m-%d').date()
+
+
+def partition_bounds(cursor, table):
+    """Return {partition: (lower, upper)}; MINVALUE and MAXVALUE are None."""
+    cursor.execute(
+        """
+        SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+        FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = to_regclass(%s)
+        """,
+        [table],
+    )
+    return {
+        name: tuple(_bound(value) for value in _BOUND_RE.search(bound).groups())
+        for name, bound in cursor.fetchall()
+    }
+
+
+def month_partitions(cursor, table):
+    """Return [(name, first day, first day of next month)] for the monthly partitions, oldest first."""
+    edges = (f"{table}_before", f"{table}_after")
+    return sorted(
+        (
+            (name, lower, upper)
+            for name, (lower, upper) in partition_bounds(cursor, table).items()
+            if name not in edges
+        ),
+        key=lambda partition: partition[1],
+    )
+
+
+def archived_ranges(cursor, table):
+    """
+    Return [(first day, day after last)] for the gaps between attached
+    partitions, i.e. months archived and not restored. Empty for a table
+    that isn't partitioned.
+    """
+    gaps = []
+    previous_upper = None
+    for lower, upper in sorted(partition_bounds(cursor, table).values(), key=lambda bound: bound[0] or date.min):
+        if previous_upper is not None and lower is not None and lower > previous_upper:
+            gaps.append((previous_upper, lower))
+        previous_upper = upper
+    return gaps
+
+
+def _attach_month(cursor, table, name, month):
+    qn = connection.ops.quote_name
+    cursor.execute(
+        f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(name)} FOR VALUES FROM (%s) TO (%s)",
+        [month, add_months(month, 1)],
+    )
+
+
+def create_month_partition(cursor, table, column, month):
+    """
+    Create the partition for `month`, and any missing months before it,
+    by splitting them off the open-ended `_after` partition. Rows already
+    stored there for those months move with them. Returns the names created.
+    """
+    bounds = partition_bounds(cursor, table)
+    if partition_name(table, month) in bounds:
+        return []
+    after = f"{table}_after"
+    tail = bounds[after][0]
+    if month < tail:
+        raise PartitionError(f"{table} has no partition for {month:%Y-%m}; restore it from its archive")
+
+    qn = connection.ops.quote_name
+    created = []
+    cursor.execute(f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(after)}")
+    while tail <= month:
+        name = partition_name(table, tail)
+        cursor.execute(f"CREATE TABLE {qn(name)} (LIKE {qn(table)} INCLUDING DEFAULTS INCLUDING STORAGE)")
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {qn(after)} WHERE {qn(column)} >= %s AND {qn(column)} < %s"
+            f" RETURNING *) INSERT INTO {qn(name)} SELECT * FROM moved",
+            [tail, add_months(tail, 1)],
+        )
+        _attach_month(cursor, table, name, tail)
+        created.append(name)
+        tail = add_months(tail, 1)
+    cursor.execute(
+        f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(after)} FOR VALUES FROM (%s) TO (MAXVALUE)",
+        [tail],
+    )
+    return created
+
+
+def ensure_partitions(table, months_ahead=PARTITION_MONTHS_AHEAD, today=None):
+    """Create partitions from the current month through `months_ahead` months. Returns the names created."""
+    column = PARTITIONED_TABLES[table]
+    with transaction.atomic(), connection.cursor() as cursor:
+        if not is_partitioned(cursor, table):
+            raise PartitionError(f"{table} is not partitioned")
+        last = add_months(month_start(today or timezone.localdate()), months_ahead)
+        return create_month_partition(cursor, table, column, last)
+
+
+def archivable_partitions(table, older_than_months, today=None):
+    """Partitions whose whole month is more than `older_than_months` months before the current one."""
+    cutoff = add_months(month_start(today or timezone.localdate()), -older_than_months)
+    with connection.cursor() as cursor:
+        return [partition for partition in month_partitions(cursor, table) if partition[2] <= cutoff]
+
+
+def archive_partition(table, name, start, directory):
+    """
+    Detach partition `name`, dump it to a gzipped CSV in `directory`, check
+    the file against the table, then drop the table. If anything fails the
+    partition is attached again. Returns (path, rows).
+    """
+    qn = connection.ops.quote_name
+    path = os.path.join(directory, archive_filename(table, start))
+    if os.path.exists(path):
+        raise PartitionError(f"{path} already exists")
+
+    # Detach in its own short transaction; the dump then reads a table nobody writes to
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(name)}")
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {qn(name)}")
+            rows = cursor.fetchone()[0]
+            partial = path + '.partial'
+            with gzip.open(partial, 'wb') as archive:
+                cursor.copy_expert(f"COPY {qn(name)} TO STDOUT WITH (FORMAT csv, HEADER)", archive)
+            with gzip.open(partial, 'rt', newline='') as archive:
+                written = sum(1 for _ in csv.reader(archive)) - 1
+            if written != rows:
+                raise PartitionError(f"{name}: dumped {written} rows, expected {rows}")
+            os.replace(partial, path)
+            cursor.execute(f"DROP TABLE {qn(name)}")
+    except Exception:
+        if os.path.exists(path + '.partial'):
+            os.remove(path + '.partial')
+        with transaction.atomic(), connection.cursor() as cursor:
+            _attach_month(cursor, table, name, start)
+        raise
+    return path, rows
+
+
+def restore_partition(path):
+    """
+    Load an archive written by archive_partition back as an attached
+    partition. The month must still be a gap left by archiving.
+    Returns (table, rows).
+    """
+    table, month = parse_archive_filename(path)
+    name = partition_name(table, month)
+    qn = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        bounds = partition_bounds(cursor, table)
+        if name in bounds:
+            raise PartitionError(f"{name} is already attached")
+        if not bounds[f"{table}_before"][1] <= month < bounds[f"{table}_after"][0]:
+            raise PartitionError(f"{month:%Y-%m} is outside the monthly partitions of {table}")
+        cursor.execute(f"CREATE TABLE {qn(name)} (LIKE {qn(table)} INCLUDING DEFAULTS INCLUDING STORAGE)")
+        with gzip.open(path, 'rb') as archive:
+            cursor.copy_expert(f"COPY {qn(name)} FROM STDIN WITH (FORMAT csv, HEADER)", archive)
+        cursor.execute(f"SELECT count(*) FROM {qn(name)}")
+        rows = cursor.fetchone()[0]
+        _attach_month(cursor, table, name, month)
+    return table, rows
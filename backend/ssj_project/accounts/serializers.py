@@ -1,23 +1,76 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from .models import Employee, Attendance, LeaveRequest
+from django.db import connection, models
+from .models import (
+    Employee, Attendance, LeaveRequest, Job, DailyTimesheet, MonthlyTimesheet, LeaveBalance, LeaveLedgerEntry,
+)
 
 User = get_user_model()
 
-class UserSerializer(serializers.ModelSerializer):
+
+class LazyLoadError(Exception):
+    """A list serializer ran a query per row instead of using eager loading."""
+
+
+class QueryCheckedListSerializer(serializers.ListSerializer):
+    """
+    ListSerializer that raises LazyLoadError if serializing a row runs a
+    query, e.g. a related object missing from select_related. Only active
+    when settings.SERIALIZER_QUERY_CHECK is on (defaults to DEBUG).
+    """
+
+    def to_representation(self, data):
+        if not getattr(settings, 'SERIALIZER_QUERY_CHECK', False):
+            return super().to_representation(data)
+        
+        # The list query and any prefetches run here, before the check
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        items = list(iterable)
+        
+        def block_queries(execute, sql, params, many, context):
+            raise LazyLoadError(
+                f"{type(self.child).__name__} ran a query while serializing a list; "
+                f"add the relation to its select_related_fields or prefetch_related_fields: {sql}"
+            )
+        
+        with connection.execute_wrapper(block_queries):
+            return super().to_representation(items)
+
+
+class EagerLoadingMixin:
+    """
+    Serializers declare the relations they read here; views load them with
+    `setup_eager_loading(queryset)` so list endpoints don't query per row.
+    """
+    select_related_fields = ()
+    prefetch_related_fields = ()
+    
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        if cls.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*cls.prefetch_related_fields)
+        return queryset
+
+class UserSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'email', 'first_name', 'last_name', 'user_type', 'employee_id']
+        list_serializer_class = QueryCheckedListSerializer
         read_only_fields = ['employee_id']
         extra_kwargs = {
             'password': {'write_only': True}
         }
 
 
-class EmployeeSerializer(serializers.ModelSerializer):
+class EmployeeSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     user_email = serializers.EmailField(source='user.email', read_only=True)
     employee_id = serializers.CharField(source='user.employee_id', read_only=True)
     
+    select_related_fields = ('user',)
+    
     class Meta:
         model = Employee
         fields = [
@@ -25,22 +78,28 @@ class EmployeeSerializer(serializers.ModelSerializer):
             'position', 'department', 'phone', 'address', 'profile_picture', 'date_joined'
         ]
         read_only_fields = ['date_joined']
+        list_serializer_class = QueryCheckedListSerializer
 
 
-class AttendanceSerializer(serializers.ModelSerializer):
+class AttendanceSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     employee_name = serializers.SerializerMethodField()
     
+    select_related_fields = ('employee',)
+    
     class Meta:
         model = Attendance
         fields = ['id', 'employee', 'employee_name', 'date', 'status', 'time_in', 'time_out']
+        list_serializer_class = QueryCheckedListSerializer
     
     def get_employee_name(self, obj):
         return f"{obj.employee.first_name} {obj.employee.last_name}"
 
 
-class LeaveRequestSerializer(serializers.ModelSerializer):
+class LeaveRequestSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     employee_name = serializers.SerializerMethodField()
     
+    select_related_fields = ('employee',)
+    
     class Meta:
         model = LeaveRequest
         fields = [
@@ -48,6 +107,133 @@ class LeaveRequestSerializer(serializers.ModelSerializer):
             'reason', 'status', 'created_at', 'updated_at'
         ]
         read_only_fields = ['created_at', 'updated_at']
+        list_serializer_class = QueryCheckedListSerializer
+    
+    def get_employee_name(self, obj):
+        return f"{obj.employee.first_name} {obj.employee.last_name}"
+    
+    def validate(self, attrs):
+        """Reject inverted ranges and overlap with the employee's pending or approved leave."""
+        instance = self.instance
+        start_date = attrs.get('start_date', getattr(instance, 'start_date', None))
+        end_date = attrs.get('end_date', getattr(instance, 'end_date', None))
+        employee_id = attrs['employee'].pk if 'employee' in attrs else getattr(instance, 'employee_id', None)
+        if start_date is None or end_date is None or employee_id is None:
+            return attrs
+        if end_date < start_date:
+            raise serializers.ValidationError({'end_date': "End date must not be before the start date."})
+        
+        overlapping = LeaveRequest.objects.overlapping(start_date, end_date).filter(
+            employee_id=employee_id, status__in=('pending', 'approved')
+        )
+        if instance is not None:
+            overlapping = overlapping.exclude(pk=instance.pk)
+        if overlapping.exists():
+            raise serializers.ValidationError(
+                "A pending or approved leave request already covers some of these dates."
+            )
+        return attrs
+
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'kind', 'status', 'params', 'progress', 'error', 'attempts',
+            'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+
+class EmployeeImportSerializer(serializers.Serializer):
+    """One row of a bulk employee import."""
+    email = serializers.EmailField(max_length=254)
+    first_name = serializers.CharField(max_length=100)
+    last_name = serializers.CharField(max_length=100)
+    position = serializers.CharField(max_length=100)
+    department = serializers.CharField(max_length=100)
+    phone = serializers.CharField(max_length=20, required=False, allow_blank=True, allow_null=True)
+    address = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+
+class DailyTimesheetSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    employee_name = serializers.SerializerMethodField()
+    hours = serializers.SerializerMethodField()
+    
+    select_related_fields = ('employee',)
+    
+    class Meta:
+        model = DailyTimesheet
+        fields = [
+            'id', 'employee', 'employee_name', 'date', 'hours',
+            'is_present', 'is_late', 'is_half_day', 'is_absent'
+        ]
+        read_only_fields = fields
+        list_serializer_class = QueryCheckedListSerializer
+    
+    def get_employee_name(self, obj):
+        return f"{obj.employee.first_name} {obj.employee.last_name}"
+    
+    def get_hours(self, obj):
+        return round(obj.worked_seconds / 3600, 2)
+
+
+class MonthlyTimesheetSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    employee_name = serializers.SerializerMethodField()
+    department = serializers.CharField(source='employee.department', read_only=True)
+    month = serializers.DateField(format='%Y-%m', read_only=True)
+    hours = serializers.SerializerMethodField()
+    
+    select_related_fields = ('employee',)
+    
+    class Meta:
+        model = MonthlyTimesheet
+        fields = [
+            'id', 'employee', 'employee_name', 'department', 'month', 'hours',
+            'days_present', 'late_count', 'half_day_count', 'absent_count'
+        ]
+        read_only_fields = fields
+        list_serializer_class = QueryCheckedListSerializer
+    
+    def get_employee_name(self, obj):
+        return f"{obj.employee.first_name} {obj.employee.last_name}"
+    
+    def get_hours(self, obj):
+        return round(obj.worked_seconds / 3600, 2)
+
+
+class LeaveBalanceSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    employee_name = serializers.SerializerMethodField()
+    department = serializers.CharField(source='employee.department', read_only=True)
+    
+    select_related_fields = ('employee',)
+    
+    class Meta:
+        model = LeaveBalance
+        fields = ['id', 'employee', 'employee_name', 'department', 'balance', 'updated_at']
+        read_only_fields = fields
+        list_serializer_class = QueryCheckedListSerializer
     
     def get_employee_name(self, obj):
         return f"{obj.employee.first_name} {obj.employee.last_name}"
+
+
+class LeaveLedgerEntrySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = LeaveLedgerEntry
+        fields = ['id', 'employee', 'kind', 'days', 'leave_request', 'note', 'created_at']
+        read_only_fields = fields
+        list_serializer_class = QueryCheckedListSerializer
+
+
+class LeaveAdjustmentSerializer(serializers.Serializer):
+    """A manual credit (positive days) or debit (negative days) to one employee's balance."""
+    employee = serializers.PrimaryKeyRelatedField(queryset=Employee.objects.all())
+    days = serializers.DecimalField(max_digits=7, decimal_places=2)
+    note = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+
+
+class LeaveBulkDecisionSerializer(serializers.Serializer):
+    """Leave request ids to approve or reject in one call."""
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=1000)
@@ -0,0 +1,27 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .authentication import user_cache
+from .dashboard import invalidate_dashboard_summary
+from .models import Attendance, Employee, LeaveRequest
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Drop the user from the auth cache whenever the row changes."""
+    user_cache.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Attendance)
+@receiver(post_delete, sender=Attendance)
+@receiver(post_save, sender=LeaveRequest)
+@receiver(post_delete, sender=LeaveRequest)
+@receiver(post_save, sender=Employee)
+@receiver(post_delete, sender=Employee)
+def invalidate_dashboard(sender, instance, **kwargs):
+    """Recompute the dashboard summary after attendance, leave or employee changes."""
+    transaction.on_commit(invalidate_dashboard_summary)
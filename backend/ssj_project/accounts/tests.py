@@ -1,3 +1,1472 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.client import RemoteDisconnected
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
+from django.db import connection, transaction
+from datetime import date, timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import graph_utils
+from .authentication import CachedJWTAuthentication, UserCache, invalidate_cached_users, user_cache
+from .graph_utils import GraphClient
+from .models import (
+    Attendance, DailyTimesheet, Employee, Job, LeaveBalance, LeaveLedgerEntry, LeaveRequest, MicrosoftSyncState,
+    MonthlyTimesheet, OutboxEmail, User,
+    employee_id_prefix, reserve_employee_ids,
+)
+from .dashboard import DASHBOARD_SUMMARY_CACHE_KEY
+from .middleware import EMPLOYEE_PK_CLAIM
+from .onboarding import EmployeeImportError, import_employees, parse_employee_rows
+from .partitioning import (
+    add_months, archivable_partitions, archive_partition, archived_ranges, ensure_partitions, month_start, restore_partition,
+)
+from .serializers import AttendanceSerializer, LazyLoadError, LeaveRequestSerializer
+
+
+class FakeGraphHandler(BaseHTTPRequestHandler):
+    """Stand-in for Graph that can be told to throttle the next N requests."""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._respond()
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = self.rfile.read(length)
+        if self.path.endswith('/$batch'):
+            self._respond_batch(json.loads(payload))
+        else:
+            self._respond()
+
+    def _respond_batch(self, payload):
+        server = self.server
+        responses = []
+        with server.lock:
+            server.requests += 1
+            server.connections.add(self.client_address)
+            for request in payload['requests']:
+                server.batched.append(request)
+                if server.batch_throttle > 0:
+                    server.batch_throttle -= 1
+                    responses.append({'id': request['id'], 'status': 429, 'headers': {'Retry-After': '1'}})
+                elif server.batch_unavailable > 0:
+                    server.batch_unavailable -= 1
+                    responses.append({'id': request['id'], 'status': 503})
+                else:
+                    responses.append({'id': request['id'], 'status': 202})
+        body = json.dumps({'responses': responses}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _respond(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.connections.add(self.client_address)
+            throttle = server.throttle > 0
+            if throttle:
+                server.throttle -= 1
+            unavailable = not throttle and server.unavailable > 0
+            if unavailable:
+                server.unavailable -= 1
+
+        if throttle:
+            body = b'{"error": {"code": "TooManyRequests"}}'
+            self.send_response(429)
+            self.send_header('Retry-After', str(server.retry_after))
+        elif unavailable:
+            body = b'{"error": {"code": "ServiceUnavailable"}}'
+            self.send_response(503)
+        else:
+            body = json.dumps({'value': [], 'auth': self.headers.get('Authorization')}).encode()
+            self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class GraphClientTests(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeGraphHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = 0
+        self.server.connections = set()
+        self.server.throttle = 0
+        self.server.retry_after = 2
+        self.server.batched = []
+        self.server.batch_throttle = 0
+        self.server.unavailable = 0
+        self.server.batch_unavailable = 0
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def make_client(self, **kwargs):
+        host, port = self.server.server_address
+        kwargs.setdefault('tenant_id', f'test-{id(self)}')
+        kwargs.setdefault('backoff_factor', 0.01)
+        return GraphClient(
+            base_url=f'http://{host}:{port}',
+            token_getter=lambda force_refresh=False: 'test-token',
+            **kwargs
+        )
+
+    def test_sends_bearer_token(self):
+        response = self.make_client().get('/v1.0/users')
+        self.assertEqual(response.json()['auth'], 'Bearer test-token')
+
+    def test_retries_throttled_requests_honouring_retry_after(self):
+        self.server.throttle = 2
+        client = self.make_client()
+
+        with mock.patch('accounts.graph_utils.time.sleep') as sleep:
+            response = client.get('/v1.0/users')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [2.0, 2.0])
+
+    def test_gives_up_after_max_retries(self):
+        self.server.throttle = 10
+        client = self.make_client(max_retries=3)
+
+        with mock.patch('accounts.graph_utils.time.sleep'):
+            with self.assertRaises(requests.HTTPError):
+                client.get('/v1.0/users')
+
+        self.assertEqual(self.server.requests, 4)
+
+    def test_backoff_without_retry_after_is_exponential(self):
+        client = self.make_client(backoff_factor=1, max_backoff=100)
+        delays = [client._backoff(attempt) for attempt in range(4)]
+        for attempt, delay in enumerate(delays):
+            self.assertGreaterEqual(delay, 2 ** attempt)
+            self.assertLessEqual(delay, 1.5 * 2 ** attempt)
+
+    def test_post_is_retried_when_throttled_but_not_after_a_server_error(self):
+        client = self.make_client()
+        self.server.throttle = 1
+        self.server.retry_after = 0
+        self.assertEqual(client.post('/v1.0/users/me/sendMail', json={}).status_code, 200)
+        self.assertEqual(self.server.requests, 2)
+
+        # The mail may have gone out before the 503, so it is not resent
+        self.server.unavailable = 1
+        with self.assertRaises(requests.HTTPError):
+            client.post('/v1.0/users/me/sendMail', json={})
+        self.assertEqual(self.server.requests, 3)
+
+        self.server.unavailable = 1
+        self.assertEqual(client.get('/v1.0/users').status_code, 200)
+        self.assertEqual(client.post('/v1.0/search', json={}, idempotent=True).status_code, 200)
+        self.assertEqual(self.server.requests, 6)
+
+    def test_post_is_not_resent_after_a_dropped_connection(self):
+        client = self.make_client()
+        dropped = requests.ConnectionError(ProtocolError('Connection aborted.', RemoteDisconnected()))
+        refused = requests.ConnectionError(MaxRetryError(None, '/v1.0/users', reason=NewConnectionError(None, 'refused')))
+        ok = mock.Mock(status_code=200)
+
+        with mock.patch.object(client.session, 'request', side_effect=[dropped]) as send:
+            with self.assertRaises(requests.ConnectionError):
+                client.post('/v1.0/users/me/sendMail', json={})
+        self.assertEqual(send.call_count, 1)
+
+        # Nothing was sent when connecting failed, and GETs are safe to resend anyway
+        for method, error in (('POST', refused), ('POST', requests.exceptions.ConnectTimeout()), ('GET', dropped)):
+            with mock.patch.object(client.session, 'request', side_effect=[error, ok]) as send:
+                self.assertIs(client.request(method, '/v1.0/users'), ok)
+            self.assertEqual(send.call_count, 2)
+
+    def test_throughput_reuses_pooled_connections(self):
+        client = self.make_client(max_concurrency=4)
+        total = 200
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            statuses = list(pool.map(lambda _: client.get('/v1.0/users').status_code, range(total)))
+
+        self.assertEqual(statuses, [200] * total)
+        self.assertEqual(self.server.requests, total)
+        # Keep-alive means a handful of connections serve every request
+        self.assertLessEqual(len(self.server.connections), 8)
+
+    def test_throughput_under_throttling(self):
+        self.server.throttle = 20
+        self.server.retry_after = 0
+        client = self.make_client(max_concurrency=4, max_retries=25)
+        total = 100
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            statuses = list(pool.map(lambda _: client.get('/v1.0/users').status_code, range(total)))
+
+        self.assertEqual(statuses, [200] * total)
+        self.assertEqual(self.server.requests, total + 20)
+
+    def test_send_emails_with_graph_batches_and_retries_throttled_messages(self):
+        self.server.batch_throttle = 3
+        client = self.make_client()
+        messages = {
+            n: {'to_email': f'user{n}@example.com', 'subject': 'Hi', 'body': 'Hello'}
+            for n in range(45)
+        }
+
+        with mock.patch.object(graph_utils, 'get_graph_client', return_value=client), \
+                mock.patch('accounts.graph_utils.time.sleep') as sleep:
+            results = graph_utils.send_emails_with_graph(messages)
+
+        self.assertEqual(results, {n: True for n in range(45)})
+        # 3 batches of at most 20, plus one resend of the throttled messages
+        self.assertEqual(self.server.requests, 4)
+        self.assertEqual(len(self.server.batched), 48)
+        sleep.assert_called_once_with(1.0)
+
+    def test_send_emails_with_graph_does_not_resend_unavailable_messages(self):
+        self.server.batch_unavailable = 2
+        client = self.make_client()
+        messages = {
+            n: {'to_email': f'user{n}@example.com', 'subject': 'Hi', 'body': 'Hello'}
+            for n in range(5)
+        }
+
+        with mock.patch.object(graph_utils, 'get_graph_client', return_value=client):
+            results = graph_utils.send_emails_with_graph(messages)
+
+        self.assertEqual(results, {0: False, 1: False, 2: True, 3: True, 4: True})
+        self.assertEqual(self.server.requests, 1)
+
+
+class GraphTokenCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.delete_many([graph_utils.GRAPH_TOKEN_CACHE_KEY, graph_utils.GRAPH_TOKEN_LOCK_KEY])
+        self.addCleanup(cache.delete_many, [graph_utils.GRAPH_TOKEN_CACHE_KEY, graph_utils.GRAPH_TOKEN_LOCK_KEY])
+        self.fetches = 0
+        self.fetch_lock = threading.Lock()
+
+    def fake_token_endpoint(self, delay=0):
+        def request_token():
+            time.sleep(delay)
+            with self.fetch_lock:
+                self.fetches += 1
+                return f'token-{self.fetches}', 3600
+        return mock.patch.object(graph_utils, '_request_graph_access_token', side_effect=request_token)
+
+    def test_concurrent_callers_share_one_fetch(self):
+        callers = 16
+        barrier = threading.Barrier(callers)
+
+        def get_token(_):
+            barrier.wait()
+            return graph_utils.get_graph_access_token()
+
+        with self.fake_token_endpoint(delay=0.2):
+            with ThreadPoolExecutor(max_workers=callers) as pool:
+                tokens = list(pool.map(get_token, range(callers)))
+
+        self.assertEqual(tokens, ['token-1'] * callers)
+        self.assertEqual(self.fetches, 1)
+
+    def test_refreshes_before_expiry(self):
+        now = time.time()
+        refresh_at = now + 3600 - graph_utils.GRAPH_TOKEN_EXPIRY_MARGIN
+        with self.fake_token_endpoint(), mock.patch('time.time') as clock:
+            clock.return_value = now
+            self.assertEqual(graph_utils.get_graph_access_token(), 'token-1')
+            clock.return_value = refresh_at - 1
+            self.assertEqual(graph_utils.get_graph_access_token(), 'token-1')
+            # Still valid for GRAPH_TOKEN_EXPIRY_MARGIN seconds, but renewed now
+            clock.return_value = refresh_at + 1
+            self.assertEqual(graph_utils.get_graph_access_token(), 'token-2')
+            self.assertEqual(graph_utils.get_graph_access_token(force_refresh=True), 'token-3')
+        self.assertEqual(self.fetches, 3)
+
+
+class MicrosoftUserPagerTests(SimpleTestCase):
+    def test_follows_next_link_until_last_page(self):
+        pages = [
+            {'value': [{'id': '1'}, {'id': '2'}], '@odata.nextLink': 'https://graph.example/users?$skiptoken=a'},
+            {'value': [{'id': '3'}], '@odata.nextLink': 'https://graph.example/users?$skiptoken=b'},
+            {'value': [{'id': '4'}]},
+        ]
+        client = mock.Mock()
+        client.get.side_effect = [mock.Mock(json=mock.Mock(return_value=page)) for page in pages]
+
+        with mock.patch.object(graph_utils, 'get_graph_client', return_value=client):
+            result = list(graph_utils.iter_microsoft_user_pages())
+
+        self.assertEqual(result, [page['value'] for page in pages])
+        first_call, *next_calls = client.get.call_args_list
+        self.assertEqual(first_call.kwargs['params']['$top'], graph_utils.GRAPH_USERS_PAGE_SIZE)
+        self.assertEqual(
+            [call.args[0] for call in next_calls],
+            ['https://graph.example/users?$skiptoken=a', 'https://graph.example/users?$skiptoken=b'],
+        )
+
+    def test_expired_delta_link_raises(self):
+        client = mock.Mock()
+        client.get.side_effect = requests.HTTPError(response=mock.Mock(status_code=410))
+
+        with mock.patch.object(graph_utils, 'get_graph_client', return_value=client):
+            with self.assertRaises(graph_utils.GraphDeltaExpired):
+                list(graph_utils.iter_microsoft_user_delta_pages('https://graph.example/users/delta?$deltatoken=old'))
+
+
+def ms_user(name, department='IT', **fields):
+    """A Graph user as returned by /users/delta."""
+    return {
+        'id': f'{name}-id', 'mail': f'{name}@example.com', 'givenName': name.title(), 'surname': 'Test',
+        'jobTitle': 'Dev', 'department': department, 'accountEnabled': True, **fields,
+    }
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class MicrosoftDeltaSyncTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        self.pages = {}
+        # Hash in-process rather than in a worker pool
+        patcher = mock.patch('os.cpu_count', return_value=1)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fake_delta_pages(self, delta_link):
+        self.calls.append(delta_link)
+        pages = self.pages[delta_link]
+        if isinstance(pages, Exception):
+            raise pages
+        yield from pages
+
+    def sync(self, **options):
+        self.output = io.StringIO()
+        with mock.patch(
+            'accounts.management.commands.sync_microsoft_users.iter_microsoft_user_delta_pages',
+            self.fake_delta_pages,
+        ):
+            call_command('sync_microsoft_users', delta=True, stdout=self.output, **options)
+        return MicrosoftSyncState.objects.get(name='users').delta_link
+
+    def test_saves_and_resumes_from_the_delta_link(self):
+        self.pages[None] = [([ms_user('alice')], None), ([ms_user('bob')], 'link-1')]
+        self.assertEqual(self.sync(), 'link-1')
+        self.assertEqual(
+            sorted(User.objects.filter(is_active=True).values_list('email', flat=True)),
+            ['alice@example.com', 'bob@example.com'],
+        )
+
+        self.pages['link-1'] = [([{'id': 'bob-id', '@removed': {'reason': 'deleted'}}], 'link-2')]
+        self.assertEqual(self.sync(), 'link-2')
+        self.assertEqual(self.calls, [None, 'link-1'])
+        self.assertFalse(User.objects.get(email='bob@example.com').is_active)
+        self.assertTrue(User.objects.get(email='alice@example.com').is_active)
+
+    def test_creates_updates_and_deactivates_without_rewriting_unchanged_users(self):
+        self.pages[None] = [([ms_user('alice'), ms_user('bob'), ms_user('carol')], 'link-1')]
+        self.sync()
+        users = dict(User.objects.values_list('email', 'pk'))
+
+        self.pages['link-1'] = [([
+            ms_user('alice', department='HR'),
+            ms_user('bob', surname='Renamed'),
+            ms_user('carol', accountEnabled=False),
+            ms_user('dave'),
+        ], 'link-2')]
+        with CaptureQueriesContext(connection) as queries:
+            self.sync()
+
+        self.assertIn('1 created, 2 updated, 1 deactivated, 0 errors', self.output.getvalue())
+        self.assertEqual(Employee.objects.get(user__email='alice@example.com').department, 'HR')
+        self.assertEqual(User.objects.get(email='bob@example.com').last_name, 'Renamed')
+        self.assertFalse(User.objects.get(email='carol@example.com').is_active)
+        self.assertTrue(User.objects.filter(email='dave@example.com', employee_profile__isnull=False).exists())
+        # Alice's profile-only change touches the employee row, not the user row
+        user_updates = [
+            q['sql'] for q in queries.captured_queries
+            if q['sql'].startswith(f'UPDATE "{User._meta.db_table}"') and 'CASE' in q['sql']
+        ]
+        self.assertEqual(len(user_updates), 1)
+        self.assertTrue(user_updates[0].endswith(f"IN ({users['bob@example.com']})"))
+
+    def test_credentials_for_new_users_go_through_the_outbox(self):
+        self.pages[None] = [([ms_user('alice'), ms_user('bob')], 'link-1')]
+        with mock.patch('accounts.graph_utils.send_emails_with_graph') as send:
+            self.sync(send_credentials=True)
+        send.assert_not_called()
+        self.assertEqual(
+            sorted(OutboxEmail.objects.values_list('to_email', 'status')),
+            [('alice@example.com', 'pending'), ('bob@example.com', 'pending')],
+        )
+
+        # Only new accounts get credentials
+        self.pages['link-1'] = [([ms_user('alice', surname='Renamed'), ms_user('carol')], 'link-2')]
+        self.sync(send_credentials=True)
+        self.assertEqual(OutboxEmail.objects.filter(to_email='alice@example.com').count(), 1)
+        self.assertTrue(OutboxEmail.objects.filter(to_email='carol@example.com').exists())
+
+    def test_expired_delta_link_falls_back_to_a_full_sync(self):
+        MicrosoftSyncState.objects.create(name='users', delta_link='stale')
+        self.pages['stale'] = graph_utils.GraphDeltaExpired('410 Gone')
+        self.pages[None] = [([ms_user('alice')], 'link-fresh')]
+
+        self.assertEqual(self.sync(), 'link-fresh')
+        self.assertEqual(self.calls, ['stale', None])
+        self.assertTrue(User.objects.filter(email='alice@example.com', microsoft_id='alice-id').exists())
+
+
+class UserCacheTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+        self.user = User.objects.create(email='cached@example.com', user_type='employee')
+
+    def test_hits_expire_after_ttl_and_evict_least_recently_used(self):
+        cache = UserCache(max_size=2, ttl=60)
+        with mock.patch('accounts.authentication.time.monotonic', return_value=1000):
+            self.assertIsNone(cache.get(1))
+            cache.set(1, self.user)
+            cached = cache.get(1)
+        self.assertEqual(cached.pk, self.user.pk)
+        self.assertIsNot(cached, self.user)
+
+        with mock.patch('accounts.authentication.time.monotonic', return_value=1061):
+            self.assertIsNone(cache.get(1))
+            cache.set(1, self.user)
+            cache.set(2, self.user)
+            cache.get(1)
+            cache.set(3, self.user)
+            self.assertIsNone(cache.get(2))
+            self.assertIsNotNone(cache.get(1))
+        self.assertEqual((cache.stats()['hits'], cache.stats()['misses']), (3, 3))
+
+    def test_authentication_serves_hits_without_queries(self):
+        token = AccessToken.for_user(self.user)
+        authentication = CachedJWTAuthentication()
+        self.assertEqual(authentication.get_user(token).pk, self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(authentication.get_user(token).pk, self.user.pk)
+
+    def test_save_and_delete_invalidate(self):
+        token = AccessToken.for_user(self.user)
+        authentication = CachedJWTAuthentication()
+        authentication.get_user(token)
+
+        # Cached under the token's claim (a string in recent simplejwt); the signal passes the int pk
+        self.assertIsNotNone(user_cache.get(token['user_id']))
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(user_cache.get(token['user_id']))
+        with self.assertRaises(AuthenticationFailed):
+            authentication.get_user(token)
+
+        user_cache.set(token['user_id'], self.user)
+        self.user.delete()
+        self.assertIsNone(user_cache.get(token['user_id']))
+
+    def test_bulk_writes_invalidate_on_commit(self):
+        user_cache.set(str(self.user.pk), self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).update(is_active=False)
+            invalidate_cached_users([self.user.pk])
+            # Still cached until the transaction commits
+            self.assertIsNotNone(user_cache.get(self.user.pk))
+        self.assertIsNone(user_cache.get(self.user.pk))
+
+
+class EmployeeIdAllocationTests(TransactionTestCase):
+    threads = 16
+    hires_per_thread = 5
+
+    def run_concurrently(self, work):
+        barrier = threading.Barrier(self.threads)
+
+        def worker(n):
+            try:
+                barrier.wait()
+                return work(n)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            return list(pool.map(worker, range(self.threads)))
+
+    def test_concurrent_hires_get_unique_sequential_ids(self):
+        def hire(n):
+            for i in range(self.hires_per_thread):
+                with transaction.atomic():
+                    user = User.objects.create(email=f'hire{n}-{i}@example.com', user_type='employee')
+                    Employee.objects.create(
+                        user=user, first_name='New', last_name='Hire', position='Dev', department='IT'
+                    )
+
+        self.run_concurrently(hire)
+
+        total = self.threads * self.hires_per_thread
+        prefix = employee_id_prefix('IT')
+        employee_ids = sorted(User.objects.values_list('employee_id', flat=True))
+        self.assertEqual(employee_ids, [f'{prefix}{n:04d}' for n in range(1, total + 1)])
+
+    def test_reserved_blocks_do_not_overlap(self):
+        blocks = self.run_concurrently(lambda n: reserve_employee_ids('HR', count=n + 1))
+
+        for n, block in enumerate(blocks):
+            self.assertEqual(len(block), n + 1)
+            numbers = [int(employee_id[3:]) for employee_id in block]
+            self.assertEqual(numbers, list(range(numbers[0], numbers[0] + n + 1)))
+        reserved = sorted(employee_id for block in blocks for employee_id in block)
+        total = self.threads * (self.threads + 1) // 2
+        prefix = employee_id_prefix('HR')
+        self.assertEqual(reserved, [f'{prefix}{n:04d}' for n in range(1, total + 1)])
+
+
+@override_settings(SERIALIZER_QUERY_CHECK=True)
+class ListQueryCountTests(TestCase):
+    employees = 5
+    days = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(email='admin@example.com', user_type='admin', is_staff=True)
+        for n in range(cls.employees):
+            user = User.objects.create(email=f'employee{n}@example.com', user_type='employee')
+            employee = Employee.objects.create(
+                user=user, first_name='Employee', last_name=str(n), position='Dev', department='IT'
+            )
+            for day in range(cls.days):
+                Attendance.objects.create(employee=employee, date=date(2024, 1, 1) + timedelta(days=day), status='present')
+            LeaveRequest.objects.create(
+                employee=employee, start_date=date(2024, 2, 1), end_date=date(2024, 2, 2), reason='Trip'
+            )
+        cls.employee_user = user
+
+    def get(self, user, url):
+        client = APIClient(HTTP_HOST='localhost')
+        client.force_authenticate(user)
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def rows(self, response):
+        data = response.json()
+        return data['results'] if isinstance(data, dict) else data
+
+    def test_admin_lists_run_one_query_regardless_of_rows(self):
+        for url, rows in (
+            ('/api/attendance/', self.employees * self.days),
+            ('/api/leave-requests/', self.employees),
+            ('/api/employees/', self.employees),
+            ('/api/users/', self.employees + 1),
+        ):
+            with self.subTest(url=url), self.assertNumQueries(1):
+                response = self.get(self.admin, url)
+            self.assertEqual(len(self.rows(response)), rows)
+
+    def test_employee_lists_run_two_queries(self):
+        # One query resolves the employee, one loads the rows
+        for url, rows in (
+            ('/api/employee/attendance/', self.days),
+            ('/api/employee/leave-requests/', 1),
+            ('/api/attendance/', self.days),
+            ('/api/leave-requests/', 1),
+        ):
+            with self.subTest(url=url), self.assertNumQueries(2):
+                response = self.get(self.employee_user, url)
+            self.assertEqual(len(self.rows(response)), rows)
+
+    def test_attendance_filters(self):
+        first = Employee.objects.order_by('pk').first()
+        Attendance.objects.filter(employee=first, date=date(2024, 1, 2)).update(status='late')
+        for params, rows in (
+            ('date=2024-01-02', self.employees),
+            ('date_from=2024-01-02&date_to=2024-01-03', self.employees * 2),
+            (f'employee={first.pk}', self.days),
+            ('department=IT&date=2024-01-01', self.employees),
+            ('department=HR', 0),
+            ('status=late', 1),
+            ('status=late&status=present&date=2024-01-02', self.employees),
+        ):
+            with self.subTest(params=params), self.assertNumQueries(1):
+                response = self.get(self.admin, f'/api/attendance/?{params}')
+            self.assertEqual(len(self.rows(response)), rows)
+
+    def test_keyset_pagination_walks_forward_and_back(self):
+        expected = list(Attendance.objects.order_by('-date', '-id').values_list('id', flat=True))
+        pages = []
+        url = '/api/attendance/?page_size=3'
+        while url:
+            with self.assertNumQueries(1):
+                data = self.get(self.admin, url).json()
+            pages.append([row['id'] for row in data['results']])
+            url = data['next']
+        self.assertEqual([pk for page in pages for pk in page], expected)
+        self.assertTrue(all(len(page) == 3 for page in pages[:-1]))
+
+        backwards = []
+        url = data['previous']
+        while url:
+            data = self.get(self.admin, url).json()
+            backwards.insert(0, [row['id'] for row in data['results']])
+            url = data['previous']
+        self.assertEqual(backwards, pages[:-1])
+
+    def test_pagination_opt_out_returns_plain_list(self):
+        response = self.get(self.admin, '/api/leave-requests/?paginate=false')
+        self.assertEqual(len(response.json()), self.employees)
+
+    def test_dashboard_summary_is_aggregated_and_invalidated(self):
+        today = timezone.localdate()
+        employees = list(Employee.objects.order_by('pk'))
+        Attendance.objects.create(employee=employees[0], date=today, status='present')
+        Attendance.objects.create(employee=employees[1], date=today, status='late')
+        # On leave today: one came in anyway, the other isn't absent
+        for employee in employees[1:3]:
+            LeaveRequest.objects.create(employee=employee, start_date=today, end_date=today, reason='Off', status='approved')
+        cache.delete(DASHBOARD_SUMMARY_CACHE_KEY)
+
+        with self.assertNumQueries(4):
+            summary = self.get(self.admin, '/api/admin/dashboard/summary/').json()
+        self.assertEqual(
+            [summary[key] for key in ('headcount', 'present', 'late', 'on_leave', 'absent', 'pending_leave_requests')],
+            [self.employees, 1, 1, 2, self.employees - 3, self.employees],
+        )
+        self.assertEqual(summary['departments'][0]['department'], 'IT')
+
+        with self.assertNumQueries(0):
+            self.get(self.admin, '/api/admin/dashboard/summary/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            LeaveRequest.objects.filter(employee=employees[0]).first().delete()
+        summary = self.get(self.admin, '/api/admin/dashboard/summary/').json()
+        self.assertEqual(summary['pending_leave_requests'], self.employees - 1)
+
+    def test_employee_home_bundles_dashboard_data(self):
+        employee = self.employee_user.employee_profile
+        today = timezone.localdate()
+        start = timezone.now() - timedelta(hours=8)
+        Attendance.objects.create(employee=employee, date=today, status='present', time_in=start)
+        Attendance.objects.filter(employee=employee, date__month=today.month, date__year=today.year).update(
+            time_in=start, time_out=start + timedelta(hours=8)
+        )
+
+        # The JWT carries the employee pk, leaving the employee, recent
+        # attendance, pending leave and month-to-date hours queries
+        client = APIClient(HTTP_HOST='localhost')
+        client.force_authenticate(self.employee_user, token={EMPLOYEE_PK_CLAIM: employee.pk})
+        with self.assertNumQueries(4):
+            home = client.get('/api/employee/home/?recent=3').json()
+
+        self.assertEqual(home['profile']['id'], employee.pk)
+        self.assertEqual(home['today']['date'], today.isoformat())
+        self.assertEqual(len(home['recent_attendance']), 3)
+        self.assertEqual(len(home['pending_leave_requests']), 1)
+        self.assertEqual(home['month_to_date_hours'], 8.0)
+
+    def test_timesheet_rollups_follow_admin_edits_and_rebuild(self):
+        employee = Employee.objects.order_by('pk').first()
+        row = Attendance.objects.get(employee=employee, date=date(2024, 1, 1))
+        start = timezone.now().replace(year=2024, month=1, day=1)
+        client = APIClient(HTTP_HOST='localhost')
+        client.force_authenticate(self.admin)
+        # Backfill the fixture rows, which were inserted without rollups
+        call_command('rebuild_timesheets', stdout=io.StringIO())
+
+        response = client.patch(
+            f'/api/attendance/{row.pk}/',
+            {'status': 'late', 'time_in': start.isoformat(), 'time_out': (start + timedelta(hours=7, minutes=30)).isoformat()},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertNumQueries(1):
+            month = self.get(self.admin, f'/api/timesheets/?month=2024-01&employee={employee.pk}').json()['results']
+        self.assertEqual(len(month), 1)
+        self.assertEqual(
+            [month[0][key] for key in ('month', 'hours', 'days_present', 'late_count')],
+            ['2024-01', 7.5, self.days, 1],
+        )
+
+        daily = self.get(self.admin, f'/api/timesheets/daily/?employee={employee.pk}').json()['results']
+        self.assertEqual(len(daily), self.days)
+        self.assertEqual([day['is_late'] for day in daily], [False] * (self.days - 1) + [True])
+
+        # A full rebuild reproduces the incrementally maintained rows
+        incremental = list(MonthlyTimesheet.objects.order_by('employee_id').values_list(
+            'employee_id', 'worked_seconds', 'days_present', 'late_count'
+        ))
+        call_command('rebuild_timesheets', stdout=io.StringIO())
+        rebuilt = list(MonthlyTimesheet.objects.order_by('employee_id').values_list(
+            'employee_id', 'worked_seconds', 'days_present', 'late_count'
+        ))
+        self.assertEqual(rebuilt, incremental)
+        self.assertEqual(len(rebuilt), self.employees)
+
+        client.delete(f'/api/attendance/{row.pk}/')
+        self.assertEqual(
+            MonthlyTimesheet.objects.values_list('worked_seconds', 'days_present', 'late_count').get(employee=employee),
+            (0, self.days - 1, 0),
+        )
+
+    def test_lazy_foreign_key_load_in_list_raises(self):
+        with self.assertRaises(LazyLoadError):
+            AttendanceSerializer(Attendance.objects.all(), many=True).data
+
+        queryset = AttendanceSerializer.setup_eager_loading(Attendance.objects.all())
+        with self.assertNumQueries(1):
+            data = AttendanceSerializer(queryset, many=True).data
+        self.assertEqual(len(data), self.employees * self.days)
+
+    def test_exports_stream_csv_and_gzipped_ndjson(self):
+        response = self.get(self.admin, '/api/admin/exports/attendance/?month=2024-01&status=present')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="attendance-2024-01.csv"')
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), self.employees * self.days)
+        self.assertEqual(rows[0]['date'], '2024-01-01')
+        self.assertEqual(rows[0]['department'], 'IT')
+
+        response = self.get(self.admin, '/api/admin/exports/leave-requests/?output=ndjson&gzip=1&month=2024-02')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(len(lines), self.employees)
+        self.assertEqual(json.loads(lines[0])['days'], 2)
+
+        client = APIClient(HTTP_HOST='localhost')
+        client.force_authenticate(self.admin)
+        self.assertEqual(client.get('/api/admin/exports/attendance/?month=January').status_code, 400)
+        self.assertEqual(client.get('/api/admin/exports/attendance/?output=xlsx').status_code, 400)
+        self.assertEqual(client.get('/api/admin/exports/payroll/').status_code, 404)
+        client.force_authenticate(self.employee_user)
+        self.assertEqual(client.get('/api/admin/exports/attendance/').status_code, 403)
+
+
+class AttendancePunchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='punch@example.com', user_type='employee')
+        cls.employee = Employee.objects.create(
+            user=cls.user, first_name='Punch', last_name='Clock', position='Dev', department='IT'
+        )
+        cls.day = date(2024, 3, 4)
+        cls.morning = timezone.make_aware(timezone.datetime(2024, 3, 4, 9, 0))
+
+    def test_double_clock_in_keeps_one_row_and_the_first_time(self):
+        first = Attendance.objects.clock_in(self.user.pk, self.day, self.morning)
+        second = Attendance.objects.clock_in(self.user.pk, self.day, self.morning + timedelta(minutes=5))
+
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(second.time_in, self.morning)
+        self.assertEqual(second.employee.pk, self.employee.pk)
+        self.assertEqual(Attendance.objects.filter(employee=self.employee).count(), 1)
+
+    def test_clock_in_fills_a_row_recorded_as_absent(self):
+        Attendance.objects.create(employee=self.employee, date=self.day, status='absent')
+
+        attendance = Attendance.objects.clock_in(self.user.pk, self.day, self.morning)
+        self.assertEqual((attendance.status, attendance.time_in), ('present', self.morning))
+        self.assertEqual(Attendance.objects.filter(employee=self.employee).count(), 1)
+
+    def test_repeated_clock_out_updates_the_same_row(self):
+        self.assertIsNone(Attendance.objects.clock_out(self.user.pk, self.day, self.morning))
+        Attendance.objects.clock_in(self.user.pk, self.day, self.morning)
+
+        evening = self.morning + timedelta(hours=8)
+        first = Attendance.objects.clock_out(self.user.pk, self.day, evening)
+        second = Attendance.objects.clock_out(self.user.pk, self.day, evening)
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(Attendance.objects.get(pk=first.pk).time_out, evening)
+        self.assertEqual(Attendance.objects.filter(employee=self.employee).count(), 1)
+
+    def test_user_without_profile_gets_none(self):
+        user = User.objects.create(email='noprofile@example.com', user_type='employee')
+
+        self.assertIsNone(Attendance.objects.clock_in(user.pk, self.day, self.morning))
+        self.assertIsNone(Attendance.objects.clock_out(user.pk, self.day, self.morning))
+        self.assertFalse(Attendance.objects.exists())
+
+    def test_punch_endpoints_are_safe_to_retry(self):
+        client = APIClient(HTTP_HOST='localhost')
+        client.force_authenticate(self.user)
+
+        self.assertEqual(client.post('/api/employee/clock-out/').status_code, 404)
+        responses = [client.post('/api/employee/clock-in/') for _ in range(2)]
+        self.assertEqual([r.status_code for r in responses], [200, 200])
+        self.assertEqual(responses[0].json()['time_in'], responses[1].json()['time_in'])
+        self.assertEqual([client.post('/api/employee/clock-out/').status_code for _ in range(2)], [200, 200])
+        self.assertEqual(Attendance.objects.filter(employee=self.employee).count(), 1)
+
+    @override_settings(TIME_ZONE='Pacific/Kiritimati')
+    def test_home_shows_the_punch_for_the_local_day(self):
+        client = APIClient(HTTP_HOST='localhost')
+        client.force_authenticate(self.user)
+
+        self.assertEqual(client.post('/api/employee/clock-in/').json()['date'], timezone.localdate().isoformat())
+        home = client.get('/api/employee/home/').json()
+        self.assertEqual(home['today']['date'], timezone.localdate().isoformat())
+
+
+class AttendancePartitionTests(TestCase):
+    def test_archive_and_restore_round_trip(self):
+        user = User.objects.create(email='partition@example.com', user_type='employee')
+        employee = Employee.objects.create(user=user, first_name='P', last_name='T', position='Dev', department='IT')
+        next_month = add_months(month_start(timezone.localdate()), 1)
+        Attendance.objects.create(employee=employee, date=next_month, status='present')
+        Attendance.objects.create(employee=employee, date=next_month + timedelta(days=1), status='late')
+        # Run the deferred FK checks now, as a commit would; tables with pending trigger events can't be dropped
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+        # The current month and next are already partitioned by the migration
+        self.assertEqual(ensure_partitions('accounts_attendance', months_ahead=1), [])
+        later = add_months(next_month, 2)
+        name, start, _ = archivable_partitions('accounts_attendance', 1, today=later)[-1]
+        self.assertEqual(start, next_month)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path, rows = archive_partition('accounts_attendance', name, start, directory)
+            self.assertEqual(rows, 2)
+            self.assertEqual(os.listdir(directory), [os.path.basename(path)])
+            self.assertFalse(Attendance.objects.filter(date__gte=next_month).exists())
+
+            self.assertEqual(restore_partition(path), ('accounts_attendance', 2))
+        self.assertEqual(
+            list(Attendance.objects.filter(date__gte=next_month).order_by('date').values_list('status', flat=True)),
+            ['present', 'late'],
+        )
+
+    def test_rebuild_keeps_rollups_of_archived_months(self):
+        user = User.objects.create(email='rollup@example.com', user_type='employee')
+        employee = Employee.objects.create(user=user, first_name='R', last_name='U', position='Dev', department='IT')
+        next_month = add_months(month_start(timezone.localdate()), 1)
+        Attendance.objects.create(employee=employee, date=next_month, status='present')
+        Attendance.objects.create(employee=employee, date=next_month + timedelta(days=1), status='absent')
+        DailyTimesheet.objects.rebuild(next_month, next_month + timedelta(days=1))
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+        name, start, _ = archivable_partitions('accounts_attendance', 1, today=add_months(next_month, 2))[-1]
+        with tempfile.TemporaryDirectory() as directory:
+            archive_partition('accounts_attendance', name, start, directory)
+            with connection.cursor() as cursor:
+                self.assertEqual(archived_ranges(cursor, 'accounts_attendance'), [(next_month, add_months(next_month, 1))])
+
+            DailyTimesheet.objects.rebuild(add_months(next_month, -1), add_months(next_month, 2))
+            self.assertEqual(DailyTimesheet.objects.filter(employee=employee).count(), 2)
+            monthly = MonthlyTimesheet.objects.get(employee=employee, month=next_month)
+            self.assertEqual((monthly.days_present, monthly.absent_count), (1, 1))
+
+
+class LeaveOverlapTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(email='leave-admin@example.com', user_type='admin', is_staff=True)
+        cls.employees = []
+        for n, department in enumerate(('IT', 'IT', 'HR')):
+            user = User.objects.create(email=f'leave{n}@example.com', user_type='employee')
+            cls.employees.append(Employee.objects.create(
+                user=user, first_name='Leave', last_name=str(n), position='Dev', department=department
+            ))
+
+    def client_for(self, user):
+        client = APIClient(HTTP_HOST='localhost')
+        client.force_authenticate(user)
+        return client
+
+    def test_create_rejects_inverted_and_overlapping_ranges(self):
+        client = self.client_for(self.employees[0].user)
+
+        def request(start, end):
+            return client.post('/api/leave-requests/', {'start_date': start, 'end_date': end, 'reason': 'Trip'}).status_code
+
+        self.assertEqual(request('2024-03-04', '2024-03-08'), 201)
+        self.assertEqual(request('2024-03-04', '2024-03-08'), 400)
+        self.assertEqual(request('2024-03-08', '2024-03-10'), 400)
+        self.assertEqual(request('2024-03-12', '2024-03-11'), 400)
+        self.assertEqual(request('2024-03-09', '2024-03-10'), 201)
+        # Rejected leave doesn't block the dates
+        LeaveRequest.objects.filter(start_date=date(2024, 3, 9)).update(status='rejected')
+        self.assertEqual(request('2024-03-10', '2024-03-10'), 201)
+
+    def test_overlapping_approval_conflicts(self):
+        employee = self.employees[0]
+        first = LeaveRequest.objects.create(employee=employee, start_date=date(2024, 3, 4), end_date=date(2024, 3, 8), reason='A')
+        second = LeaveRequest.objects.create(employee=employee, start_date=date(2024, 3, 8), end_date=date(2024, 3, 9), reason='B')
+        client = self.client_for(self.admin)
+
+        self.assertEqual(client.post(f'/api/leave-requests/{first.pk}/approve/').status_code, 200)
+        self.assertEqual(client.post(f'/api/leave-requests/{second.pk}/approve/').status_code, 409)
+        second.refresh_from_db()
+        self.assertEqual(second.status, 'pending')
+
+        # With the serializer check bypassed, PATCH hits the constraint and gets the same 409
+        with mock.patch.object(LeaveRequestSerializer, 'validate', lambda serializer, attrs: attrs):
+            response = client.patch(f'/api/leave-requests/{second.pk}/', {'status': 'approved'}, format='json')
+        self.assertEqual(response.status_code, 409)
+        second.refresh_from_db()
+        self.assertEqual(second.status, 'pending')
+
+    def test_calendar_lists_everyone_off_in_window(self):
+        for employee, start, end, leave_status in (
+            (self.employees[0], date(2024, 3, 1), date(2024, 3, 5), 'approved'),
+            (self.employees[1], date(2024, 3, 5), date(2024, 3, 6), 'approved'),
+            (self.employees[2], date(2024, 3, 4), date(2024, 3, 4), 'approved'),
+            (self.employees[1], date(2024, 3, 7), date(2024, 3, 7), 'pending'),
+            (self.employees[0], date(2024, 3, 10), date(2024, 3, 12), 'approved'),
+        ):
+            LeaveRequest.objects.create(employee=employee, start_date=start, end_date=end, reason='Off', status=leave_status)
+        client = self.client_for(self.admin)
+
+        with self.assertNumQueries(1):
+            data = client.get('/api/leave-requests/calendar/?date_from=2024-03-04&date_to=2024-03-07').json()
+        self.assertEqual(len(data['leave_requests']), 3)
+        ids = [employee.pk for employee in self.employees]
+        self.assertEqual(data['days'], {
+            '2024-03-04': [ids[0], ids[2]],
+            '2024-03-05': [ids[0], ids[1]],
+            '2024-03-06': [ids[1]],
+            '2024-03-07': [],
+        })
+
+        data = client.get('/api/leave-requests/calendar/?date_from=2024-03-04&date_to=2024-03-07&department=HR').json()
+        self.assertEqual(data['days']['2024-03-04'], [ids[2]])
+        self.assertEqual(client.get('/api/leave-requests/calendar/?date_from=2024-03-07&date_to=2024-03-04').status_code, 400)
+        self.assertEqual(self.client_for(self.employees[0].user).get('/api/leave-requests/calendar/').status_code, 403)
+
+
+class LeaveBalanceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(email='balance-admin@example.com', user_type='admin', is_staff=True)
+        user = User.objects.create(email='balance@example.com', user_type='employee')
+        cls.employee = Employee.objects.create(user=user, first_name='B', last_name='L', position='Dev', department='IT')
+
+    def setUp(self):
+        self.client = APIClient(HTTP_HOST='localhost')
+        self.client.force_authenticate(self.admin)
+
+    def leave(self, start, end):
+        return LeaveRequest.objects.create(employee=self.employee, start_date=start, end_date=end, reason='Off')
+
+    def test_approve_and_reject_post_to_the_ledger(self):
+        call_command('accrue_leave', '10', stdout=io.StringIO())
+        leave = self.leave(date(2024, 3, 4), date(2024, 3, 6))
+
+        self.assertEqual(self.client.post(f'/api/leave-requests/{leave.pk}/approve/').status_code, 200)
+        # Approving twice doesn't debit twice
+        self.client.post(f'/api/leave-requests/{leave.pk}/approve/')
+        self.assertEqual(LeaveBalance.objects.balance(self.employee.pk), Decimal('7'))
+        self.assertTrue(LeaveBalance.objects.can_take(self.employee.pk, 7))
+        self.assertFalse(LeaveBalance.objects.can_take(self.employee.pk, '7.5'))
+
+        self.client.post(f'/api/leave-requests/{leave.pk}/reject/')
+        self.assertEqual(LeaveBalance.objects.balance(self.employee.pk), Decimal('10'))
+        self.assertEqual(
+            list(LeaveLedgerEntry.objects.order_by('id').values_list('kind', 'days')),
+            [('accrual', Decimal('10')), ('approval', Decimal('-3')), ('reversal', Decimal('3'))],
+        )
+
+        employee_client = APIClient(HTTP_HOST='localhost')
+        employee_client.force_authenticate(self.employee.user, token={EMPLOYEE_PK_CLAIM: self.employee.pk})
+        with self.assertNumQueries(1):
+            data = employee_client.get('/api/employee/leave-balance/?days=12').json()
+        self.assertEqual((Decimal(data['balance']), data['can_take']), (Decimal('10'), False))
+
+    def test_rejecting_leave_approved_before_the_ledger_credits_nothing(self):
+        leave = self.leave(date(2024, 3, 4), date(2024, 3, 6))
+        LeaveRequest.objects.filter(pk=leave.pk).update(status='approved')
+
+        self.assertEqual(self.client.post(f'/api/leave-requests/{leave.pk}/reject/').status_code, 200)
+        self.assertEqual(LeaveBalance.objects.balance(self.employee.pk), Decimal('0'))
+        self.assertFalse(LeaveLedgerEntry.objects.exists())
+
+    def test_date_change_on_approved_leave_posts_the_difference(self):
+        leave = self.leave(date(2024, 3, 4), date(2024, 3, 6))
+        self.client.post(f'/api/leave-requests/{leave.pk}/approve/')
+
+        response = self.client.patch(f'/api/leave-requests/{leave.pk}/', {'end_date': '2024-03-04'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(LeaveBalance.objects.balance(self.employee.pk), Decimal('-1'))
+        self.client.post(f'/api/leave-requests/{leave.pk}/reject/')
+        self.assertEqual(LeaveBalance.objects.balance(self.employee.pk), Decimal('0'))
+
+    @override_settings(LEAVE_BALANCE_ENFORCED=True)
+    def test_enforced_balance_blocks_approval(self):
+        LeaveBalance.objects.credit([self.employee.pk], 2)
+        leave = self.leave(date(2024, 3, 4), date(2024, 3, 6))
+
+        self.assertEqual(self.client.post(f'/api/leave-requests/{leave.pk}/approve/').status_code, 409)
+        leave.refresh_from_db()
+        self.assertEqual(leave.status, 'pending')
+        self.assertEqual(LeaveBalance.objects.balance(self.employee.pk), Decimal('2'))
+
+    def test_recompute_detects_and_fixes_drift(self):
+        LeaveBalance.objects.credit([self.employee.pk], 5)
+        call_command('recompute_leave_balances', stdout=io.StringIO())
+
+        LeaveBalance.objects.filter(employee=self.employee).update(balance=1)
+        with self.assertRaises(CommandError):
+            call_command('recompute_leave_balances', stdout=io.StringIO())
+        call_command('recompute_leave_balances', '--fix', stdout=io.StringIO())
+        self.assertEqual(LeaveBalance.objects.balance(self.employee.pk), Decimal('5'))
+
+
+class LeaveBulkDecisionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(email='bulk-admin@example.com', user_type='admin', is_staff=True)
+        cls.employees = [
+            Employee.objects.create(
+                user=User.objects.create(email=f'bulk{n}@example.com', user_type='employee'),
+                first_name='Bulk', last_name=str(n), position='Dev', department='IT',
+            )
+            for n in range(2)
+        ]
+
+    def setUp(self):
+        self.client = APIClient(HTTP_HOST='localhost')
+        self.client.force_authenticate(self.admin)
+
+    def leave(self, employee, start, end, status='pending'):
+        return LeaveRequest.objects.create(employee=employee, start_date=start, end_date=end, reason='Off', status=status).pk
+
+    def test_bulk_approve_reports_each_id(self):
+        first, second = self.employees
+        approved = self.leave(first, date(2024, 3, 1), date(2024, 3, 2), status='approved')
+        ok = [self.leave(first, date(2024, 3, 4), date(2024, 3, 6)), self.leave(second, date(2024, 3, 4), date(2024, 3, 4))]
+        clashes_with_approved = self.leave(first, date(2024, 3, 2), date(2024, 3, 3))
+        # Overlaps ok[0], which comes earlier in the batch
+        clashes_in_batch = self.leave(first, date(2024, 3, 6), date(2024, 3, 7))
+
+        response = self.client.post(
+            '/api/leave-requests/bulk-approve/',
+            {'ids': ok + [clashes_with_approved, clashes_in_batch, approved, 999999]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['decided'], 2)
+        self.assertEqual({row['id']: row['result'] for row in response.json()['results']}, {
+            ok[0]: 'approved', ok[1]: 'approved', clashes_with_approved: 'overlap',
+            clashes_in_batch: 'overlap', approved: 'not_pending', 999999: 'not_pending',
+        })
+        self.assertEqual(
+            list(LeaveLedgerEntry.objects.order_by('leave_request_id').values_list('leave_request_id', 'days')),
+            [(ok[0], Decimal('-3')), (ok[1], Decimal('-1'))],
+        )
+        self.assertEqual(LeaveBalance.objects.balance(first.pk), Decimal('-3'))
+
+        response = self.client.post(
+            '/api/leave-requests/bulk-reject/', {'ids': [clashes_with_approved, ok[0]]}, format='json'
+        )
+        self.assertEqual(
+            [row['result'] for row in response.json()['results']], ['rejected', 'not_pending']
+        )
+
+    def test_bulk_approve_debits_each_employee(self):
+        first, second = self.employees
+        LeaveBalance.objects.credit([first.pk, second.pk], 10)
+        ids = [
+            self.leave(first, date(2024, 4, 1), date(2024, 4, 2)),
+            self.leave(first, date(2024, 4, 8), date(2024, 4, 8)),
+            self.leave(second, date(2024, 4, 1), date(2024, 4, 5)),
+        ]
+
+        response = self.client.post('/api/leave-requests/bulk-approve/', {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['decided'], 3)
+        self.assertEqual(
+            list(LeaveLedgerEntry.objects.filter(kind='approval').order_by('leave_request_id')
+                 .values_list('leave_request_id', 'employee_id', 'days')),
+            [(ids[0], first.pk, Decimal('-2')), (ids[1], first.pk, Decimal('-1')), (ids[2], second.pk, Decimal('-5'))],
+        )
+        self.assertEqual(LeaveBalance.objects.balance(first.pk), Decimal('7'))
+        self.assertEqual(LeaveBalance.objects.balance(second.pk), Decimal('5'))
+        self.assertEqual(LeaveBalance.objects.mismatches(), [])
+        self.assertEqual(set(LeaveRequest.objects.filter(pk__in=ids).values_list('status', flat=True)), {'approved'})
+
+    @override_settings(LEAVE_BALANCE_ENFORCED=True)
+    def test_bulk_approve_stops_at_the_balance(self):
+        employee = self.employees[0]
+        LeaveBalance.objects.credit([employee.pk], 3)
+        ids = [self.leave(employee, date(2024, 3, day), date(2024, 3, day + 1)) for day in (4, 11, 18)]
+
+        results = self.client.post('/api/leave-requests/bulk-approve/', {'ids': ids}, format='json').json()['results']
+        self.assertEqual([row['result'] for row in results], ['approved', 'insufficient_balance', 'insufficient_balance'])
+        self.assertEqual(LeaveBalance.objects.balance(employee.pk), Decimal('1'))
+
+    def test_bulk_endpoints_validate_input(self):
+        self.assertEqual(self.client.post('/api/leave-requests/bulk-approve/', {'ids': []}, format='json').status_code, 400)
+        self.client.force_authenticate(self.employees[0].user)
+        self.assertEqual(self.client.post('/api/leave-requests/bulk-approve/', {'ids': [1]}, format='json').status_code, 403)
+
+
+class MaterializeAbsencesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.employees = []
+        for n in range(3):
+            user = User.objects.create(email=f'absent{n}@example.com', user_type='employee', is_active=n != 2)
+            cls.employees.append(Employee.objects.create(
+                user=user, first_name='Absent', last_name=str(n), position='Dev', department='IT'
+            ))
+        Employee.objects.update(date_joined=date(2024, 1, 1))
+
+    def test_marks_missing_workdays_once(self):
+        present, on_leave, inactive = self.employees
+        # Monday 2024-03-04 to Sunday 2024-03-10
+        Attendance.objects.create(employee=present, date=date(2024, 3, 4), status='present')
+        LeaveRequest.objects.create(
+            employee=on_leave, start_date=date(2024, 3, 5), end_date=date(2024, 3, 6), reason='Off', status='approved'
+        )
+
+        call_command('materialize_absences', date_from='2024-03-04', date_to='2024-03-10', stdout=io.StringIO())
+        absences = Attendance.objects.filter(status='absent')
+        self.assertFalse(absences.filter(employee=inactive).exists())
+        self.assertFalse(absences.filter(date__gte=date(2024, 3, 9)).exists())
+        self.assertEqual(
+            list(absences.filter(employee=present).values_list('date__day', flat=True).order_by('date')), [5, 6, 7, 8]
+        )
+        self.assertEqual(
+            list(absences.filter(employee=on_leave).values_list('date__day', flat=True).order_by('date')), [4, 7, 8]
+        )
+        self.assertEqual(DailyTimesheet.objects.filter(is_absent=True).count(), 7)
+
+        # Reruns and overlapping backfills add nothing
+        out = io.StringIO()
+        call_command('materialize_absences', date_from='2024-03-01', date_to='2024-03-08', stdout=out)
+        self.assertEqual(absences.filter(date__gte=date(2024, 3, 4)).count(), 7)
+        self.assertEqual(absences.filter(date=date(2024, 3, 1)).count(), 2)
+
+        with self.assertRaises(CommandError):
+            call_command('materialize_absences', date=timezone.localdate().isoformat(), stdout=io.StringIO())
+
+
+class EmployeeClaimTests(TestCase):
+    def test_null_claim_falls_back_to_the_profile_created_later(self):
+        user = User.objects.create(email='newhire@example.com', user_type='employee')
+        client = APIClient(HTTP_HOST='localhost')
+        # Logged in before the profile existed
+        client.force_authenticate(user, token={EMPLOYEE_PK_CLAIM: None})
+
+        self.assertEqual(client.get('/api/employee/attendance/').status_code, 404)
+        first = client.get('/api/employee/profile/')
+        second = client.get('/api/employee/profile/')
+        self.assertEqual((first.status_code, second.status_code), (200, 200))
+        self.assertEqual(first.json()['id'], second.json()['id'])
+        self.assertEqual(Employee.objects.filter(user=user).count(), 1)
+        self.assertEqual(client.get('/api/employee/attendance/').status_code, 200)
+
+
+class JobQueueTests(TestCase):
+    stale_after = timedelta(minutes=10)
+
+    def test_enqueue_dedupes_active_jobs(self):
+        first = Job.objects.enqueue('sync', dedupe_key='sync')
+        self.assertEqual(Job.objects.enqueue('sync', dedupe_key='sync').pk, first.pk)
+        self.assertNotEqual(Job.objects.enqueue('sync').pk, first.pk)
+
+        first.finish()
+        self.assertNotEqual(Job.objects.enqueue('sync', dedupe_key='sync').pk, first.pk)
+
+    def test_claims_oldest_queued_job_once(self):
+        older = Job.objects.enqueue('a')
+        newer = Job.objects.enqueue('b')
+
+        claimed = Job.objects.claim('w1', self.stale_after)
+        self.assertEqual((claimed.pk, claimed.status, claimed.worker, claimed.attempts), (older.pk, 'running', 'w1', 1))
+        self.assertEqual(Job.objects.claim('w2', self.stale_after).pk, newer.pk)
+        self.assertIsNone(Job.objects.claim('w3', self.stale_after))
+
+    def test_reclaims_stale_job_then_fails_it_after_max_attempts(self):
+        job = Job.objects.enqueue('a')
+        Job.objects.claim('w1', self.stale_after)
+        # A fresh heartbeat keeps the job with its worker
+        self.assertIsNone(Job.objects.claim('w2', self.stale_after))
+
+        for worker, attempts in (('w2', 2), ('w3', 3)):
+            Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - 2 * self.stale_after)
+            reclaimed = Job.objects.claim(worker, self.stale_after, max_attempts=3)
+            self.assertEqual((reclaimed.pk, reclaimed.worker, reclaimed.attempts), (job.pk, worker, attempts))
+
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - 2 * self.stale_after)
+        self.assertIsNone(Job.objects.claim('w4', self.stale_after, max_attempts=3))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 3))
+        self.assertIn('gave up after 3 attempts', job.error)
+
+
+# run_worker calls close_old_connections(), which closes a TestCase's connection mid-transaction
+class JobWorkerTests(TransactionTestCase):
+    def test_worker_records_handler_failure(self):
+        def explode(job):
+            raise RuntimeError('boom')
+
+        ok = Job.objects.enqueue('ok')
+        broken = Job.objects.enqueue('explode')
+        unknown = Job.objects.enqueue('unknown')
+        with mock.patch.dict('accounts.jobs.JOB_HANDLERS', {'ok': lambda job: None, 'explode': explode}):
+            call_command('run_worker', once=True, stdout=io.StringIO())
+
+        statuses = dict(Job.objects.values_list('pk', 'status'))
+        self.assertEqual(
+            [statuses[ok.pk], statuses[broken.pk], statuses[unknown.pk]], ['succeeded', 'failed', 'failed']
+        )
+        broken.refresh_from_db()
+        self.assertIn('boom', broken.error)
+
+    def test_heartbeat_commits_while_handler_holds_a_transaction(self):
+        beats = []
+
+        def slow(job):
+            started = Job.objects.get(pk=job.pk).heartbeat_at
+            with transaction.atomic():
+                deadline = time.monotonic() + 5
+                while time.monotonic() < deadline:
+                    heartbeat_at = Job.objects.get(pk=job.pk).heartbeat_at
+                    if heartbeat_at > started:
+                        beats.append(heartbeat_at)
+                        return
+                    time.sleep(0.1)
+
+        Job.objects.enqueue('slow')
+        with mock.patch.dict('accounts.jobs.JOB_HANDLERS', {'slow': slow}):
+            # One-second beats
+            call_command('run_worker', once=True, stale_after=3, stdout=io.StringIO())
+        self.assertEqual(len(beats), 1)
+        self.assertEqual(Job.objects.get().status, 'succeeded')
+
+
+class FakeMailBackend:
+    """Stand-in for send_emails_with_graph that fails each address N times first."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = defaultdict(int)
+
+    def __call__(self, messages):
+        results = {}
+        for key, message in messages.items():
+            self.calls[message['to_email']] += 1
+            results[key] = self.calls[message['to_email']] > self.failures
+        return results
+
+
+# send_outbox_emails calls close_old_connections() too, see JobWorkerTests
+class OutboxTests(TransactionTestCase):
+    def send(self, backend, **options):
+        with mock.patch('accounts.management.commands.send_outbox_emails.send_emails_with_graph', backend):
+            call_command('send_outbox_emails', once=True, stdout=io.StringIO(), **options)
+
+    def make_due(self):
+        OutboxEmail.objects.filter(status='pending').update(next_attempt_at=timezone.now())
+
+    def test_retries_with_backoff_until_delivered(self):
+        email = OutboxEmail.objects.enqueue('new@example.com', 'Welcome', 'password: secret')
+        backend = FakeMailBackend(failures=2)
+
+        for attempt, delay in ((1, 30), (2, 60)):
+            before = timezone.now()
+            self.send(backend)
+            after = timezone.now()
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), ('pending', attempt))
+            self.assertTrue(before + timedelta(seconds=delay) <= email.next_attempt_at <= after + timedelta(seconds=delay))
+            # Not due yet
+            self.send(backend)
+            self.assertEqual(backend.calls['new@example.com'], attempt)
+            self.make_due()
+
+        self.send(backend)
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts, email.body, email.last_error), ('sent', 3, '', None))
+        self.assertIsNotNone(email.sent_at)
+
+    def test_dead_letters_after_max_attempts(self):
+        email = OutboxEmail.objects.enqueue('bounce@example.com', 'Welcome', 'Hello')
+        backend = FakeMailBackend(failures=10)
+
+        for _ in range(3):
+            self.send(backend, max_attempts=2)
+            self.make_due()
+
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('dead', 2))
+        self.assertEqual(backend.calls['bounce@example.com'], 2)
+
+    def test_claim_leases_emails(self):
+        emails = [OutboxEmail.objects.enqueue(f'user{n}@example.com', 'Hi', 'Hello') for n in range(3)]
+        lease = timedelta(minutes=5)
+
+        self.assertEqual([e.pk for e in OutboxEmail.objects.claim(2, lease)], [e.pk for e in emails[:2]])
+        self.assertEqual([e.pk for e in OutboxEmail.objects.claim(10, lease)], [emails[2].pk])
+        self.assertEqual(OutboxEmail.objects.claim(10, lease), [])
+        # A worker that died mid-send leaves its emails to be claimed after the lease
+        OutboxEmail.objects.filter(pk=emails[0].pk).update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        reclaimed = OutboxEmail.objects.claim(10, lease)
+        self.assertEqual([(e.pk, e.attempts) for e in reclaimed], [(emails[0].pk, 2)])
+
+    def test_claim_skips_rows_locked_by_another_worker(self):
+        emails = [OutboxEmail.objects.enqueue(f'user{n}@example.com', 'Hi', 'Hello') for n in range(3)]
+        locked = threading.Event()
+        release = threading.Event()
+
+        def hold_locks():
+            try:
+                with transaction.atomic():
+                    list(OutboxEmail.objects.select_for_update().filter(pk__in=[e.pk for e in emails[:2]]))
+                    locked.set()
+                    release.wait(5)
+            finally:
+                connection.close()
+
+        holder = threading.Thread(target=hold_locks)
+        holder.start()
+        try:
+            self.assertTrue(locked.wait(5))
+            claimed = OutboxEmail.objects.claim(10, timedelta(minutes=5))
+        finally:
+            release.set()
+            holder.join()
+
+        self.assertEqual([e.pk for e in claimed], [emails[2].pk])
+
+
+IMPORT_CSV = """\ufeffemail, first_name,last_name,position,department,phone
+ann@example.com, Ann ,Lee,Dev,IT,555-0100
+ben@example.com,Ben,Ng,Dev,IT,
+cat@example.com,Cat,Ro,Recruiter,HR,
+"""
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class EmployeeImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(email='import-admin@example.com', user_type='admin', is_staff=True)
+        User.objects.create(email='taken@example.com', user_type='employee')
+
+    def setUp(self):
+        patcher = mock.patch('os.cpu_count', return_value=1)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def row(self, name, department='IT', **fields):
+        return {
+            'email': f'{name}@example.com', 'first_name': name.title(), 'last_name': 'Import',
+            'position': 'Dev', 'department': department, **fields,
+        }
+
+    def test_parses_csv_and_json(self):
+        rows = parse_employee_rows(IMPORT_CSV)
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0], {
+            'email': 'ann@example.com', 'first_name': 'Ann', 'last_name': 'Lee',
+            'position': 'Dev', 'department': 'IT', 'phone': '555-0100',
+        })
+        self.assertEqual(parse_employee_rows(json.dumps([self.row('ann')])), [self.row('ann')])
+
+        for content, format in (('[{"email": ', None), ('{"email": "a@example.com"}', 'json'), ('', 'xml')):
+            with self.assertRaises(EmployeeImportError):
+                parse_employee_rows(content, format)
+
+    def test_reports_each_row_and_reserves_ids_per_department(self):
+        rows = [
+            self.row('ann'), self.row('ben'), self.row('cat', department='HR'),
+            self.row('ANN'), self.row('taken'), self.row('bad', email='not-an-email'), self.row('nopos', position=''),
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            report = import_employees(rows)
+
+        self.assertEqual(
+            [entry['status'] for entry in report],
+            ['created', 'created', 'created', 'error', 'error', 'error', 'error'],
+        )
+        self.assertEqual(report[3]['errors'], {'email': ['Duplicate email in import.']})
+        self.assertEqual(report[4]['errors'], {'email': ['A user with this email already exists.']})
+        self.assertIn('email', report[5]['errors'])
+        self.assertIn('position', report[6]['errors'])
+
+        it, hr = employee_id_prefix('IT'), employee_id_prefix('HR')
+        self.assertEqual([entry['employee_id'] for entry in report[:3]], [f'{it}0001', f'{it}0002', f'{hr}0001'])
+        self.assertEqual(Employee.objects.get(pk=report[2]['id']).user.email, 'cat@example.com')
+        self.assertTrue(User.objects.get(email='ann@example.com').has_usable_password())
+        self.assertEqual(
+            sorted(OutboxEmail.objects.values_list('to_email', flat=True)),
+            ['ann@example.com', 'ben@example.com', 'cat@example.com'],
+        )
+
+    def test_dry_run_and_no_credentials(self):
+        report = import_employees([self.row('ann'), self.row('taken')], dry_run=True)
+        self.assertEqual([entry['status'] for entry in report], ['valid', 'error'])
+        self.assertFalse(User.objects.filter(email='ann@example.com').exists())
+
+        import_employees([self.row('ann')], send_credentials=False)
+        self.assertTrue(User.objects.filter(email='ann@example.com').exists())
+        self.assertFalse(OutboxEmail.objects.exists())
+
+    def test_command_imports_a_file(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8', delete=False) as f:
+            f.write(IMPORT_CSV + 'taken@example.com,T,K,Dev,IT,\n')
+        self.addCleanup(os.unlink, f.name)
+
+        out = io.StringIO()
+        call_command('import_employees', f.name, dry_run=True, stdout=out)
+        self.assertIn('0 created, 3 valid, 1 errors', out.getvalue())
+        self.assertIn('Row 4 (taken@example.com)', out.getvalue())
+
+        out = io.StringIO()
+        call_command('import_employees', f.name, no_credentials=True, stdout=out)
+        self.assertIn('3 created, 0 valid, 1 errors', out.getvalue())
+        self.assertFalse(OutboxEmail.objects.exists())
+
+        with self.assertRaises(CommandError):
+            call_command('import_employees', f.name + '.missing', stdout=io.StringIO())
+
+    def test_bulk_import_endpoint(self):
+        client = APIClient(HTTP_HOST='localhost')
+        client.force_authenticate(self.admin)
+        url = '/api/employees/bulk-import/'
+
+        response = client.post(f'{url}?dry_run=true', [self.row('ann'), self.row('taken')], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['created'], response.json()['failed']), (0, 1))
+
+        response = client.post(url, {'employees': [self.row('ann')]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['rows'][0]['status'], 'created')
+
+        upload = io.BytesIO(IMPORT_CSV.replace('ann@', 'ann2@').encode('utf-8'))
+        upload.name = 'staff.csv'
+        response = client.post(f'{url}?send_credentials=false', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 3)
+        self.assertEqual(OutboxEmail.objects.count(), 1)
+
+        self.assertEqual(client.post(url, {'employees': 'nope'}, format='json').status_code, 400)
+        client.force_authenticate(User.objects.get(email='ann@example.com'))
+        self.assertEqual(client.post(url, [self.row('eve')], format='json').status_code, 403)
@@ -8,6 +8,8 @@ router.register(r'users', views.UserViewSet)
 router.register(r'employees', views.EmployeeViewSet)
 router.register(r'attendance', views.AttendanceViewSet)
 router.register(r'leave-requests', views.LeaveRequestViewSet)
+router.register(r'timesheets', views.TimesheetViewSet, basename='timesheet')
+router.register(r'leave-balances', views.LeaveBalanceViewSet, basename='leave-balance')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -18,14 +20,22 @@ urlpatterns = [
     
     # Employee endpoints
     path('employee/profile/', views.get_employee_profile, name='employee_profile'),
+    path('employee/home/', views.employee_home, name='employee_home'),
     path('employee/clock-in/', views.clock_in, name='clock_in'),
     path('employee/clock-out/', views.clock_out, name='clock_out'),
     path('employee/attendance/', views.my_attendance, name='my_attendance'),
     path('employee/leave-requests/', views.my_leave_requests, name='my_leave_requests'),
+    path('employee/leave-balance/', views.my_leave_balance, name='my_leave_balance'),
     
     # Admin endpoints
     path('admin/send-credentials/', views.send_credentials, name='send_credentials'),
+    path('admin/dashboard/summary/', views.dashboard_summary, name='dashboard_summary'),
+    path('admin/exports/<str:kind>/', views.export_data, name='export_data'),
     path('admin/sync-microsoft-users/', views.sync_microsoft_users, name='sync_microsoft_users'),
+    path('admin/materialize-absences/', views.materialize_absences, name='materialize_absences'),
+    path('admin/jobs/<int:pk>/', views.job_status, name='job_status'),
+    path('admin/auth-cache-stats/', views.auth_cache_stats, name='auth_cache_stats'),
+    path('admin/email-outbox-stats/', views.email_outbox_stats, name='email_outbox_stats'),
     
     # Email endpoint
     path('send-email/', views.send_email_view, name='send_email'),
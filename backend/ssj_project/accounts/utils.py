@@ -1,7 +1,12 @@
+import multiprocessing
+import os
 import random
 import string
+from concurrent.futures import ProcessPoolExecutor
 from django.conf import settings
-from .graph_utils import send_email_with_graph
+from django.contrib.auth.hashers import make_password
+from .graph_utils import send_email_with_graph, send_emails_with_graph
+from .models import OutboxEmail
 
 def generate_random_password(length=12):
     """Generate a random password of specified length."""
@@ -25,12 +30,44 @@ def generate_random_password(length=12):
     
     return ''.join(password_chars)
 
-def send_employee_credentials(employee, password):
-    """Send login credentials to a new employee using Microsoft Graph API."""
-    subject = 'Your SSJ IT Consultance Account Credentials'
+# Below this many passwords a process pool costs more than it saves
+PARALLEL_HASH_THRESHOLD = 32
+
+def _init_password_worker():
+    import django
+    django.setup()
+
+def password_hashing_pool(max_workers=None):
+    """
+    Process pool for hash_passwords. Uses spawn so workers don't inherit
+    the parent's database connections.
+    """
+    return ProcessPoolExecutor(
+        max_workers=max_workers or os.cpu_count(),
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_password_worker,
+    )
+
+def hash_passwords(passwords, pool=None):
+    """
+    Hash passwords with make_password, spreading large batches across a
+    process pool (a fresh one unless `pool` is given).
+    """
+    passwords = list(passwords)
+    if len(passwords) < PARALLEL_HASH_THRESHOLD or (os.cpu_count() or 1) < 2:
+        return [make_password(password) for password in passwords]
     
-    # Create HTML email body
-    html_body = f"""
+    chunksize = max(1, len(passwords) // (4 * (os.cpu_count() or 1)))
+    if pool is not None:
+        return list(pool.map(make_password, passwords, chunksize=chunksize))
+    with password_hashing_pool() as pool:
+        return list(pool.map(make_password, passwords, chunksize=chunksize))
+
+CREDENTIALS_EMAIL_SUBJECT = 'Your SSJ IT Consultance Account Credentials'
+
+def build_credentials_email_body(employee, password):
+    """Build the HTML body of the credentials email for an employee."""
+    return f"""
     <html>
     <head>
         <style>
@@ -71,17 +108,62 @@ def send_employee_credentials(employee, password):
     </body>
     </html>
     """
-    
+
+def send_employee_credentials(employee, password):
+    """Send login credentials to a new employee using Microsoft Graph API."""
+    html_body = build_credentials_email_body(employee, password)
     recipient_email = employee.user.email
     
     try:
         # Use Graph API to send email
         success = send_email_with_graph(
             to_email=recipient_email,
-            subject=subject,
+            subject=CREDENTIALS_EMAIL_SUBJECT,
             body=html_body
         )
         return success
     except Exception as e:
         print(f"Error sending email: {e}")
         return False
+
+
+def send_employee_credentials_bulk(credentials):
+    """
+    Send login credentials to many employees through Graph $batch calls.
+    Takes (employee, password) pairs and returns {employee.pk: success}.
+    """
+    messages = {
+        employee.pk: {
+            'to_email': employee.user.email,
+            'subject': CREDENTIALS_EMAIL_SUBJECT,
+            'body': build_credentials_email_body(employee, password),
+        }
+        for employee, password in credentials
+    }
+    if not messages:
+        return {}
+    return send_emails_with_graph(messages)
+
+
+def queue_employee_credentials(employee, password):
+    """
+    Queue the credentials email for an employee in the outbox. Call inside
+    the transaction that creates the employee.
+    """
+    return OutboxEmail.objects.enqueue(
+        to_email=employee.user.email,
+        subject=CREDENTIALS_EMAIL_SUBJECT,
+        body=build_credentials_email_body(employee, password),
+    )
+
+
+def queue_employee_credentials_bulk(credentials):
+    """Queue credentials emails for many (employee, password) pairs in one insert."""
+    return OutboxEmail.objects.bulk_create([
+        OutboxEmail(
+            to_email=employee.user.email,
+            subject=CREDENTIALS_EMAIL_SUBJECT,
+            body=build_credentials_email_body(employee, password),
+        )
+        for employee, password in credentials
+    ], batch_size=1000)
@@ -2,20 +2,50 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework.exceptions import APIException, ValidationError
+from django_filters.rest_framework import DjangoFilterBackend
 from django.contrib.auth import get_user_model, authenticate, login
-from .models import Employee, Attendance, LeaveRequest
-from .serializers import UserSerializer, EmployeeSerializer, AttendanceSerializer, LeaveRequestSerializer
-from .utils import generate_random_password, send_employee_credentials
+from .models import (
+    Employee, Attendance, LeaveRequest, Job, OutboxEmail, DailyTimesheet, MonthlyTimesheet, LeaveBalance,
+    LeaveLedgerEntry, InsufficientLeaveBalance, reserve_employee_ids,
+)
+from .serializers import (
+    UserSerializer, EmployeeSerializer, AttendanceSerializer, LeaveRequestSerializer, JobSerializer,
+    DailyTimesheetSerializer, MonthlyTimesheetSerializer, LeaveBalanceSerializer, LeaveLedgerEntrySerializer,
+    LeaveAdjustmentSerializer, LeaveBulkDecisionSerializer,
+)
+from .utils import generate_random_password, queue_employee_credentials
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
+from django.db.models import Avg, Count, F, Max, Min, Q, Sum
 from django.utils import timezone
-from datetime import date
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.permissions import IsAdminUser
-from django.core.management import call_command
-from .graph_utils import send_email_with_graph, get_microsoft_users
+from .dashboard import get_dashboard_summary, invalidate_dashboard_summary
+from .exports import EXPORTS, export_filename, stream_export
+from .filters import (
+    AttendanceFilter, DailyTimesheetFilter, LeaveBalanceFilter, LeaveLedgerFilter, MonthlyTimesheetFilter,
+)
+from .jobs import MATERIALIZE_ABSENCES, SYNC_MICROSOFT_USERS
+from .onboarding import EmployeeImportError, import_employees, parse_employee_rows
+from .middleware import forget_employee, get_employee, get_employee_pk, EMPLOYEE_PK_CLAIM
+from .authentication import user_cache
 
 User = get_user_model()
 
+# Widest window the leave calendar answers in one request
+LEAVE_CALENDAR_MAX_DAYS = 366
+
+
+class LeaveConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "The employee already has approved leave overlapping these dates."
+    default_code = 'conflict'
+
+
 class CustomTokenObtainPairView(TokenObtainPairView):
     """Custom token view that handles different user types."""
     
@@ -50,6 +80,11 @@ class CustomTokenObtainPairView(TokenObtainPairView):
             refresh['user_type'] = user.user_type
             refresh['email'] = user.email
             refresh['name'] = f"{user.first_name} {user.last_name}"
+            refresh['is_superuser'] = user.is_superuser
+            refresh['employee_id'] = user.employee_id
+            refresh[EMPLOYEE_PK_CLAIM] = (
+                Employee.objects.filter(user=user).values_list('pk', flat=True).first()
+            )
             
             return Response({
                 'refresh': str(refresh),
@@ -75,15 +110,17 @@ class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAdminUser]
+    ordering = ('-id',)
 
     def get_queryset(self):
         """Filter users based on user permissions."""
         user = self.request.user
         
         if user.is_superuser or user.user_type == 'admin':
-            return User.objects.all()
+            queryset = User.objects.all()
         else:
-            return User.objects.filter(id=user.id)
+            queryset = User.objects.filter(id=user.id)
+        return UserSerializer.setup_eager_loading(queryset)
 
 
 class EmployeeViewSet(viewsets.ModelViewSet):
@@ -91,6 +128,7 @@ class EmployeeViewSet(viewsets.ModelViewSet):
     queryset = Employee.objects.all()
     serializer_class = EmployeeSerializer
     permission_classes = [permissions.IsAuthenticated]
+    ordering = ('-id',)
     
     def create(self, request, *args, **kwargs):
         """Create a new employee with user account."""
@@ -107,32 +145,35 @@ class EmployeeViewSet(viewsets.ModelViewSet):
             'user_type': 'employee',
         }
         
-        user = User.objects.create_user(
-            email=user_data['email'],
-            password=password,
-            first_name=user_data['first_name'],
-            last_name=user_data['last_name'],
-            user_type='employee'
-        )
-        
-        # Create employee profile
-        employee_data = {
-            'user': user.id,
-            'first_name': data.get('first_name'),
-            'last_name': data.get('last_name'),
-            'position': data.get('position'),
-            'department': data.get('department'),
-            'phone': data.get('phone'),
-            'address': data.get('address'),
-        }
-        
-        serializer = self.get_serializer(data=employee_data)
-        serializer.is_valid(raise_exception=True)
-        employee = serializer.save()
-        
-        # Send credentials to employee if requested
-        if data.get('send_credentials', True):
-            send_employee_credentials(employee, password)
+        # The user, employee and queued credentials email commit together
+        with transaction.atomic():
+            user = User.objects.create_user(
+                email=user_data['email'],
+                password=password,
+                first_name=user_data['first_name'],
+                last_name=user_data['last_name'],
+                user_type='employee',
+                employee_id=reserve_employee_ids(data.get('department'))[0],
+            )
+            
+            # Create employee profile
+            employee_data = {
+                'user': user.id,
+                'first_name': data.get('first_name'),
+                'last_name': data.get('last_name'),
+                'position': data.get('position'),
+                'department': data.get('department'),
+                'phone': data.get('phone'),
+                'address': data.get('address'),
+            }
+            
+            serializer = self.get_serializer(data=employee_data)
+            serializer.is_valid(raise_exception=True)
+            employee = serializer.save()
+            
+            # Queue credentials for the outbox worker if requested
+            if data.get('send_credentials', True):
+                queue_employee_credentials(employee, password)
         
         headers = self.get_success_headers(serializer.data)
         response_data = serializer.data
@@ -140,6 +181,45 @@ class EmployeeViewSet(viewsets.ModelViewSet):
         
         return Response(response_data, status=status.HTTP_201_CREATED, headers=headers)
     
+    @action(detail=False, methods=['post'], url_path='bulk-import', permission_classes=[permissions.IsAdminUser])
+    def bulk_import(self, request):
+        """
+        Create many employees from an uploaded CSV/JSON file (`file`) or a
+        JSON array body. Returns a report entry per row.
+        """
+        upload = request.FILES.get('file')
+        try:
+            if upload is not None:
+                name = upload.name.lower()
+                format = 'json' if name.endswith('.json') else 'csv' if name.endswith('.csv') else None
+                rows = parse_employee_rows(upload.read().decode('utf-8-sig'), format)
+            elif isinstance(request.data, list):
+                rows = request.data
+            else:
+                rows = request.data.get('employees')
+                if not isinstance(rows, list):
+                    raise EmployeeImportError("Provide a CSV/JSON file or an array of employees.")
+        except (EmployeeImportError, UnicodeDecodeError) as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        send_credentials = request.query_params.get('send_credentials', 'true').lower() != 'false'
+        dry_run = request.query_params.get('dry_run', 'false').lower() == 'true'
+        
+        try:
+            report = import_employees(rows, send_credentials=send_credentials, dry_run=dry_run)
+        except IntegrityError:
+            return Response(
+                {"detail": "Some employees were created by another request during the import; please retry."},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        created = sum(1 for entry in report if entry['status'] == 'created')
+        failed = sum(1 for entry in report if entry['status'] == 'error')
+        return Response(
+            {'created': created, 'failed': failed, 'rows': report},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+    
     # accounts/views.py - Update the EmployeeViewSet destroy method
 
     def destroy(self, request, *args, **kwargs):
@@ -160,12 +240,13 @@ class EmployeeViewSet(viewsets.ModelViewSet):
         user = self.request.user
         
         if user.user_type == 'admin':
-            return Employee.objects.all()
+            queryset = Employee.objects.all()
         elif user.user_type == 'employee':
             # Employees can only see their own profile
-            return Employee.objects.filter(user=user)
+            queryset = Employee.objects.filter(user=user)
         else:
             return Employee.objects.none()
+        return EmployeeSerializer.setup_eager_loading(queryset)
 
 
 # In your views.py, modify the get_employee_profile function
@@ -177,43 +258,117 @@ def get_employee_profile(request):
         return Response({"detail": "Not an employee user."}, status=status.HTTP_403_FORBIDDEN)
     
     try:
-        employee = Employee.objects.get(user=request.user)
-        serializer = EmployeeSerializer(employee)
+        serializer = EmployeeSerializer(request.employee)
         return Response(serializer.data)
     except Employee.DoesNotExist:
-        # Create a basic profile if it doesn't exist
-        employee = Employee.objects.create(
+        # Create a basic profile if it doesn't exist; get_or_create so a
+        # concurrent or repeated call reuses it
+        employee, _ = Employee.objects.get_or_create(
             user=request.user,
-            first_name=request.user.first_name,
-            last_name=request.user.last_name,
-            department="Unassigned",
-            position="Employee"
+            defaults={
+                'first_name': request.user.first_name,
+                'last_name': request.user.last_name,
+                'department': "Unassigned",
+                'position': "Employee",
+            },
         )
+        forget_employee(request)
         serializer = EmployeeSerializer(employee)
         return Response(serializer.data)
 
 
+# Attendance rows returned by the employee home endpoint by default / at most
+EMPLOYEE_HOME_RECENT = 5
+EMPLOYEE_HOME_MAX_RECENT = 31
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def employee_home(request):
+    """
+    Everything the employee dashboard shows in one response: profile,
+    today's attendance, the last `recent` records, pending leave requests
+    and hours worked this month.
+    """
+    if request.user.user_type != 'employee':
+        return Response({"detail": "Not an employee user."}, status=status.HTTP_403_FORBIDDEN)
+    
+    try:
+        employee = get_employee(request)
+    except Employee.DoesNotExist:
+        return Response({"detail": "Employee profile not found."}, status=status.HTTP_404_NOT_FOUND)
+    
+    try:
+        recent_count = int(request.query_params.get('recent', EMPLOYEE_HOME_RECENT))
+    except ValueError:
+        recent_count = EMPLOYEE_HOME_RECENT
+    recent_count = max(1, min(recent_count, EMPLOYEE_HOME_MAX_RECENT))
+    
+    today = timezone.localdate()
+    # Newest first via the (employee_id, date) unique index; today's row is among them
+    recent = list(Attendance.objects.filter(employee_id=employee.pk, date__lte=today).order_by('-date')[:recent_count])
+    pending_leave = list(LeaveRequest.objects.filter(employee_id=employee.pk, status='pending').order_by('-created_at'))
+    for row in recent + pending_leave:
+        row.employee = employee
+    
+    worked = Attendance.objects.filter(
+        employee_id=employee.pk,
+        date__gte=today.replace(day=1),
+        date__lte=today,
+        time_in__isnull=False,
+        time_out__isnull=False,
+    ).aggregate(total=Sum(F('time_out') - F('time_in')))['total']
+    
+    today_row = recent[0] if recent and recent[0].date == today else None
+    return Response({
+        'profile': EmployeeSerializer(employee).data,
+        'today': AttendanceSerializer(today_row).data if today_row else None,
+        'recent_attendance': AttendanceSerializer(recent, many=True).data,
+        'pending_leave_requests': LeaveRequestSerializer(pending_leave, many=True).data,
+        'month_to_date_hours': round(worked.total_seconds() / 3600, 2) if worked else 0,
+    })
+
+
 class AttendanceViewSet(viewsets.ModelViewSet):
     """API endpoint for managing attendance records."""
     queryset = Attendance.objects.all()
     serializer_class = AttendanceSerializer
     permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = AttendanceFilter
+    ordering = ('-date', '-id')
     
     def get_queryset(self):
         """Filter attendance records based on user permissions."""
         user = self.request.user
         
         if user.user_type == 'admin':
-            return Attendance.objects.all()
+            queryset = Attendance.objects.all()
         elif user.user_type == 'employee':
             # Employees can only see their own attendance
-            try:
-                employee = Employee.objects.get(user=user)
-                return Attendance.objects.filter(employee=employee)
-            except Employee.DoesNotExist:
+            employee_pk = get_employee_pk(self.request)
+            if employee_pk is None:
                 return Attendance.objects.none()
+            queryset = Attendance.objects.filter(employee_id=employee_pk)
         else:
             return Attendance.objects.none()
+        return AttendanceSerializer.setup_eager_loading(queryset)
+    
+    # Keep the timesheet rollups in step with admin edits
+    def perform_create(self, serializer):
+        attendance = serializer.save()
+        DailyTimesheet.objects.refresh(attendance.employee_id, attendance.date)
+    
+    def perform_update(self, serializer):
+        previous = (serializer.instance.employee_id, serializer.instance.date)
+        attendance = serializer.save()
+        DailyTimesheet.objects.refresh(attendance.employee_id, attendance.date)
+        if previous != (attendance.employee_id, attendance.date):
+            DailyTimesheet.objects.refresh(*previous)
+    
+    def perform_destroy(self, instance):
+        key = (instance.employee_id, instance.date)
+        instance.delete()
+        DailyTimesheet.objects.refresh(*key)
 
 
 @api_view(['POST'])
@@ -223,29 +378,14 @@ def clock_in(request):
     if request.user.user_type != 'employee':
         return Response({"detail": "Not an employee user."}, status=status.HTTP_403_FORBIDDEN)
     
-    try:
-        employee = Employee.objects.get(user=request.user)
-        today = date.today()
-        
-        # Check if attendance record exists for today
-        attendance, created = Attendance.objects.get_or_create(
-            employee=employee,
-            date=today,
-            defaults={
-                'status': 'present',
-                'time_in': timezone.now(),
-            }
-        )
-        
-        if not created and not attendance.time_in:
-            attendance.time_in = timezone.now()
-            attendance.status = 'present'
-            attendance.save()
-        
-        serializer = AttendanceSerializer(attendance)
-        return Response(serializer.data)
-    except Employee.DoesNotExist:
+    attendance = Attendance.objects.clock_in(request.user.id, timezone.localdate(), timezone.now())
+    if attendance is None:
         return Response({"detail": "Employee profile not found."}, status=status.HTTP_404_NOT_FOUND)
+    # The upsert bypasses the save signals
+    invalidate_dashboard_summary()
+    
+    serializer = AttendanceSerializer(attendance)
+    return Response(serializer.data)
 
 
 @api_view(['POST'])
@@ -255,23 +395,20 @@ def clock_out(request):
     if request.user.user_type != 'employee':
         return Response({"detail": "Not an employee user."}, status=status.HTTP_403_FORBIDDEN)
     
+    today = timezone.localdate()
+    attendance = Attendance.objects.clock_out(request.user.id, today, timezone.now())
+    if attendance is not None:
+        DailyTimesheet.objects.refresh(attendance.employee_id, today)
+        serializer = AttendanceSerializer(attendance)
+        return Response(serializer.data)
+    
+    # Nothing was updated; work out why for the error message
     try:
         employee = Employee.objects.get(user=request.user)
-        today = date.today()
-        
-        try:
-            attendance = Attendance.objects.get(employee=employee, date=today)
-            
-            if not attendance.time_in:
-                return Response({"detail": "You need to clock in first."}, status=status.HTTP_400_BAD_REQUEST)
-            
-            attendance.time_out = timezone.now()
-            attendance.save()
-            
-            serializer = AttendanceSerializer(attendance)
-            return Response(serializer.data)
-        except Attendance.DoesNotExist:
-            return Response({"detail": "No attendance record found for today."}, status=status.HTTP_404_NOT_FOUND)
+        Attendance.objects.get(employee=employee, date=today)
+        return Response({"detail": "You need to clock in first."}, status=status.HTTP_400_BAD_REQUEST)
+    except Attendance.DoesNotExist:
+        return Response({"detail": "No attendance record found for today."}, status=status.HTTP_404_NOT_FOUND)
     except Employee.DoesNotExist:
         return Response({"detail": "Employee profile not found."}, status=status.HTTP_404_NOT_FOUND)
 
@@ -283,13 +420,15 @@ def my_attendance(request):
     if request.user.user_type != 'employee':
         return Response({"detail": "Not an employee user."}, status=status.HTTP_403_FORBIDDEN)
     
-    try:
-        employee = Employee.objects.get(user=request.user)
-        attendance = Attendance.objects.filter(employee=employee).order_by('-date')
-        serializer = AttendanceSerializer(attendance, many=True)
-        return Response(serializer.data)
-    except Employee.DoesNotExist:
+    employee_pk = get_employee_pk(request)
+    if employee_pk is None:
         return Response({"detail": "Employee profile not found."}, status=status.HTTP_404_NOT_FOUND)
+    
+    attendance = AttendanceSerializer.setup_eager_loading(
+        Attendance.objects.filter(employee_id=employee_pk).order_by('-date')
+    )
+    serializer = AttendanceSerializer(attendance, many=True)
+    return Response(serializer.data)
 
 
 class LeaveRequestViewSet(viewsets.ModelViewSet):
@@ -297,48 +436,81 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
     queryset = LeaveRequest.objects.all()
     serializer_class = LeaveRequestSerializer
     permission_classes = [permissions.IsAuthenticated]
+    ordering = ('-created_at', '-id')
     
     def get_queryset(self):
         """Filter leave requests based on user permissions."""
         user = self.request.user
         
         if user.user_type == 'admin':
-            return LeaveRequest.objects.all()
+            queryset = LeaveRequest.objects.all()
         elif user.user_type == 'employee':
             # Employees can only see their own leave requests
-            try:
-                employee = Employee.objects.get(user=user)
-                return LeaveRequest.objects.filter(employee=employee)
-            except Employee.DoesNotExist:
+            employee_pk = get_employee_pk(self.request)
+            if employee_pk is None:
                 return LeaveRequest.objects.none()
+            queryset = LeaveRequest.objects.filter(employee_id=employee_pk)
         else:
             return LeaveRequest.objects.none()
+        return LeaveRequestSerializer.setup_eager_loading(queryset)
     
     def create(self, request, *args, **kwargs):
         """Create a new leave request."""
         if request.user.user_type != 'employee':
             return Response({"detail": "Only employees can create leave requests."}, status=status.HTTP_403_FORBIDDEN)
         
-        try:
-            employee = Employee.objects.get(user=request.user)
-            data = request.data.copy()
-            data['employee'] = employee.id
-            
-            serializer = self.get_serializer(data=data)
-            serializer.is_valid(raise_exception=True)
-            self.perform_create(serializer)
-            
-            headers = self.get_success_headers(serializer.data)
-            return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
-        except Employee.DoesNotExist:
+        employee_pk = get_employee_pk(request)
+        if employee_pk is None:
             return Response({"detail": "Employee profile not found."}, status=status.HTTP_404_NOT_FOUND)
+        
+        data = request.data.copy()
+        data['employee'] = employee_pk
+        
+        serializer = self.get_serializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        
+        headers = self.get_success_headers(serializer.data)
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+    
+    def perform_update(self, serializer):
+        # Keep the ledger in step: status changes go through decide(), and
+        # new dates on debited leave post the difference in days
+        new_status = serializer.validated_data.pop('status', None)
+        try:
+            with transaction.atomic():
+                leave_request = serializer.save()
+                debited = leave_request.debited_days() if leave_request.status == 'approved' else 0
+                if debited and debited != leave_request.days:
+                    LeaveBalance.objects.post([LeaveLedgerEntry(
+                        employee_id=leave_request.employee_id, kind='adjustment', leave_request=leave_request,
+                        days=debited - leave_request.days, note='Leave dates changed',
+                    )])
+                if new_status is not None and new_status != leave_request.status:
+                    LeaveRequest.objects.decide(leave_request, new_status)
+        except InsufficientLeaveBalance as e:
+            raise ValidationError({'status': str(e)})
+        except IntegrityError:
+            # exclude_overlapping_approved_leave
+            raise LeaveConflict()
     
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAdminUser])
     def approve(self, request, pk=None):
         """Approve a leave request."""
         leave_request = self.get_object()
-        leave_request.status = 'approved'
-        leave_request.save()
+        try:
+            LeaveRequest.objects.decide(leave_request, 'approved')
+        except InsufficientLeaveBalance as e:
+            return Response(
+                {"detail": f"{e}."},
+                status=status.HTTP_409_CONFLICT
+            )
+        except IntegrityError:
+            # exclude_overlapping_approved_leave
+            return Response(
+                {"detail": "The employee already has approved leave overlapping these dates."},
+                status=status.HTTP_409_CONFLICT
+            )
         
         serializer = self.get_serializer(leave_request)
         return Response(serializer.data)
@@ -347,11 +519,202 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
     def reject(self, request, pk=None):
         """Reject a leave request."""
         leave_request = self.get_object()
-        leave_request.status = 'rejected'
-        leave_request.save()
+        # Rejecting approved leave credits its days back
+        LeaveRequest.objects.decide(leave_request, 'rejected')
         
         serializer = self.get_serializer(leave_request)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['post'], url_path='bulk-approve', permission_classes=[permissions.IsAdminUser])
+    def bulk_approve(self, request):
+        """Approve many pending leave requests in one statement."""
+        return self.bulk_decide(request, 'approved')
+    
+    @action(detail=False, methods=['post'], url_path='bulk-reject', permission_classes=[permissions.IsAdminUser])
+    def bulk_reject(self, request):
+        """Reject many pending leave requests in one statement."""
+        return self.bulk_decide(request, 'rejected')
+    
+    def bulk_decide(self, request, decision):
+        serializer = LeaveBulkDecisionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        try:
+            outcomes = LeaveRequest.objects.decide_many(ids, decision)
+        except InsufficientLeaveBalance as e:
+            return Response({"detail": f"{e}; nothing was changed, please retry."}, status=status.HTTP_409_CONFLICT)
+        except IntegrityError:
+            # Another request approved overlapping leave concurrently
+            return Response(
+                {"detail": "Overlapping leave was approved concurrently; nothing was changed, please retry."},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        decided = sum(1 for outcome in outcomes.values() if outcome == decision)
+        if decided:
+            # The UPDATE bypasses the save signals; invalidate once for the batch
+            transaction.on_commit(invalidate_dashboard_summary)
+        return Response({
+            'decided': decided,
+            'results': [{'id': pk, 'result': outcomes[pk]} for pk in dict.fromkeys(ids)],
+        })
+    
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def calendar(self, request):
+        """
+        Everyone on approved leave between `date_from` and `date_to`
+        (inclusive, default today), optionally within one `department`.
+        `days` maps each date in the window to the employees off that day.
+        """
+        today = timezone.localdate()
+        try:
+            date_from = date.fromisoformat(request.query_params.get('date_from', today.isoformat()))
+            date_to = date.fromisoformat(request.query_params.get('date_to', date_from.isoformat()))
+        except ValueError:
+            return Response({"detail": "Dates must be YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+        if date_to < date_from:
+            return Response({"detail": "date_to must not be before date_from."}, status=status.HTTP_400_BAD_REQUEST)
+        if (date_to - date_from).days >= LEAVE_CALENDAR_MAX_DAYS:
+            return Response(
+                {"detail": f"The window can be at most {LEAVE_CALENDAR_MAX_DAYS} days."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # One overlap query, answered from the approved-leave GiST index
+        queryset = LeaveRequest.objects.on_leave(date_from, date_to)
+        department = request.query_params.get('department')
+        if department:
+            queryset = queryset.filter(employee__department=department)
+        leave = list(LeaveRequestSerializer.setup_eager_loading(queryset).order_by('start_date', 'employee_id'))
+        
+        days = {
+            (date_from + timedelta(days=offset)).isoformat(): []
+            for offset in range((date_to - date_from).days + 1)
+        }
+        for entry in leave:
+            first, last = max(entry.start_date, date_from), min(entry.end_date, date_to)
+            for offset in range((last - first).days + 1):
+                days[(first + timedelta(days=offset)).isoformat()].append(entry.employee_id)
+        return Response({
+            'date_from': date_from.isoformat(),
+            'date_to': date_to.isoformat(),
+            'leave_requests': LeaveRequestSerializer(leave, many=True).data,
+            'days': days,
+        })
+
+
+class TimesheetViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint for monthly timesheets, read from the rollup tables.
+    `daily` lists the per-day rollups.
+    """
+    serializer_class = MonthlyTimesheetSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = MonthlyTimesheetFilter
+    ordering = ('-month', '-id')
+    
+    def scope(self, queryset):
+        """Admins see everyone; employees only themselves."""
+        user = self.request.user
+        if user.user_type == 'admin':
+            return queryset
+        employee_pk = get_employee_pk(self.request) if user.user_type == 'employee' else None
+        if employee_pk is None:
+            return queryset.none()
+        return queryset.filter(employee_id=employee_pk)
+    
+    def get_queryset(self):
+        return MonthlyTimesheetSerializer.setup_eager_loading(self.scope(MonthlyTimesheet.objects.all()))
+    
+    @action(
+        detail=False, methods=['get'], serializer_class=DailyTimesheetSerializer,
+        filterset_class=DailyTimesheetFilter, ordering=('-date', '-id'),
+    )
+    def daily(self, request):
+        queryset = self.filter_queryset(
+            DailyTimesheetSerializer.setup_eager_loading(self.scope(DailyTimesheet.objects.all()))
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(queryset, many=True).data)
+
+
+class LeaveBalanceViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint for leave balances, maintained from the leave ledger.
+    `ledger` lists the entries behind them; admins post manual
+    corrections with `adjust`.
+    """
+    serializer_class = LeaveBalanceSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = LeaveBalanceFilter
+    ordering = ('id',)
+    
+    def scope(self, queryset):
+        """Admins see everyone; employees only themselves."""
+        user = self.request.user
+        if user.user_type == 'admin':
+            return queryset
+        employee_pk = get_employee_pk(self.request) if user.user_type == 'employee' else None
+        if employee_pk is None:
+            return queryset.none()
+        return queryset.filter(employee_id=employee_pk)
+    
+    def get_queryset(self):
+        return LeaveBalanceSerializer.setup_eager_loading(self.scope(LeaveBalance.objects.all()))
+    
+    @action(
+        detail=False, methods=['get'], serializer_class=LeaveLedgerEntrySerializer,
+        filterset_class=LeaveLedgerFilter, ordering=('-id',),
+    )
+    def ledger(self, request):
+        queryset = self.filter_queryset(self.scope(LeaveLedgerEntry.objects.all()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(queryset, many=True).data)
+    
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def adjust(self, request):
+        """Post a manual adjustment to one employee's balance."""
+        serializer = LeaveAdjustmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        employee = serializer.validated_data['employee']
+        balances = LeaveBalance.objects.credit(
+            [employee.pk], serializer.validated_data['days'], kind='adjustment',
+            note=serializer.validated_data['note'],
+        )
+        return Response({'employee': employee.pk, 'balance': balances[employee.pk]}, status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def my_leave_balance(request):
+    """
+    Get the current employee's leave balance. With `days`, also answer
+    whether that many days can be taken.
+    """
+    if request.user.user_type != 'employee':
+        return Response({"detail": "Not an employee user."}, status=status.HTTP_403_FORBIDDEN)
+    
+    employee_pk = get_employee_pk(request)
+    if employee_pk is None:
+        return Response({"detail": "Employee profile not found."}, status=status.HTTP_404_NOT_FOUND)
+    
+    balance = LeaveBalance.objects.balance(employee_pk)
+    data = {'employee': employee_pk, 'balance': balance}
+    if 'days' in request.query_params:
+        try:
+            days = Decimal(request.query_params['days'])
+        except InvalidOperation:
+            days = None
+        if days is None or not days.is_finite():
+            return Response({"detail": "days must be a number."}, status=status.HTTP_400_BAD_REQUEST)
+        data.update(days=days, can_take=balance >= days)
+    return Response(data)
 
 
 @api_view(['GET'])
@@ -361,13 +724,15 @@ def my_leave_requests(request):
     if request.user.user_type != 'employee':
         return Response({"detail": "Not an employee user."}, status=status.HTTP_403_FORBIDDEN)
     
-    try:
-        employee = Employee.objects.get(user=request.user)
-        leave_requests = LeaveRequest.objects.filter(employee=employee).order_by('-created_at')
-        serializer = LeaveRequestSerializer(leave_requests, many=True)
-        return Response(serializer.data)
-    except Employee.DoesNotExist:
+    employee_pk = get_employee_pk(request)
+    if employee_pk is None:
         return Response({"detail": "Employee profile not found."}, status=status.HTTP_404_NOT_FOUND)
+    
+    leave_requests = LeaveRequestSerializer.setup_eager_loading(
+        LeaveRequest.objects.filter(employee_id=employee_pk).order_by('-created_at')
+    )
+    serializer = LeaveRequestSerializer(leave_requests, many=True)
+    return Response(serializer.data)
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAdminUser])
@@ -380,14 +745,11 @@ def send_credentials(request):
     
     try:
         user = User.objects.get(email=email)
-        employee = Employee.objects.get(user=user)
+        employee = Employee.objects.select_related('user').get(user=user)
         
-        success = send_employee_credentials(employee, password)
+        queue_employee_credentials(employee, password)
         
-        if success:
-            return Response({"detail": "Credentials sent successfully."})
-        else:
-            return Response({"detail": "Failed to send credentials."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response({"detail": "Credentials queued for sending."}, status=status.HTTP_202_ACCEPTED)
     except (User.DoesNotExist, Employee.DoesNotExist):
         return Response({"detail": "Employee not found."}, status=status.HTTP_404_NOT_FOUND)
 
@@ -395,16 +757,106 @@ def send_credentials(request):
 @permission_classes([IsAdminUser])
 def sync_microsoft_users(request):
     """
-    API endpoint to sync users from Microsoft 365
+    API endpoint to sync users from Microsoft 365.
+    Queues a background job (or joins the one already queued or running)
+    and returns its id; poll the job status endpoint for progress.
     """
     send_credentials = request.data.get('send_credentials', False)
+    delta = request.data.get('delta', False)
+    
+    job = Job.objects.enqueue(
+        SYNC_MICROSOFT_USERS,
+        params={'send_credentials': bool(send_credentials), 'delta': bool(delta)},
+        dedupe_key=SYNC_MICROSOFT_USERS,
+    )
+    return Response({
+        'success': True,
+        'message': 'User sync initiated successfully',
+        'job_id': job.id,
+        'job': JobSerializer(job).data,
+    }, status=status.HTTP_202_ACCEPTED)
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def materialize_absences(request):
+    """
+    API endpoint to record absences for a past date range, e.g. a backfill.
+    Queues a background job and returns its id; the nightly run comes from
+    the `materialize_absences` command.
+    """
+    params = {}
+    for key in ('date_from', 'date_to'):
+        value = request.data.get(key)
+        if value:
+            try:
+                params[key] = date.fromisoformat(value).isoformat()
+            except (TypeError, ValueError):
+                return Response({"detail": f"{key} must be YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
     
+    job = Job.objects.enqueue(
+        MATERIALIZE_ABSENCES,
+        params=params,
+        dedupe_key=f"{MATERIALIZE_ABSENCES}:{params.get('date_from', '')}:{params.get('date_to', '')}",
+    )
+    return Response({'job_id': job.id, 'job': JobSerializer(job).data}, status=status.HTTP_202_ACCEPTED)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def job_status(request, pk):
+    """
+    API endpoint reporting the status and progress of a background job
+    """
     try:
-        # Call the management command
-        call_command('sync_microsoft_users', send_credentials=send_credentials)
-        return Response({'success': True, 'message': 'User sync initiated successfully'})
-    except Exception as e:
-        return Response({'success': False, 'message': f'Error syncing users: {str(e)}'}, status=500)
+        job = Job.objects.get(pk=pk)
+    except Job.DoesNotExist:
+        return Response({"detail": "Job not found."}, status=status.HTTP_404_NOT_FOUND)
+    return Response(JobSerializer(job).data)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def dashboard_summary(request):
+    """
+    API endpoint with the admin dashboard counters: headcount, today's
+    attendance, leave and per-department breakdowns
+    """
+    return Response(get_dashboard_summary())
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_data(request, kind):
+    """
+    API endpoint streaming attendance or leave rows for payroll as CSV or
+    NDJSON (`output`), optionally gzipped (`gzip=1`). Accepts `month`
+    (YYYY-MM) or the list filters; rows are written as they are read
+    """
+    if kind not in EXPORTS:
+        return Response({"detail": "Unknown export."}, status=status.HTTP_404_NOT_FOUND)
+    
+    output = request.query_params.get('output', 'csv')
+    gzip = request.query_params.get('gzip', '').lower() in ('1', 'true', 'yes')
+    params = request.query_params.copy()
+    for param in ('output', 'gzip'):
+        params.pop(param, None)
+    try:
+        chunks = stream_export(kind, output=output, gzip=gzip, params=params)
+    except ValueError as e:
+        return Response(e.args[0], status=status.HTTP_400_BAD_REQUEST)
+    
+    content_type = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson'}[output]
+    response = StreamingHttpResponse(chunks, content_type='application/gzip' if gzip else content_type)
+    filename = export_filename(kind, output, gzip=gzip, params=params)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    # Let proxies pass chunks through instead of buffering the whole export
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def auth_cache_stats(request):
+    """
+    API endpoint reporting the user cache hit rate for the serving process
+    """
+    return Response(user_cache.stats())
 
 @api_view(['POST'])
 @permission_classes([IsAdminUser])
@@ -464,14 +916,41 @@ def send_email_view(request):
         # Default template
         body = request.data.get('body', '')
     
-    # Send email using Graph API
-    success = send_email_with_graph(
+    if not to_email or not subject:
+        return Response({'success': False, 'message': 'Recipient and subject are required'}, status=400)
+    
+    # Queue the email; the outbox worker sends it through the Graph API
+    email = OutboxEmail.objects.enqueue(
         to_email=to_email,
         subject=subject,
         body=body
     )
     
-    if success:
-        return Response({'success': True, 'message': 'Email sent successfully'})
-    else:
-        return Response({'success': False, 'message': 'Failed to send email'}, status=500)
+    return Response({'success': True, 'message': 'Email queued', 'email_id': email.id}, status=202)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def email_outbox_stats(request):
+    """
+    API endpoint reporting email outbox depth and send latency over the last hour
+    """
+    now = timezone.now()
+    counts = OutboxEmail.objects.aggregate(
+        pending=Count('id', filter=Q(status='pending')),
+        retrying=Count('id', filter=Q(status='pending', attempts__gt=0)),
+        dead=Count('id', filter=Q(status='dead')),
+        oldest_pending=Min('created_at', filter=Q(status='pending')),
+    )
+    latency = OutboxEmail.objects.filter(status='sent', sent_at__gte=now - timedelta(hours=1)).aggregate(
+        sent_last_hour=Count('id'),
+        avg_latency=Avg(F('sent_at') - F('created_at')),
+        max_latency=Max(F('sent_at') - F('created_at')),
+    )
+    oldest_pending = counts.pop('oldest_pending')
+    return Response({
+        **counts,
+        'oldest_pending_age_seconds': (now - oldest_pending).total_seconds() if oldest_pending else None,
+        'sent_last_hour': latency['sent_last_hour'],
+        'avg_send_latency_seconds': latency['avg_latency'].total_seconds() if latency['avg_latency'] else None,
+        'max_send_latency_seconds': latency['max_latency'].total_seconds() if latency['max_latency'] else None,
+    })
@@ -3,6 +3,7 @@
 from django.db import models
 from django.conf import settings
 from employees.models import Employee
+from accounts.managers import AttendanceManager
 
 class Attendance(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='attendances')
@@ -16,6 +17,8 @@ class Attendance(models.Model):
         ('half_day', 'Half Day'),
     ], default='present')
     
+    objects = AttendanceManager()
+    
     class Meta:
         unique_together = ['employee', 'date']
     
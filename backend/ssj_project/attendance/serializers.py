@@ -2,17 +2,24 @@
 
 from rest_framework import serializers
 from .models import Attendance, LeaveRequest
+from accounts.serializers import EagerLoadingMixin, QueryCheckedListSerializer
 
-class AttendanceSerializer(serializers.ModelSerializer):
+class AttendanceSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     employee_name = serializers.CharField(source='employee.full_name', read_only=True)
     
+    select_related_fields = ('employee',)
+    
     class Meta:
         model = Attendance
         fields = '__all__'
+        list_serializer_class = QueryCheckedListSerializer
 
-class LeaveRequestSerializer(serializers.ModelSerializer):
+class LeaveRequestSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     employee_name = serializers.CharField(source='employee.full_name', read_only=True)
     
+    select_related_fields = ('employee',)
+    
     class Meta:
         model = LeaveRequest
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+        list_serializer_class = QueryCheckedListSerializer
\ No newline at end of file
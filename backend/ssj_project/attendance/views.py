@@ -16,6 +16,7 @@ class IsAdminOrSelf(permissions.BasePermission):
 class AttendanceViewSet(viewsets.ModelViewSet):
     queryset = Attendance.objects.all()
     serializer_class = AttendanceSerializer
+    ordering = ('-date', '-id')
     
     def get_permissions(self):
         if self.action in ['clock_in', 'clock_out', 'my_attendance']:
@@ -25,7 +26,7 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
     
     def get_queryset(self):
-        queryset = Attendance.objects.all()
+        queryset = AttendanceSerializer.setup_eager_loading(Attendance.objects.all())
         if self.request.user.is_staff:
             return queryset
         try:
@@ -36,54 +37,38 @@ class AttendanceViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def clock_in(self, request):
-        try:
-            employee = Employee.objects.get(user=request.user)
-            today = timezone.now().date()
-            
-            attendance, created = Attendance.objects.get_or_create(
-                employee=employee,
-                date=today,
-                defaults={'time_in': timezone.now()}
-            )
-            
-            if not created and not attendance.time_in:
-                attendance.time_in = timezone.now()
-                attendance.save()
-            
-            return Response(AttendanceSerializer(attendance).data)
-        except Employee.DoesNotExist:
+        now = timezone.now()
+        attendance = Attendance.objects.clock_in(request.user.id, now.date(), now)
+        if attendance is None:
             return Response(
                 {"detail": "Employee profile not found."},
                 status=status.HTTP_404_NOT_FOUND
             )
+        return Response(AttendanceSerializer(attendance).data)
     
     @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def clock_out(self, request):
-        try:
-            employee = Employee.objects.get(user=request.user)
-            today = timezone.now().date()
-            
-            try:
-                attendance = Attendance.objects.get(employee=employee, date=today)
-                attendance.time_out = timezone.now()
-                attendance.save()
-                return Response(AttendanceSerializer(attendance).data)
-            except Attendance.DoesNotExist:
-                return Response(
-                    {"detail": "No clock-in record found for today."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        except Employee.DoesNotExist:
+        now = timezone.now()
+        attendance = Attendance.objects.clock_out(request.user.id, now.date(), now)
+        if attendance is not None:
+            return Response(AttendanceSerializer(attendance).data)
+        if not Employee.objects.filter(user=request.user).exists():
             return Response(
                 {"detail": "Employee profile not found."},
                 status=status.HTTP_404_NOT_FOUND
             )
+        return Response(
+            {"detail": "No clock-in record found for today."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def my_attendance(self, request):
         try:
             employee = Employee.objects.get(user=request.user)
-            attendances = Attendance.objects.filter(employee=employee).order_by('-date')
+            attendances = AttendanceSerializer.setup_eager_loading(
+                Attendance.objects.filter(employee=employee).order_by('-date')
+            )
             page = self.paginate_queryset(attendances)
             if page is not None:
                 serializer = self.get_serializer(page, many=True)
@@ -99,6 +84,7 @@ class AttendanceViewSet(viewsets.ModelViewSet):
 class LeaveRequestViewSet(viewsets.ModelViewSet):
     queryset = LeaveRequest.objects.all()
     serializer_class = LeaveRequestSerializer
+    ordering = ('-created_at', '-id')
     
     def get_permissions(self):
         if self.action in ['create', 'my_leave_requests']:
@@ -110,7 +96,7 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
     
     def get_queryset(self):
-        queryset = LeaveRequest.objects.all()
+        queryset = LeaveRequestSerializer.setup_eager_loading(LeaveRequest.objects.all())
         if self.request.user.is_staff:
             return queryset
         try:
@@ -130,7 +116,9 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
     def my_leave_requests(self, request):
         try:
             employee = Employee.objects.get(user=request.user)
-            leave_requests = LeaveRequest.objects.filter(employee=employee).order_by('-created_at')
+            leave_requests = LeaveRequestSerializer.setup_eager_loading(
+                LeaveRequest.objects.filter(employee=employee).order_by('-created_at')
+            )
             page = self.paginate_queryset(leave_requests)
             if page is not None:
                 serializer = self.get_serializer(page, many=True)
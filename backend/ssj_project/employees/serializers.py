@@ -2,14 +2,17 @@
 
 from rest_framework import serializers
 from .models import Employee, Resume
-from accounts.serializers import UserSerializer
+from accounts.serializers import EagerLoadingMixin, QueryCheckedListSerializer, UserSerializer
 
-class EmployeeSerializer(serializers.ModelSerializer):
+class EmployeeSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     
+    select_related_fields = ('user',)
+    
     class Meta:
         model = Employee
         fields = '__all__'
+        list_serializer_class = QueryCheckedListSerializer
 
 class EmployeeCreateSerializer(serializers.ModelSerializer):
     email = serializers.EmailField(write_only=True)
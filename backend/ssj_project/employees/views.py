@@ -13,6 +13,10 @@ class IsAdminOrSelf(permissions.BasePermission):
 
 class EmployeeViewSet(viewsets.ModelViewSet):
     queryset = Employee.objects.all()
+    ordering = ('-id',)
+    
+    def get_queryset(self):
+        return EmployeeSerializer.setup_eager_loading(Employee.objects.all())
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -43,6 +47,7 @@ class EmployeeViewSet(viewsets.ModelViewSet):
 class ResumeViewSet(viewsets.ModelViewSet):
     queryset = Resume.objects.all()
     serializer_class = ResumeSerializer
+    ordering = ('-submitted_at', '-id')
     
     def get_permissions(self):
         if self.action == 'create':
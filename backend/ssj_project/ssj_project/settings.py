@@ -2,7 +2,7 @@
 
 import os
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
 from datetime import timedelta
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -31,6 +31,7 @@ INSTALLED_APPS = [
     'rest_framework',
     'rest_framework.authtoken',
     'rest_framework_simplejwt',
+    'django_filters',
     'corsheaders',
     'allauth',
     'allauth.account',
@@ -53,6 +54,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.EmployeeMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -90,6 +92,16 @@ DATABASES = {
     }
 }
 
+# Cache
+# Use a shared backend (Redis, Memcached or the database cache) in production
+# so cached values such as the Graph access token are shared between workers
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -169,14 +181,36 @@ REST_AUTH = {
 # Django REST Framework settings with JWT
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # Set to 'accounts.authentication.CachedJWTAuthentication' to serve
+        # users from the per-process cache instead of a query per request
+        config('JWT_AUTHENTICATION_CLASS', default='rest_framework_simplejwt.authentication.JWTAuthentication'),
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'accounts.pagination.KeysetPagination',
 }
 
+# Seconds the admin dashboard summary is cached between invalidations
+DASHBOARD_SUMMARY_TTL = config('DASHBOARD_SUMMARY_TTL', default=30, cast=int)
+
+API_PAGE_SIZE = config('API_PAGE_SIZE', default=100, cast=int)
+API_MAX_PAGE_SIZE = config('API_MAX_PAGE_SIZE', default=1000, cast=int)
+
+# Raise when a list serializer queries per row (see accounts.serializers.QueryCheckedListSerializer)
+SERIALIZER_QUERY_CHECK = config('SERIALIZER_QUERY_CHECK', default=DEBUG, cast=bool)
+
+# Attendance partitions: months created ahead, and where archive_partitions writes dumps
+ATTENDANCE_PARTITION_MONTHS_AHEAD = config('ATTENDANCE_PARTITION_MONTHS_AHEAD', default=3, cast=int)
+ATTENDANCE_ARCHIVE_DIR = config('ATTENDANCE_ARCHIVE_DIR', default=os.path.join(BASE_DIR, 'archive'))
+
+# ISO weekdays (Monday is 1) on which materialize_absences marks missing employees absent
+ATTENDANCE_WORKDAYS = config('ATTENDANCE_WORKDAYS', default='1,2,3,4,5', cast=Csv(int))
+
+# Refuse to approve leave that would take an employee's balance below zero
+LEAVE_BALANCE_ENFORCED = config('LEAVE_BALANCE_ENFORCED', default=False, cast=bool)
+
 # In settings.py
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -202,6 +236,10 @@ SIMPLE_JWT = {
     'JTI_CLAIM': 'jti',
 }
 
+# Per-process user cache used by accounts.authentication.CachedJWTAuthentication
+JWT_USER_CACHE_MAX_SIZE = config('JWT_USER_CACHE_MAX_SIZE', default=1000, cast=int)
+JWT_USER_CACHE_TTL = config('JWT_USER_CACHE_TTL', default=60, cast=int)
+
 
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
@@ -215,6 +253,15 @@ MS_GRAPH_CLIENT_SECRET = config('MS_GRAPH_CLIENT_SECRET', default='')
 MS_GRAPH_TENANT_ID = config('MS_GRAPH_TENANT_ID', default='')
 SHARED_MAILBOX_ADDRESS = config('SHARED_MAILBOX_ADDRESS', default='hrsupport@ssjconsultance.com')
 
+# Microsoft Graph HTTP client
+MS_GRAPH_BASE_URL = config('MS_GRAPH_BASE_URL', default='https://graph.microsoft.com')
+MS_GRAPH_CONNECT_TIMEOUT = config('MS_GRAPH_CONNECT_TIMEOUT', default=5, cast=float)
+MS_GRAPH_READ_TIMEOUT = config('MS_GRAPH_READ_TIMEOUT', default=30, cast=float)
+MS_GRAPH_MAX_RETRIES = config('MS_GRAPH_MAX_RETRIES', default=5, cast=int)
+MS_GRAPH_BACKOFF_FACTOR = config('MS_GRAPH_BACKOFF_FACTOR', default=0.5, cast=float)
+MS_GRAPH_MAX_BACKOFF = config('MS_GRAPH_MAX_BACKOFF', default=60, cast=float)
+MS_GRAPH_MAX_CONCURRENCY = config('MS_GRAPH_MAX_CONCURRENCY', default=4, cast=int)
+
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='hrsupport@ssjconsultance.com')
 
 SOCIALACCOUNT_PROVIDERS = {
@@ -47,35 +47,22 @@ export default function AdminDashboard() {
       try {
         setLoading(true)
 
-        // Fetch employees
-        const employeesResponse = await axios.get("/api/employees/")
-        const employees = employeesResponse.data
-
-        // Fetch attendance for today
-        const today = new Date().toISOString().split("T")[0]
-        const attendanceResponse = await axios.get(`/api/attendance/?date=${today}`)
-        const attendance = attendanceResponse.data
-
-        // Fetch leave requests
-        const leaveRequestsResponse = await axios.get("/api/leave-requests/")
-        const leaveRequests = leaveRequestsResponse.data
-
-        // Calculate stats
-        const presentToday = attendance.filter((a: any) => a.status === "present").length
-        const pendingLeaveRequests = leaveRequests.filter((lr: any) => lr.status === "pending").length
+        // Counters and short lists come pre-aggregated from the server
+        const response = await axios.get("/api/admin/dashboard/summary/")
+        const summary = response.data
 
         setStats({
-          totalEmployees: employees.length,
-          presentToday,
-          absentToday: employees.length - presentToday,
-          pendingLeaveRequests,
+          totalEmployees: summary.headcount,
+          presentToday: summary.present + summary.late + summary.half_day,
+          absentToday: summary.absent,
+          pendingLeaveRequests: summary.pending_leave_requests,
         })
 
-        // Get recent employees (last 5)
-        setRecentEmployees(employees.slice(0, 5))
+        // Recent employees (last 5)
+        setRecentEmployees(summary.recent_employees)
 
-        // Get pending leave requests (last 5)
-        setPendingLeaveRequests(leaveRequests.filter((lr: any) => lr.status === "pending").slice(0, 5))
+        // Pending leave requests (last 5)
+        setPendingLeaveRequests(summary.pending_leave)
       } catch (err) {
         console.error("Error fetching dashboard data:", err)
         setError("Failed to load dashboard data. Please try again.")
@@ -48,16 +48,16 @@ export default function AdminDashboard() {
         setLoading(true)
 
         // Fetch employees
-        const employeesResponse = await axios.get("/api/employees/")
+        const employeesResponse = await axios.get("/api/employees/?paginate=false")
         const employees = employeesResponse.data
 
         // Fetch attendance for today
         const today = new Date().toISOString().split("T")[0]
-        const attendanceResponse = await axios.get(`/api/attendance/?date=${today}`)
+        const attendanceResponse = await axios.get(`/api/attendance/?date=${today}&paginate=false`)
         const attendance = attendanceResponse.data
 
         // Fetch leave requests
-        const leaveRequestsResponse = await axios.get("/api/leave-requests/")
+        const leaveRequestsResponse = await axios.get("/api/leave-requests/?paginate=false")
         const leaveRequests = leaveRequestsResponse.data
 
         // Calculate stats
@@ -54,7 +54,7 @@ export default function EmployeeManagement() {
     const fetchEmployees = async () => {
       try {
         setLoading(true)
-        const response = await axios.get("/api/employees/")
+        const response = await axios.get("/api/employees/?paginate=false")
         setEmployees(response.data)
         setFilteredEmployees(response.data)
 
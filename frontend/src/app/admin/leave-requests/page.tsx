@@ -18,6 +18,9 @@ export default function LeaveRequestsManagement() {
   const [searchTerm, setSearchTerm] = useState("")
   const [statusFilter, setStatusFilter] = useState("all")
 
+  // Pending requests ticked for a bulk decision
+  const [selectedIds, setSelectedIds] = useState<number[]>([])
+
   // Pagination
   const [currentPage, setCurrentPage] = useState(1)
   const [requestsPerPage] = useState(10)
@@ -38,7 +41,7 @@ export default function LeaveRequestsManagement() {
     const fetchLeaveRequests = async () => {
       try {
         setLoading(true)
-        const response = await axios.get("/api/leave-requests/")
+        const response = await axios.get("/api/leave-requests/?paginate=false")
         setLeaveRequests(response.data)
         setFilteredRequests(response.data)
       } catch (err) {
@@ -86,34 +89,47 @@ export default function LeaveRequestsManagement() {
     return date.toLocaleDateString("en-US", { year: "numeric", month: "short", day: "numeric" })
   }
 
-  // Handle approve/reject leave request
-  const handleStatusChange = async (id: number, status: string) => {
+  // Approve or reject leave requests with one bulk call. The response
+  // reports each id; only the ones actually decided change status here.
+  const handleStatusChange = async (ids: number[], status: "approved" | "rejected") => {
+    if (ids.length === 0) return
     try {
-      await axios.post(`/api/leave-requests/${id}/${status}/`)
-
-      // Update the leave request in the state
-      const updatedRequests = leaveRequests.map((req) => {
-        if (req.id === id) {
-          return { ...req, status }
-        }
-        return req
-      })
-
-      setLeaveRequests(updatedRequests)
-      setFilteredRequests(
-        filteredRequests.map((req) => {
-          if (req.id === id) {
-            return { ...req, status }
-          }
-          return req
-        }),
+      const action = status === "approved" ? "bulk-approve" : "bulk-reject"
+      const response = await axios.post(`/api/leave-requests/${action}/`, { ids })
+      const decided = new Set<number>(
+        response.data.results.filter((row: any) => row.result === status).map((row: any) => row.id),
+      )
+
+      setLeaveRequests(leaveRequests.map((req) => (decided.has(req.id) ? { ...req, status } : req)))
+      setSelectedIds(selectedIds.filter((id) => !ids.includes(id)))
+
+      const skipped = ids.length - decided.size
+      setError(
+        skipped > 0
+          ? `${skipped} leave request${skipped !== 1 ? "s were" : " was"} not ${status}: already decided or overlapping approved leave.`
+          : null,
       )
     } catch (err) {
-      console.error(`Error ${status === "approved" ? "approving" : "rejecting"} leave request:`, err)
-      setError(`Failed to ${status === "approved" ? "approve" : "reject"} leave request. Please try again.`)
+      console.error(`Error ${status === "approved" ? "approving" : "rejecting"} leave requests:`, err)
+      setError(`Failed to ${status === "approved" ? "approve" : "reject"} leave requests. Please try again.`)
     }
   }
 
+  const toggleSelected = (id: number) => {
+    setSelectedIds(selectedIds.includes(id) ? selectedIds.filter((selected) => selected !== id) : [...selectedIds, id])
+  }
+
+  const pendingOnPage = currentRequests.filter((req) => req.status === "pending").map((req) => req.id)
+  const allPendingOnPageSelected = pendingOnPage.length > 0 && pendingOnPage.every((id) => selectedIds.includes(id))
+
+  const toggleAllOnPage = () => {
+    setSelectedIds(
+      allPendingOnPageSelected
+        ? selectedIds.filter((id) => !pendingOnPage.includes(id))
+        : Array.from(new Set([...selectedIds, ...pendingOnPage])),
+    )
+  }
+
   if (loading) {
     return (
       <div className="min-h-screen pt-20 flex items-center justify-center">
@@ -192,12 +208,44 @@ export default function LeaveRequestsManagement() {
           </div>
         </div>
 
+        {/* Bulk actions */}
+        {selectedIds.length > 0 && (
+          <div className="bg-white rounded-lg shadow-md p-4 mb-4 flex items-center justify-between">
+            <p className="text-sm text-gray-700">
+              {selectedIds.length} leave request{selectedIds.length !== 1 ? "s" : ""} selected
+            </p>
+            <div className="flex space-x-2">
+              <button
+                onClick={() => handleStatusChange(selectedIds, "approved")}
+                className="inline-flex items-center px-3 py-2 rounded-md text-sm font-medium text-white bg-green-600 hover:bg-green-700"
+              >
+                <FaCheck className="mr-2" /> Approve selected
+              </button>
+              <button
+                onClick={() => handleStatusChange(selectedIds, "rejected")}
+                className="inline-flex items-center px-3 py-2 rounded-md text-sm font-medium text-white bg-red-600 hover:bg-red-700"
+              >
+                <FaTimes className="mr-2" /> Reject selected
+              </button>
+            </div>
+          </div>
+        )}
+
         {/* Leave Requests Table */}
         <div className="bg-white rounded-lg shadow-md overflow-hidden">
           <div className="overflow-x-auto">
             <table className="min-w-full divide-y divide-gray-200">
               <thead className="bg-gray-50">
                 <tr>
+                  <th scope="col" className="px-6 py-3">
+                    <input
+                      type="checkbox"
+                      aria-label="Select all pending on this page"
+                      checked={allPendingOnPageSelected}
+                      disabled={pendingOnPage.length === 0}
+                      onChange={toggleAllOnPage}
+                    />
+                  </th>
                   <th
                     scope="col"
                     className="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider"
@@ -253,6 +301,16 @@ export default function LeaveRequestsManagement() {
 
                     return (
                       <tr key={index}>
+                        <td className="px-6 py-4 whitespace-nowrap">
+                          {request.status === "pending" && (
+                            <input
+                              type="checkbox"
+                              aria-label={`Select leave request from ${request.employee_name}`}
+                              checked={selectedIds.includes(request.id)}
+                              onChange={() => toggleSelected(request.id)}
+                            />
+                          )}
+                        </td>
                         <td className="px-6 py-4 whitespace-nowrap">
                           <div className="text-sm font-medium text-gray-900">{request.employee_name}</div>
                         </td>
@@ -289,14 +347,14 @@ export default function LeaveRequestsManagement() {
                           {request.status === "pending" && (
                             <div className="flex justify-end space-x-2">
                               <button
-                                onClick={() => handleStatusChange(request.id, "approved")}
+                                onClick={() => handleStatusChange([request.id], "approved")}
                                 className="text-green-600 hover:text-green-900"
                                 title="Approve"
                               >
                                 <FaCheck />
                               </button>
                               <button
-                                onClick={() => handleStatusChange(request.id, "rejected")}
+                                onClick={() => handleStatusChange([request.id], "rejected")}
                                 className="text-red-600 hover:text-red-900"
                                 title="Reject"
                               >
@@ -310,7 +368,7 @@ export default function LeaveRequestsManagement() {
                   })
                 ) : (
                   <tr>
-                    <td colSpan={7} className="px-6 py-4 text-center text-sm text-gray-500">
+                    <td colSpan={8} className="px-6 py-4 text-center text-sm text-gray-500">
                       No leave requests found.
                     </td>
                   </tr>
@@ -50,11 +50,11 @@ export default function AdminTimesheet() {
         setLoading(true)
 
         // Fetch employees
-        const employeesResponse = await axios.get("/api/employees/")
+        const employeesResponse = await axios.get("/api/employees/?paginate=false")
         setEmployees(employeesResponse.data)
 
         // Fetch attendance records
-        const attendanceResponse = await axios.get("/api/attendance/")
+        const attendanceResponse = await axios.get("/api/attendance/?paginate=false")
         setAttendanceRecords(attendanceResponse.data)
         setFilteredRecords(attendanceResponse.data)
       } catch (err) {
@@ -36,20 +36,13 @@ export default function EmployeeDashboard() {
       try {
         setLoading(true)
 
-        // Fetch employee profile
-        const profileResponse = await axios.get("/api/employees/me/")
-        setProfile(profileResponse.data)
+        // Profile, today's punch and recent history in one request
+        const response = await axios.get("/api/employee/home/")
+        setProfile(response.data.profile)
+        setAttendance(response.data.today)
 
-        // Fetch attendance data
-        const attendanceResponse = await axios.get("/api/attendance/my_attendance/")
-
-        // Get today's attendance if it exists
-        const today = new Date().toISOString().split("T")[0]
-        const todayAttendance = attendanceResponse.data.find((a: any) => a.date === today)
-        setAttendance(todayAttendance || null)
-
-        // Get recent attendance records (last 5)
-        setRecentAttendance(attendanceResponse.data.slice(0, 5))
+        // Recent attendance records (last 5)
+        setRecentAttendance(response.data.recent_attendance)
       } catch (err) {
         console.error("Error fetching employee data:", err)
         setError("Failed to load employee data. Please try again.")